@@ -9,8 +9,16 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ouaf.settings')
+# Route the public pages to ouaf_app.async_views (see ouaf_app/urls.py).
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
+
+if settings.WARMUP:
+    from ouaf_app import warmup
+
+    warmup.run_once()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -58,6 +59,75 @@ CONTACT_RECIPIENTS = [
     e.strip() for e in os.getenv("CONTACT_RECIPIENTS", DEFAULT_FROM_EMAIL).split(",") if e.strip()
 ]
 
+# Caches shared by every worker: "redis" (Redis/Valkey at CACHE_URL), "db" (tables
+# created by `manage.py createcachetable`), "file" (CACHE_DIR, one host) or "locmem"
+# (per process, development only). `manage.py cache_stats` reports on each alias.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "file")
+CACHE_URL = os.getenv("CACHE_URL", "redis://127.0.0.1:6379/0")
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(tempfile.gettempdir(), "ouaf-cache"))
+
+
+def cache_config(alias):
+    if CACHE_BACKEND == "redis":
+        return {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": CACHE_URL,
+                "KEY_PREFIX": f"ouaf:{alias}"}
+    if CACHE_BACKEND == "db":
+        return {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": f"ouaf_cache_{alias}"}
+    if CACHE_BACKEND == "file":
+        return {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": os.path.join(CACHE_DIR, alias)}
+    return {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": alias}
+
+
+CACHES = {alias: cache_config(alias) for alias in ("default", "sessions", "pages", "ratelimit")}
+
+# Sessions are read from the cache and written through to the database.
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+SESSION_CACHE_ALIAS = "sessions"
+
+# Rate limiting, see ouaf_app/ratelimit.py ("cache" or "db"). Only Redis has an
+# atomic incr among the cache backends above, the database is used otherwise.
+RATELIMIT_BACKEND = os.getenv("RATELIMIT_BACKEND", "cache" if CACHE_BACKEND == "redis" else "db")
+RATELIMIT_CACHE_ALIAS = "ratelimit"
+
+# Newsletter sending (python manage.py send_newsletter <id>), see ouaf_app/newsletter.py
+NEWSLETTER_RATE = float(os.getenv("NEWSLETTER_RATE", "5"))
+NEWSLETTER_BATCH_SIZE = int(os.getenv("NEWSLETTER_BATCH_SIZE", "200"))
+NEWSLETTER_RECONNECT_EVERY = int(os.getenv("NEWSLETTER_RECONNECT_EVERY", "500"))
+
+# Production server (python manage.py serve): workers and threads default to values derived from the CPU count
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "0")) or None
+SERVE_THREADS = int(os.getenv("SERVE_THREADS", "0")) or None
+SERVE_MAX_REQUESTS = int(os.getenv("SERVE_MAX_REQUESTS", "2000"))
+SERVE_TIMEOUT = int(os.getenv("SERVE_TIMEOUT", "60"))
+# Warm up (templates, URL resolvers, catalogs, page cache) when the WSGI/ASGI application is loaded,
+# see ouaf_app/warmup.py. `serve` always does, before forking its workers.
+WARMUP = os.getenv("DJANGO_WARMUP", "false").lower() in ("1", "true", "yes", "on")
+
+# Request metrics on /metrics (Prometheus), see ouaf_app/metrics.py. METRICS_DIR is shared by the processes of
+# one server (`serve` creates it); METRICS_TOKEN is required as "Authorization: Bearer <token>", and without it
+# /metrics only answers with DEBUG (404 otherwise).
+METRICS = os.getenv("DJANGO_METRICS", "true").lower() in ("1", "true", "yes", "on")
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+# Server-Timing header (SQL, templates, mail, media, view) on the responses of "all" requests, of "staff" users
+# only, or "off"; requests slower than SLOW_REQUEST_MS are logged with the same breakdown (0: never),
+# see ouaf_app/middleware.py
+SERVER_TIMING = os.getenv("SERVER_TIMING", "staff").lower()
+SLOW_REQUEST_MS = int(os.getenv("SLOW_REQUEST_MS", "1000"))
+# Repeated (N+1) queries of a request: "warn" (log), "raise" or "off"; more than QUERY_CHECK_THRESHOLD times
+# the same statement from the same line is reported. Queries slower than SLOW_QUERY_MS are logged with their
+# plan (0: never). See ouaf_app/querycheck.py; the tests always run with QUERY_CHECK=raise.
+QUERY_CHECK = os.getenv("QUERY_CHECK", "warn" if DEBUG else "off").lower()
+QUERY_CHECK_THRESHOLD = int(os.getenv("QUERY_CHECK_THRESHOLD", "5"))
+SLOW_QUERY_MS = int(os.getenv("SLOW_QUERY_MS", "200" if DEBUG else "0"))
+
+# Outbox worker (python manage.py send_outbox --loop), see ouaf_app/outbox.py
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+OUTBOX_BACKOFF_BASE = int(os.getenv("OUTBOX_BACKOFF_BASE", "30"))
+OUTBOX_BACKOFF_MAX = int(os.getenv("OUTBOX_BACKOFF_MAX", str(6 * 60 * 60)))
+OUTBOX_LEASE = int(os.getenv("OUTBOX_LEASE", "300"))
+
 
 
 
@@ -73,22 +143,39 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
-if DEBUG:
+# The toolbar is the heaviest import at boot: DEBUG_TOOLBAR=false to run DEBUG without it.
+DEBUG_TOOLBAR = DEBUG and os.getenv("DEBUG_TOOLBAR", "true").lower() in ("1", "true", "yes", "on")
+
+if DEBUG_TOOLBAR:
     INSTALLED_APPS.append("debug_toolbar")
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
 ]
 
-if DEBUG:
+if QUERY_CHECK != "off" or SLOW_QUERY_MS:
+    MIDDLEWARE.insert(0, "ouaf_app.middleware.QueryCheckMiddleware")
+
+if SERVER_TIMING != "off" or SLOW_REQUEST_MS:
+    MIDDLEWARE.insert(0, "ouaf_app.middleware.ServerTimingMiddleware")
+
+# Around the other middleware (but the metrics): every log record of the request carries its ID.
+MIDDLEWARE.insert(0, "ouaf_app.middleware.RequestIdMiddleware")
+
+if METRICS:
+    # First, so that the other middleware count in the measured duration.
+    MIDDLEWARE.insert(0, "ouaf_app.middleware.MetricsMiddleware")
+
+if DEBUG_TOOLBAR:
     MIDDLEWARE.append("debug_toolbar.middleware.DebugToolbarMiddleware")
 
 
 MIDDLEWARE.extend(
     [
-        'whitenoise.middleware.WhiteNoiseMiddleware',
+        'ouaf_app.middleware.WhiteNoiseMiddleware',
         'django.contrib.sessions.middleware.SessionMiddleware',
         "django.middleware.locale.LocaleMiddleware",
         'django.middleware.common.CommonMiddleware',
@@ -100,6 +187,49 @@ MIDDLEWARE.extend(
 
 ROOT_URLCONF = 'ouaf.urls'
 
+TEST_RUNNER = "ouaf_app.test_runner.QueryCheckRunner"
+
+# Logs: one line per record (JSON, or text in development) tagged with the request ID, written to stdout by a
+# background thread so that a slow pipe never blocks a worker, see ouaf_app/logs.py. The request ID comes from the
+# REQUEST_ID_HEADER request header when a proxy sets it (empty: always a new one).
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text" if DEBUG else "json").lower()
+REQUEST_ID_HEADER = os.getenv("REQUEST_ID_HEADER", "X-Request-ID")
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {
+        "request_id": {"()": "ouaf_app.logs.RequestIdFilter"},
+        "require_debug_false": {"()": "django.utils.log.RequireDebugFalse"},
+    },
+    "formatters": {
+        "json": {"()": "ouaf_app.logs.JsonFormatter"},
+        "text": {"format": "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"},
+    },
+    "handlers": {
+        "queue": {
+            "()": "ouaf_app.logs.QueueHandler",
+            "stream": "ext://sys.stdout",
+            "filters": ["request_id"],
+            "formatter": LOG_FORMAT,
+        },
+        "mail_admins": {
+            "class": "django.utils.log.AdminEmailHandler",
+            "level": "ERROR",
+            "filters": ["require_debug_false"],
+        },
+    },
+    "root": {"handlers": ["queue"], "level": LOG_LEVEL},
+    "loggers": {
+        # Instead of Django's own handlers (console in DEBUG only): its records go to the root logger's.
+        "django": {"handlers": ["mail_admins"], "level": LOG_LEVEL},
+    },
+}
+
+# Serve the public pages with the async views of ouaf_app/async_views.py (on by default under ASGI, see asgi.py)
+ASYNC_VIEWS = os.getenv("DJANGO_ASYNC_VIEWS", "false").lower() in ("1", "true", "yes", "on")
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -188,8 +318,27 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 # https://docs.djangoproject.com/en/5.2/topics/files/
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
+
+# Production media serving (see ouaf_app/media_serving.py):
+# "" streams from Django, "x-accel-redirect" (nginx) or "x-sendfile" hands the transfer to the web server.
+MEDIA_OFFLOAD = os.getenv("MEDIA_OFFLOAD", "")
+MEDIA_ACCEL_REDIRECT_PREFIX = os.getenv("MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+MEDIA_CACHE_MAX_AGE = int(os.getenv("MEDIA_CACHE_MAX_AGE", "3600"))
+
+# Full-page cache of the public pages for anonymous visitors (see ouaf_app/page_cache.py)
+PAGE_CACHE_ALIAS = "pages"
+PAGE_CACHE_TIMEOUT = int(os.getenv("PAGE_CACHE_TIMEOUT", "3600"))
+
+# Responsive image renditions (see ouaf_app/renditions.py)
+RENDITION_WIDTHS = [320, 640, 1024, 1600]
+RENDITION_FORMATS = ["webp", "jpeg"]
+RENDITIONS_ASYNC = os.getenv("RENDITIONS_ASYNC", "true").lower() in ("1", "true", "yes", "on")
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# Admin changelists of large tables (see ouaf_app/changelists.py): above this many rows, the number of results is
+# PostgreSQL's estimate instead of a COUNT(*).
+ADMIN_COUNT_ESTIMATE_ABOVE = int(os.getenv("ADMIN_COUNT_ESTIMATE_ABOVE", "10000"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -197,6 +346,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = "ouaf_app.Person"
 
+# Same as ModelBackend, with permissions read from ouaf_app.auth_cache.
+AUTHENTICATION_BACKENDS = ["ouaf_app.backends.CachedModelBackend"]
+
 LOGIN_URL = "login"
 LOGIN_REDIRECT_URL = "/"
 LOGOUT_REDIRECT_URL = 'login/'
@@ -19,7 +19,8 @@ from django.urls import path, include, re_path, reverse_lazy
 from django.views.generic import RedirectView
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.static import serve
+from ouaf_app.media_serving import serve_media
+from ouaf_app.views import prometheus_metrics, readiness
 from django.views.i18n import JavaScriptCatalog
 from django.conf.urls.i18n import i18n_patterns
 from django.contrib.auth import views as auth_views
@@ -32,6 +33,10 @@ urlpatterns = [
     path("i18n/", include("django.conf.urls.i18n")),
     # TO use i18n within JS scripts #
     path("jsi18n/", JavaScriptCatalog.as_view(), name="javascript-catalog"),
+    # Readiness probe for the load balancer / orchestrator (see `manage.py serve`)
+    path("ready", readiness, name="ready"),
+    # Request metrics, Prometheus text format (see ouaf_app/metrics.py)
+    path("metrics", prometheus_metrics, name="metrics"),
 ]
 
 urlpatterns += i18n_patterns(
@@ -50,12 +55,14 @@ urlpatterns += i18n_patterns(
 )
 
 if settings.DEBUG:
-    from debug_toolbar.toolbar import debug_toolbar_urls
     # Dev
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) + debug_toolbar_urls()
+    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    if settings.DEBUG_TOOLBAR:
+        from debug_toolbar.toolbar import debug_toolbar_urls
+        urlpatterns += debug_toolbar_urls()
 else:
-    # Prod sans Nginx/Apache
+    # Prod: conditional GET, Range and optional X-Accel-Redirect/X-Sendfile offload (MEDIA_OFFLOAD)
     urlpatterns += [
-        re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
+        re_path(r'^media/(?P<path>.*)$', serve_media, name="media"),
     ]
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ouaf.settings')
 
 application = get_wsgi_application()
+
+if settings.WARMUP:
+    from ouaf_app import warmup
+
+    warmup.run_once()
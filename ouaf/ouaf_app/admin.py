@@ -3,11 +3,14 @@ from .models import *
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
-from .models import Person, Event, MemberPayment, Animal, OrganisationChartEntry
+from django.utils import timezone
+from .changelists import FastChangeListMixin
+from .models import Person, Event, MemberPayment, Animal, OrganisationChartEntry, OutboxEmail, \
+    NewsletterCampaign
 
 
 @admin.register(Person)
-class PersonAdmin(DjangoUserAdmin):
+class PersonAdmin(FastChangeListMixin, DjangoUserAdmin):
     list_display = ("username", "email", "first_name", "last_name",
                     "is_active", "is_staff", "is_superuser")
     list_filter = ("is_active", "is_staff", "is_superuser")
@@ -39,23 +42,48 @@ class PersonAdmin(DjangoUserAdmin):
 
 
 @admin.register(Event)
-class EventAdmin(admin.ModelAdmin):
+class EventAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ("summary", "start", "until", "organizer", "is_published")
     list_filter = ("is_published", "start")
     search_fields = ("summary", "description")
     date_hierarchy = "start"
+    ordering = ("-start",)
     autocomplete_fields = ("organizer", "attendees")  # pratique sur gros volumes
 
 
 @admin.register(MemberPayment)
-class MemberPaymentAdmin(admin.ModelAdmin):
+class MemberPaymentAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ("personId", "amount", "paymentDate")
     list_filter = ("paymentDate",)
     search_fields = ("personId__username", "personId__email")
     date_hierarchy = "paymentDate"
+    ordering = ("-paymentDate",)
     autocomplete_fields = ("personId",)
 
 
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ("request_id", "purpose", "subject", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status", "purpose")
+    search_fields = ("request_id", "subject")
+    readonly_fields = ("created_at", "sent_at")
+    actions = ["requeue"]
+
+    @admin.action(description="Remettre en file d'attente")
+    def requeue(self, request, queryset):
+        queryset.exclude(status=OutboxEmail.Status.SENT).update(
+            status=OutboxEmail.Status.QUEUED, attempts=0, next_attempt_at=timezone.now()
+        )
+
+
+@admin.register(NewsletterCampaign)
+class NewsletterCampaignAdmin(admin.ModelAdmin):
+    list_display = ("subject", "status", "created_at", "sent_count", "failed_count", "messages_per_second")
+    list_filter = ("status",)
+    readonly_fields = ("status", "started_at", "finished_at", "last_person_id", "sent_count", "failed_count",
+                       "messages_per_second")
+
+
 # @admin.register(OrganisationChartEntry)
 # class OrganisationChartEntryAdmin(admin.ModelAdmin):
 #     list_display = ("personId", "text")
@@ -66,4 +94,9 @@ admin.site.register(OrganisationChartEntry)
 admin.site.register(Activity)
 admin.site.register(ActivityCategory)
 admin.site.register(Animal)
-admin.site.register(AnimalMedia)
\ No newline at end of file
+
+
+@admin.register(AnimalMedia)
+class AnimalMediaAdmin(admin.ModelAdmin):
+    # __str__ shows the animal's name.
+    list_select_related = ("animal",)
@@ -8,7 +8,8 @@ class OuafAppConfig(AppConfig):
     name = 'ouaf_app'
 
     def ready(self):
-        from .signals import ensure_roles_and_permission
+        from .signals import create_cache_tables, ensure_roles_and_permission
+        post_migrate.connect(create_cache_tables, sender=self, dispatch_uid="ouaf_app_cache_tables")
         post_migrate.connect(ensure_roles_and_permission, sender=self, dispatch_uid="ouaf_app_post_migrate")
         # from . import signals
 
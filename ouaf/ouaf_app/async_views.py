@@ -0,0 +1,124 @@
+"""
+Async versions of the public read views and of the contact form, used instead
+of `ouaf_app.views` when ASYNC_VIEWS is on (set by `ouaf/asgi.py`).
+
+Queries go through the async ORM; templates are returned as TemplateResponse
+and rendered by Django (or the page cache) in a worker thread, since the
+template engine is synchronous. Nothing here waits on SMTP: the contact form
+only writes to the outbox (see `ouaf_app.outbox`).
+"""
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.core.paginator import InvalidPage, Page, Paginator
+from django.db import DatabaseError
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import aget_object_or_404
+from django.template.response import TemplateResponse
+
+from .models import OrganisationChartEntry, Activity, ActivityCategory, Animal, AnimalMedia, ActivityMedia, \
+    ImageRendition
+from . import instrumentation, renditions
+from .page_cache import cache_public_page
+from .views import ANIMALS_PAGE_SIZE, ActivitiesByCategoryView, ContactView
+
+
+@cache_public_page()
+async def index(request):
+    return TemplateResponse(request, "index.html")
+
+
+@cache_public_page()
+async def mediation_animale(request):
+    return TemplateResponse(request, "mediationAnimale.html")
+
+
+async def confidentialite(request):
+    return TemplateResponse(request, "confidentialite.html")
+
+
+@cache_public_page(OrganisationChartEntry, ImageRendition)
+async def organisation_chart(request):
+    members = [member async for member in OrganisationChartEntry.objects.all()]
+    await sync_to_async(renditions.prime)([member.photo.name for member in members])
+    return TemplateResponse(request, "organisationChart.html", {"organisation_members": members})
+
+
+@cache_public_page(ActivityCategory, ImageRendition)
+async def activity_category_list(request):
+    categories = [category async for category in ActivityCategory.objects.all()]
+    await sync_to_async(renditions.prime)([category.image.name for category in categories])
+    return TemplateResponse(request, "activities/list.html", {"categories": categories})
+
+
+@cache_public_page(Activity, ActivityMedia, ActivityCategory)
+async def activities_by_category(request, pk):
+    category = await aget_object_or_404(ActivityCategory, pk=pk)
+    activities = Activity.objects.filter(category=category).order_by("title", "id").prefetch_related("media")
+
+    paginator = Paginator(activities, ActivitiesByCategoryView.paginate_by)
+    # Paginator.count is a cached_property: fill it asynchronously.
+    paginator.count = await activities.acount()
+    try:
+        number = paginator.validate_number(request.GET.get("page") or 1)
+    except InvalidPage:
+        raise Http404("Invalid page")
+    offset = (number - 1) * paginator.per_page
+    items = [activity async for activity in activities[offset:offset + paginator.per_page]]
+    page = Page(items, number, paginator)
+
+    return TemplateResponse(request, "activities/by_category.html", {
+        "category": category,
+        "activities": items,
+        "object_list": items,
+        "page_obj": page,
+        "paginator": paginator,
+        "is_paginated": paginator.num_pages > 1,
+    })
+
+
+@cache_public_page(Animal, AnimalMedia, ImageRendition)
+async def animal_list(request):
+    """Same keyset pagination as `views.animal_list`."""
+    animals = Animal.objects.select_related("cover").order_by("id")
+    after = request.GET.get("after", "")
+    if after.isdigit():
+        animals = animals.filter(id__gt=int(after))
+
+    page = [animal async for animal in animals[:ANIMALS_PAGE_SIZE + 1]]
+    next_after = page[ANIMALS_PAGE_SIZE - 1].id if len(page) > ANIMALS_PAGE_SIZE else None
+    page = page[:ANIMALS_PAGE_SIZE]
+    await sync_to_async(renditions.prime)([animal.cover.file.name for animal in page if animal.cover])
+    return TemplateResponse(request, "animals/list.html",
+                            {"animals": page, "next_after": next_after})
+
+
+@cache_public_page(Animal, AnimalMedia, ImageRendition)
+async def animal_detail(request, animal_id):
+    animal = await aget_object_or_404(Animal.objects.select_related("cover"), id=animal_id)
+    medias = [media async for media in animal.media.all()]
+    return TemplateResponse(request, "animals/detail.html", {"animal": animal, "medias": medias})
+
+
+class AsyncContactView(ContactView):
+    """ContactView with async handlers: validation in the event loop, outbox write in a thread."""
+
+    async def get(self, request, *args, **kwargs):
+        return self.render_to_response(self.get_context_data())
+
+    async def post(self, request, *args, **kwargs):
+        form = self.get_form()
+        if not form.is_valid():
+            return self.form_invalid(form)
+
+        with instrumentation.phase("mail"):
+            req_id, emails = await sync_to_async(self.build_emails)(form.cleaned_data)
+            try:
+                await sync_to_async(self.queue_emails)(req_id, emails)
+            except DatabaseError:
+                return self.queue_failed(form, req_id)
+
+        messages.success(request, self.MODE_CONFIG[self._mode()]["success"])
+        return HttpResponseRedirect(self.get_success_url())
+
+    async def put(self, *args, **kwargs):
+        return await self.post(*args, **kwargs)
@@ -0,0 +1,68 @@
+"""
+Cross-request cache of the groups and permissions of each user.
+
+Backoffice pages check the user's groups (BackofficeAccessRequiredMixin,
+Person.belongs_to_group) and permissions (PermissionRequiredMixin and `perms`
+in templates, through `ouaf_app.backends.CachedModelBackend`) on every
+request. Both read a single cache entry per user:
+
+    authcache:<version>:<user id>  ->  {"groups": {...}, "perms": {...}}
+
+The version is bumped whenever group memberships or group permissions change
+(see `ouaf_app.signals`), which drops every entry at once; saving a Person only
+drops that person's entry. Within a request the entry is memoised on the user
+object, so a warm backoffice page makes no authorization query.
+"""
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = "authcache:version"
+TIMEOUT = 60 * 60
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _key(user_id):
+    return f"authcache:{_version()}:{user_id}"
+
+
+def bump_version():
+    """Invalidate the cached authorizations of every user."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def forget(user_id):
+    """Invalidate the cached authorizations of one user."""
+    cache.delete(_key(user_id))
+
+
+def _load(user):
+    # Imported here: django.contrib.auth.backends needs the user model, which imports this module.
+    from django.contrib.auth.backends import ModelBackend
+
+    return {
+        "groups": frozenset(user.groups.values_list("name", flat=True)),
+        "perms": frozenset(ModelBackend().get_all_permissions(user)),
+    }
+
+
+def get_authorizations(user):
+    """Return {"groups": frozenset of names, "perms": frozenset of "app_label.codename"}."""
+    if getattr(user, "_authorizations", None) is None:
+        key = _key(user.pk)
+        data = cache.get(key)
+        if data is None:
+            data = _load(user)
+            cache.set(key, data, TIMEOUT)
+        user._authorizations = data
+    return user._authorizations
@@ -0,0 +1,12 @@
+from django.contrib.auth.backends import ModelBackend
+
+from . import auth_cache
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose permission lookups are served from the authorization cache."""
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        return set(auth_cache.get_authorizations(user_obj)["perms"])
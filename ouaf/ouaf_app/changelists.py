@@ -0,0 +1,172 @@
+"""
+Admin changelists that stay fast on large tables (millions of member
+payments): `FastChangeListMixin`, for their ModelAdmins.
+
+    - Counts: `EstimatedCountPaginator` counts exactly only small result sets.
+      Above ADMIN_COUNT_ESTIMATE_ABOVE rows it uses PostgreSQL's estimate:
+      the table statistics (pg_class.reltuples) for the whole table, or the
+      planner's estimate (EXPLAIN) for a filtered or searched list. The total
+      without filters ("N au total") and the filter facets aren't counted.
+    - Related rows: the foreign keys of list_display are loaded with the rows,
+      nullable ones too (Django's default select_related() skips them).
+    - date_hierarchy: the years, months or days with rows are found by index
+      probes (`periods()`), one LIMIT 1 per period in a single UNION query,
+      instead of a DISTINCT over every row.
+
+The search fields and the date_hierarchy field need indexes: a trigram index
+on UPPER(field) for search (icontains is UPPER(field) LIKE UPPER('%...%')), a
+b-tree on the date (with the primary key, for the ordering).
+
+An estimated count is approximate: the last pages of a filtered list may be
+empty.
+
+Settings:
+    ADMIN_COUNT_ESTIMATE_ABOVE (int) : count exactly up to this many rows (default 10000).
+"""
+import copy
+import datetime
+import json
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.templatetags import admin_list
+from django.contrib.admin.utils import get_fields_from_path
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections, models
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+ESTIMATE_ABOVE = 10000
+
+
+def estimated_count(queryset):
+    """PostgreSQL's estimate of the number of rows of `queryset`, or None (table never analyzed)."""
+    if not queryset.query.where:
+        connection = connections[queryset.db]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                           [connection.ops.quote_name(queryset.model._meta.db_table)])
+            row = cursor.fetchone()
+        # -1: never vacuumed nor analyzed.
+        return int(row[0]) if row and row[0] >= 0 else None
+    plan = json.loads(queryset.order_by().explain(format="json"))
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def large_estimate(queryset):
+    """The estimated number of rows of `queryset` when above ADMIN_COUNT_ESTIMATE_ABOVE, otherwise None."""
+    estimate = estimated_count(queryset)
+    if estimate is not None and estimate > getattr(settings, "ADMIN_COUNT_ESTIMATE_ABOVE", ESTIMATE_ABOVE):
+        return estimate
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """A Paginator whose count is PostgreSQL's estimate above ADMIN_COUNT_ESTIMATE_ABOVE rows."""
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, models.QuerySet):
+            return super().count
+        return large_estimate(self.object_list) or self.object_list.count()
+
+
+def _period_start(day, kind):
+    return day.replace(month=1, day=1) if kind == "year" else day.replace(day=1) if kind == "month" else day
+
+
+def _next_period(start, kind):
+    if kind == "year":
+        return start.replace(year=start.year + 1)
+    if kind == "month":
+        return (start + datetime.timedelta(days=31)).replace(day=1)
+    return start + datetime.timedelta(days=1)
+
+
+def periods(queryset, field_name, kind, bounds=None):
+    """
+    The first days of the years, months or days (`kind`) holding rows of
+    `queryset`, like `queryset.dates(field_name, kind)` but without reading
+    every row: one index probe per period between the first and last dates
+    (`bounds`: {"first": ..., "last": ...} when already known).
+    """
+    queryset = queryset.order_by()
+    bounds = bounds or queryset.aggregate(first=Min(field_name), last=Max(field_name))
+    if bounds["first"] is None:
+        return []
+    field = get_fields_from_path(queryset.model, field_name)[-1]
+    is_datetime = isinstance(field, models.DateTimeField)
+    aware = is_datetime and settings.USE_TZ
+
+    def day(value):
+        # The date of a value in the current time zone, as queryset.datetimes() truncates.
+        return (timezone.localtime(value) if aware else value).date() if is_datetime else value
+
+    def bound(start):
+        if not is_datetime:
+            return start
+        moment = datetime.datetime.combine(start, datetime.time())
+        return timezone.make_aware(moment) if aware else moment
+
+    starts = [_period_start(day(bounds["first"]), kind)]
+    while (end := _next_period(starts[-1], kind)) <= day(bounds["last"]):
+        starts.append(end)
+    # With many rows, each probe walks the date's index (ordered LIMIT 1) rather than a scan that may read the
+    # earlier periods first; with few (a search), it starts from them, the planner picks how.
+    ordering = (field_name,) if large_estimate(queryset) else ()
+    probes = [
+        queryset.filter(**{f"{field_name}__gte": bound(start), f"{field_name}__lt": bound(_next_period(start, kind))})
+        .order_by(*ordering).values_list(field_name, flat=True)[:1]
+        for start in starts
+    ]
+    found = probes[0].union(*probes[1:], all=True) if len(probes) > 1 else probes[0]
+    return sorted({_period_start(day(value), kind) for value in found})
+
+
+class _ProbedDates:
+    """A queryset whose dates()/datetimes() come from `periods()`."""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+        self.bounds = None
+
+    def aggregate(self, **kwargs):
+        # date_hierarchy() starts with the first and last dates: periods() doesn't query them again.
+        self.bounds = self.queryset.aggregate(**kwargs)
+        return self.bounds
+
+    def dates(self, field_name, kind):
+        return periods(self.queryset, field_name, kind, self.bounds)
+
+    datetimes = dates
+
+
+def date_hierarchy(cl):
+    """admin_list.date_hierarchy() with the periods of `periods()` (the {% probed_date_hierarchy %} tag)."""
+    cl = copy.copy(cl)
+    cl.queryset = _ProbedDates(cl.queryset)
+    return admin_list.date_hierarchy(cl)
+
+
+class FastChangeListMixin:
+    """ModelAdmin mixin for the changelists of large tables (see the module docstring)."""
+
+    change_list_template = "admin/ouaf_app/fast_change_list.html"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+
+    def get_list_select_related(self, request):
+        if self.list_select_related is not False:
+            return self.list_select_related
+        related = []
+        for name in self.get_list_display(request):
+            try:
+                field = self.model._meta.get_field(name) if isinstance(name, str) else None
+            except FieldDoesNotExist:
+                continue
+            if field is not None and field.many_to_one:
+                related.append(name)
+        return related
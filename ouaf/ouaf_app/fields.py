@@ -0,0 +1,114 @@
+"""
+Model and form fields.
+
+`PhoneNumberField` behaves like phonenumber_field's, but doesn't import
+`phonenumbers` (the largest import of the app) when the models are loaded:
+the library is imported the first time a number is parsed, saved, validated
+or edited in a form. Loading a Person from the database keeps the raw string
+until the attribute is read.
+
+`PhoneNumberFormField` does the same for forms: declared in a form class (or
+made by the model field's formfield()), it becomes phonenumber_field's form
+field when a form is instantiated, not when the forms module is imported with
+the URLconf.
+"""
+from django import forms
+from django.conf import settings
+from django.core import checks
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+def _to_python(value, region=None):
+    from phonenumber_field.phonenumber import to_python
+
+    return to_python(value, region=region)
+
+
+def validate_phone_number(value):
+    from phonenumber_field.validators import validate_international_phonenumber
+
+    validate_international_phonenumber(value)
+
+
+class PhoneNumberFormField(forms.CharField):
+    """Placeholder for phonenumber_field's form field, built with the same arguments in each form instance."""
+
+    def __init__(self, **kwargs):
+        self.kwargs = kwargs
+        super().__init__(required=kwargs.get("required", True), label=kwargs.get("label"))
+
+    def __deepcopy__(self, memo):
+        # BaseForm.__init__ deep-copies the class' fields: here is the first use of a form.
+        from phonenumber_field.formfields import PhoneNumberField
+
+        return PhoneNumberField(**self.kwargs)
+
+
+class PhoneNumberDescriptor:
+    """Turn the stored string into a PhoneNumber when the attribute is first read."""
+
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        if self.field.name not in instance.__dict__:
+            instance.refresh_from_db(fields=[self.field.name])
+        value = instance.__dict__[self.field.name]
+        if isinstance(value, str) and value:
+            value = instance.__dict__[self.field.name] = _to_python(value, region=self.field.region)
+        return value
+
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.name] = value
+
+
+class PhoneNumberField(models.CharField):
+    descriptor_class = PhoneNumberDescriptor
+    default_validators = [validate_phone_number]
+    description = _("Phone number")
+
+    def __init__(self, *args, region=None, **kwargs):
+        kwargs.setdefault("max_length", 128)
+        super().__init__(*args, **kwargs)
+        self._region = region
+
+    @property
+    def region(self):
+        return self._region or getattr(settings, "PHONENUMBER_DEFAULT_REGION", None)
+
+    def check(self, **kwargs):
+        from phonenumber_field.phonenumber import validate_region
+
+        errors = super().check(**kwargs)
+        try:
+            validate_region(self.region)
+        except ValueError as error:
+            errors.append(checks.Error(str(error), obj=self))
+        return errors
+
+    def to_python(self, value):
+        return _to_python(value, region=self.region)
+
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if not value:
+            return value
+        if not value.is_valid():
+            # Stored as typed, like phonenumber_field does.
+            return value.raw_input
+        from phonenumber_field.phonenumber import PhoneNumber
+
+        return value.format_as(PhoneNumber.format_map[getattr(settings, "PHONENUMBER_DB_FORMAT", "E164")])
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs["region"] = self._region
+        return name, path, args, kwargs
+
+    def formfield(self, **kwargs):
+        defaults = {"form_class": PhoneNumberFormField, "region": self.region, "error_messages": self.error_messages}
+        defaults.update(kwargs)
+        return super().formfield(**defaults)
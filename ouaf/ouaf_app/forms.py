@@ -1,9 +1,8 @@
 from django.contrib.auth.forms import UserCreationForm
 from django.forms.widgets import PasswordInput
+from .fields import PhoneNumberFormField as PhoneFormField
 from .models import Person
 from django import forms
-import phonenumbers
-from phonenumber_field.formfields import PhoneNumberField as PhoneFormField
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
 import time
@@ -150,6 +149,8 @@ class ContactForm(forms.Form):
         raw = self.cleaned_data.get("phone", "").strip()
         if not raw:
             return ""
+        import phonenumbers  # Not at import time: the largest import of the app (see ouaf_app.fields).
+
         try:
             number = phonenumbers.parse(raw, "FR")
             if not phonenumbers.is_possible_number(number) or not phonenumbers.is_valid_number(number):
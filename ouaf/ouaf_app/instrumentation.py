@@ -0,0 +1,167 @@
+"""
+Per-request measurements: number of SQL queries, time spent in SQL, time
+spent rendering templates, and total time.
+
+    with instrumentation.measure() as m:
+        client.get("/fr/animals/list")
+    m.queries, m.sql_ms, m.template_ms, m.total_ms
+
+or, around a request handled by a middleware, `start()` / `stop()`. Other
+costly steps are timed by name with `phase()`:
+
+    with instrumentation.phase("media"):
+        ...
+
+The current measurement lives in a context variable, so concurrent requests
+(threads or asyncio tasks) each count their own queries, and the threads of
+sync_to_async() count for the request that started them. Measurements nest:
+a query or a render counts for the current one and those around it.
+
+`install()` (idempotent, called by `start()`) adds `record_query` to the
+execute wrappers of every database connection, the ones opened later too,
+and wraps `Template.render`, counting only the outermost template of each
+render (includes and parents are part of it). Without an active measurement
+each costs one context variable lookup.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import wraps
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+_current = ContextVar("ouaf_measure", default=None)
+_installed = False
+
+
+@dataclass
+class Measure:
+    queries: int = 0
+    sql_ms: float = 0.0
+    template_ms: float = 0.0
+    total_ms: float = 0.0
+    templates: list = field(default_factory=list)
+    # {phase name: ms}, see `phase()`.
+    phases: dict = field(default_factory=dict)
+    # SQL of each query, kept only when asked for (see `measure(keep_sql=True)`).
+    sql: list = None
+    parent: "Measure" = field(default=None, repr=False)
+    _template_depth: int = 0
+    _start: float = 0.0
+    _token: object = field(default=None, repr=False)
+
+    def as_dict(self):
+        return {
+            "queries": self.queries,
+            "sql_ms": round(self.sql_ms, 2),
+            "template_ms": round(self.template_ms, 2),
+            "total_ms": round(self.total_ms, 2),
+        }
+
+
+def current():
+    """The active Measure, or None."""
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding the query to the active measurements."""
+    measure = _current.get()
+    if measure is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        while measure is not None:
+            measure.queries += 1
+            measure.sql_ms += elapsed
+            if measure.sql is not None:
+                measure.sql.append(sql)
+            measure = measure.parent
+
+
+def _wrap_connection(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install():
+    """Record queries and template renders (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
+    # Wrappers belong to the connection object (one per thread and alias): wrap this thread's, and the next ones.
+    for connection in connections.all():
+        _wrap_connection(connection)
+    connection_created.connect(_wrap_connection, dispatch_uid="ouaf_app_instrumentation")
+
+    render = Template.render
+
+    @wraps(render)
+    def timed_render(self, context):
+        measure = _current.get()
+        if measure is None:
+            return render(self, context)
+        measure._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return render(self, context)
+        finally:
+            measure._template_depth -= 1
+            if not measure._template_depth:
+                elapsed = (time.perf_counter() - start) * 1000
+                measure.templates.append(self.name)
+                while measure is not None:
+                    measure.template_ms += elapsed
+                    measure = measure.parent
+
+    Template.render = timed_render
+
+
+def start(keep_sql=False):
+    """Start a measurement in the current context; complete it with `stop()`."""
+    install()
+    result = Measure(sql=[] if keep_sql else None, parent=_current.get())
+    result._token = _current.set(result)
+    result._start = time.perf_counter()
+    return result
+
+
+def stop(measure):
+    measure.total_ms = (time.perf_counter() - measure._start) * 1000
+    _current.reset(measure._token)
+    return measure
+
+
+@contextmanager
+def phase(name):
+    """Add the time of the enclosed code to the `name` phase of the active measurements."""
+    measure = _current.get()
+    if measure is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - start) * 1000
+        while measure is not None:
+            measure.phases[name] = measure.phases.get(name, 0.0) + elapsed
+            measure = measure.parent
+
+
+@contextmanager
+def measure(keep_sql=False):
+    """Measure the enclosed code; the yielded Measure is complete once the block exits."""
+    result = start(keep_sql)
+    try:
+        yield result
+    finally:
+        stop(result)
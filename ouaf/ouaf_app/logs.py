@@ -0,0 +1,129 @@
+"""
+Logging: one line per record, tagged with the ID of the request that logged
+it, written by a background thread.
+
+`RequestIdMiddleware` (ouaf_app.middleware) gives every request an ID, the
+one of the REQUEST_ID_HEADER request header when it looks valid (set by a
+proxy upstream), otherwise a new one, and sends it back in the X-Request-ID
+response header. `RequestIdFilter` adds it to the records as `request_id`,
+also those logged in the threads of sync_to_async().
+
+`QueueHandler` formats the records in the thread that logs them (JSON lines
+with `JsonFormatter`) and puts them on a bounded queue; a QueueListener
+thread writes them to the stream. A worker never waits for a slow stdout
+pipe: when the queue is full, records are dropped and counted (`dropped`).
+
+The configuration is LOGGING, in the settings:
+    LOG_LEVEL (str)         : level of the root logger (default INFO).
+    LOG_FORMAT (str)        : "json" or "text" (default: text with DEBUG, json otherwise).
+    REQUEST_ID_HEADER (str) : request header with the ID set upstream (default X-Request-ID, empty: ignore).
+"""
+import atexit
+import contextlib
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import sys
+import uuid
+from contextvars import ContextVar
+
+_request_id = ContextVar("ouaf_request_id", default=None)
+
+_VALID_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+# Attributes of every LogRecord: the others come from `extra`.
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+
+def request_id():
+    """ID of the current request, or None."""
+    return _request_id.get()
+
+
+def new_request_id(incoming=None):
+    """`incoming` if it looks like a request ID, otherwise a new one."""
+    if incoming and _VALID_ID.fullmatch(incoming):
+        return incoming
+    return uuid.uuid4().hex
+
+
+def set_request_id(value):
+    """Make `value` the current request ID; return a token for `reset_request_id()`."""
+    return _request_id.set(value)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+class RequestIdFilter(logging.Filter):
+    """Add the current request ID to the records (unless given in `extra`)."""
+
+    def filter(self, record):
+        if getattr(record, "request_id", None) is None:
+            # django.request logs the response once the middleware is done, with the request in `extra`.
+            record.request_id = getattr(getattr(record, "request", None), "request_id", None) or _request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """A JSON object per record: time, level, logger, message, request ID, exception and `extra` values."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        entry.update((key, value) for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Stopping waits for room in a full queue (a little): the queued records are written first.
+        self.queue.put(self._sentinel, timeout=5)
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Format records here and write them to `stream` from a QueueListener
+    thread. At most `maxsize` records wait; the next ones are dropped.
+    """
+
+    def __init__(self, stream=None, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self._start()
+        atexit.register(self.close)
+        # The thread doesn't survive a fork (gunicorn workers): each worker starts its own.
+        os.register_at_fork(after_in_child=self._start)
+
+    def _start(self):
+        self.queue = queue.Queue(self.maxsize)
+        self.listener = _Listener(self.queue, self.target)
+        self.listener.start()
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if self.listener is not None:
+            # Writes what is still queued.
+            with contextlib.suppress(queue.Full):
+                self.listener.stop()
+            self.listener = None
+        super().close()
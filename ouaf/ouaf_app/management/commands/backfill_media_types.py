@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from ouaf_app import page_cache
+from ouaf_app.models import ActivityMedia, Animal, AnimalMedia
+
+
+class Command(BaseCommand):
+    help = ("Detect and store the kind/mime of existing activity and animal media from their first bytes, in batches "
+            "(migration 0019 guessed them from the extension: use --all once after it).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--all", action="store_true",
+                            help="Re-detect every media, not only the ones without a kind.")
+
+    def handle(self, *args, **options):
+        for model in (ActivityMedia, AnimalMedia):
+            total = self._backfill(model, options["batch_size"], options["all"])
+            self.stdout.write(f"{model.__name__}: {total} media updated")
+        page_cache.invalidate(ActivityMedia, Animal, AnimalMedia)
+
+    def _backfill(self, model, batch_size, redetect_all):
+        queryset = model.objects.order_by("pk")
+        if not redetect_all:
+            queryset = queryset.filter(kind="")
+
+        total = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk)[:batch_size])
+            if not batch:
+                return total
+            for media in batch:
+                media.detect_type()
+            model.objects.bulk_update(batch, ["kind", "mime"])
+            if model is AnimalMedia:
+                # bulk_update sends no signal: refresh the covers ourselves.
+                animal_ids = {media.animal_id for media in batch}
+                Animal.objects.filter(pk__in=animal_ids).update(cover=AnimalMedia.first_image("animal"))
+            last_pk = batch[-1].pk
+            total += len(batch)
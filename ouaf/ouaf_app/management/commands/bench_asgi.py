@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+import queue
+import socketserver
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils import translation
+
+from ouaf_app import outbox
+from ouaf_app.models import OutboxEmail
+
+MODES = ("wsgi", "wsgi-inline", "asgi")
+
+
+class SlowSMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib, answering DATA after `server.delay` seconds."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.reply("220 bench ESMTP")
+        while line := self.rfile.readline():
+            command = line.decode(errors="replace").strip().upper()
+            if command.startswith("EHLO") or command.startswith("HELO"):
+                self.reply("250 bench")
+            elif command.startswith("DATA"):
+                self.reply("354 end with .")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                time.sleep(self.server.delay)
+                self.server.delivered += 1
+                self.reply("250 queued")
+            elif command.startswith("QUIT"):
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class SlowSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay):
+        super().__init__(("127.0.0.1", 0), SlowSMTPHandler)
+        self.delay = delay
+        self.delivered = 0
+
+
+class Command(BaseCommand):
+    help = ("Compare the sync (WSGI) and async (ASGI) request paths at high concurrency, with the outbox "
+            "worker sending to a local SMTP stand-in that answers slowly. 'wsgi-inline' also sends each "
+            "contact request's emails before answering, as ContactView did before the outbox.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--mode", choices=MODES, action="append", help="Mode(s) to run (default: all).")
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=200, help="Clients sending requests in a loop.")
+        parser.add_argument("--threads", type=int, default=8,
+                            help="Worker threads of the WSGI server (ASGI serves every request in flight).")
+        parser.add_argument("--post-ratio", type=float, default=0.2, help="Share of contact form submissions.")
+        parser.add_argument("--smtp-delay", type=float, default=0.5, help="Seconds the SMTP stand-in takes per message.")
+        parser.add_argument("--child", choices=MODES, help="Internal: run one mode and print its results as JSON.")
+        parser.add_argument("--smtp-port", type=int, help="Internal.")
+
+    def handle(self, *args, **options):
+        if options["child"]:
+            return self._child(options)
+
+        smtp = SlowSMTPServer(options["smtp_delay"])
+        threading.Thread(target=smtp.serve_forever, daemon=True).start()
+        first_id = (OutboxEmail.objects.order_by("-id").values_list("id", flat=True).first() or 0)
+        try:
+            self.stdout.write(f"{'mode':<13}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                              f"{'errors':>8}{'queued':>8}{'sent':>6}")
+            for mode in options["mode"] or MODES:
+                result = self._spawn(mode, smtp.server_address[1], options)
+                # What's left unsent mustn't be sent by the next mode's requests.
+                OutboxEmail.objects.filter(id__gt=first_id).delete()
+                self.stdout.write(
+                    f"{mode:<13}{result['throughput']:>8.1f}{result['p50']:>9.1f}{result['p95']:>9.1f}"
+                    f"{result['p99']:>9.1f}{result['errors']:>8}{result['queued']:>8}{result['sent']:>6}"
+                )
+        finally:
+            smtp.shutdown()
+            OutboxEmail.objects.filter(id__gt=first_id).delete()
+        self.stdout.write(f"SMTP stand-in: {smtp.delivered} messages, {options['smtp_delay']}s each.")
+
+    def _spawn(self, mode, smtp_port, options):
+        # Each mode runs in its own process: the URLconf picks the sync or async views at import time.
+        env = dict(os.environ, DJANGO_ASYNC_VIEWS="true" if mode == "asgi" else "false")
+        argv = [sys.executable, os.path.join(settings.BASE_DIR, "manage.py"), "bench_asgi", "--child", mode,
+                "--smtp-port", str(smtp_port)]
+        for name in ("requests", "concurrency", "threads", "post_ratio"):
+            argv += [f"--{name.replace('_', '-')}", str(options[name])]
+        completed = subprocess.run(argv, env=env, capture_output=True, text=True)
+        if completed.returncode:
+            raise CommandError(f"{mode} run failed:\n{completed.stderr}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    # --- child process -------------------------------------------------------------------------------------------
+
+    def _child(self, options):
+        mode = options["child"]
+        if settings.ASYNC_VIEWS != (mode == "asgi"):
+            raise CommandError("DJANGO_ASYNC_VIEWS doesn't match the mode.")
+        self.smtp_port = options["smtp_port"]
+        # The test clients' host, as the test runner does.
+        settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "testserver"]
+        with translation.override("fr"):
+            pages = [reverse(name) for name in ("index", "animals_list", "activities_list", "organisation_chart")]
+            self.contact_url = reverse("contact")
+        every = round(1 / options["post_ratio"]) if options["post_ratio"] else 0
+        plan = [("post", self.contact_url) if every and i % every == 0 else ("get", pages[i % len(pages)])
+                for i in range(options["requests"])]
+
+        # The outbox worker runs alongside, as in production (inline mode sends from the requests instead).
+        self.sent, self.lock = 0, threading.Lock()
+        stop = threading.Event()
+        worker = threading.Thread(target=self._outbox_worker, args=(stop,), daemon=True)
+        if mode != "wsgi-inline":
+            worker.start()
+        start = time.perf_counter()
+        if mode == "asgi":
+            latencies, errors = asyncio.run(self._run_async(plan, options["concurrency"]))
+        else:
+            latencies, errors = self._run_sync(plan, options["concurrency"], options["threads"],
+                                               inline=mode == "wsgi-inline")
+        elapsed = time.perf_counter() - start
+        stop.set()
+        if worker.is_alive():
+            worker.join()
+
+        ordered = sorted(latencies) or [0]
+        posts = sum(1 for method, _ in plan if method == "post")
+        self.stdout.write(json.dumps({
+            "throughput": len(plan) / elapsed,
+            "p50": statistics.median(ordered),
+            "p95": ordered[int(len(ordered) * .95)],
+            "p99": ordered[int(len(ordered) * .99)],
+            "errors": errors,
+            "queued": posts * 2,
+            "sent": self.sent,
+        }))
+
+    def _smtp(self):
+        return get_connection("django.core.mail.backends.smtp.EmailBackend", host="127.0.0.1", port=self.smtp_port,
+                              username="", password="", use_tls=False, use_ssl=False, timeout=30)
+
+    def _count_sent(self, sent):
+        with self.lock:
+            self.sent += sent
+
+    def _outbox_worker(self, stop):
+        # Small batches, so that the worker stops with the run instead of draining the whole outbox.
+        smtp = self._smtp()
+        try:
+            while not stop.is_set():
+                if batch := outbox.claim(5):
+                    self._count_sent(outbox.send_batch(batch, smtp)[0])
+                else:
+                    stop.wait(0.2)
+        finally:
+            smtp.close()
+            connections.close_all()
+
+    def _contact_data(self, i):
+        return {
+            "honeypot": "", "ts": int(time.time()) - 10, "first_name": "Bench", "last_name": f"Client {i}",
+            "email": f"bench-{os.getpid()}-{i}@example.org", "phone": "+33612345678", "message": "Benchmark",
+        }
+
+    def _request(self, client, i, method, path):
+        if method == "post":
+            # One address per submission: the contact rate limits must not kick in.
+            ip = f"fd00::{os.getpid():x}:{i:x}"
+            return client.post(path, self._contact_data(i), headers={"X-Forwarded-For": ip})
+        return client.get(path)
+
+    def _run_sync(self, plan, concurrency, threads, inline):
+        """`concurrency` clients sending requests one after the other, served by `threads` threads."""
+        latencies, errors = [], []
+        jobs = iter(enumerate(plan))
+        waiting = queue.Queue()
+        start = time.perf_counter()
+        # Each client's next request arrives when its previous one is answered, and waits for a free thread.
+        for _ in range(concurrency):
+            waiting.put((next(jobs, None), start))
+
+        def worker():
+            client, count = Client(), 0
+            try:
+                while (item := waiting.get()) and item[0] is not None:
+                    (i, (method, path)), arrived = item
+                    response = self._request(client, i, method, path)
+                    if inline and method == "post":
+                        # What the view used to do: wait for SMTP before answering.
+                        self._count_sent(outbox.process(batch_size=2, connection=self._smtp())[0])
+                    done = time.perf_counter()
+                    latencies.append((done - arrived) * 1000)
+                    count += response.status_code >= 400
+                    waiting.put((next(jobs, None), done))
+            finally:
+                connections.close_all()
+            errors.append(count)
+            # Wake up the next thread: there is nothing left to do.
+            waiting.put((None, None))
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return latencies, sum(errors)
+
+    async def _run_async(self, plan, concurrency):
+        client = AsyncClient()
+        slots = asyncio.Semaphore(concurrency)
+        latencies, errors = [], 0
+
+        async def one(i, method, path):
+            nonlocal errors
+            async with slots:
+                start = time.perf_counter()
+                response = await self._request(client, i, method, path)
+                latencies.append((time.perf_counter() - start) * 1000)
+                errors += response.status_code >= 400
+
+        await asyncio.gather(*(one(i, method, path) for i, (method, path) in enumerate(plan)))
+        return latencies, errors
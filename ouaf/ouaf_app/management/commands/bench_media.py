@@ -0,0 +1,71 @@
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from django.views.static import serve
+
+from ouaf_app.media_serving import serve_media
+
+
+class Command(BaseCommand):
+    help = ("Compare how long a worker is occupied per media request with django.views.static.serve "
+            "and with serve_media (full, range, conditional and offloaded responses).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--size-mb", type=float, default=8.0, help="Size of the served file.")
+        parser.add_argument("--requests", type=int, default=20)
+        parser.add_argument("--client-kbps", type=int, default=0,
+                            help="Simulate a client reading at this speed (0 = as fast as possible).")
+
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        n = options["requests"]
+        delay_per_byte = 1 / (options["client_kbps"] * 1024) if options["client_kbps"] else 0
+
+        with tempfile.TemporaryDirectory() as root:
+            name = "bench/video.mp4"
+            path = Path(root, name)
+            path.parent.mkdir(parents=True)
+            path.write_bytes(b"\0" * int(options["size_mb"] * 1024 * 1024))
+            stat = path.stat()
+            etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+            cases = [
+                ("static.serve, full file", {}, lambda r: serve(r, name, document_root=root), {}),
+                ("serve_media, full file", {}, lambda r: serve_media(r, name), {}),
+                ("serve_media, 1 MB range", {"HTTP_RANGE": "bytes=0-1048575"}, lambda r: serve_media(r, name), {}),
+                ("serve_media, If-None-Match", {"HTTP_IF_NONE_MATCH": etag}, lambda r: serve_media(r, name), {}),
+                ("serve_media, X-Accel-Redirect", {}, lambda r: serve_media(r, name),
+                 {"MEDIA_OFFLOAD": "x-accel-redirect"}),
+            ]
+
+            self.stdout.write(f"{'case':<32}{'status':>8}{'mean ms':>12}{'p95 ms':>12}{'bytes':>14}")
+            with override_settings(MEDIA_ROOT=root):
+                for label, headers, view, overrides in cases:
+                    with override_settings(**overrides):
+                        timings, status, sent = self._run(factory, view, headers, n, delay_per_byte)
+                    p95 = sorted(timings)[max(0, int(len(timings) * 0.95) - 1)]
+                    self.stdout.write(f"{label:<32}{status:>8}{statistics.mean(timings):>12.2f}{p95:>12.2f}"
+                                      f"{sent:>14}")
+
+    @staticmethod
+    def _run(factory, view, headers, n, delay_per_byte):
+        """A worker is busy from the call to the view until the last body byte is handed to the client."""
+        timings = []
+        status = sent = 0
+        for _ in range(n):
+            request = factory.get("/media/bench/video.mp4", **headers)
+            start = time.perf_counter()
+            response = view(request)
+            sent = 0
+            for chunk in response:
+                sent += len(chunk)
+                if delay_per_byte:
+                    time.sleep(len(chunk) * delay_per_byte)
+            response.close()
+            timings.append((time.perf_counter() - start) * 1000)
+            status = response.status_code
+        return timings, status, sent
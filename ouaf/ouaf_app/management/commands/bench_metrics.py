@@ -0,0 +1,81 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory
+from django.urls import resolve
+
+from ouaf_app import instrumentation, metrics
+from ouaf_app.middleware import MetricsMiddleware, ServerTimingMiddleware
+
+
+def _per_call_us(function, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def _best(function, calls, rounds=5):
+    return min(_per_call_us(function, calls) for _ in range(rounds))
+
+
+def middleware_overhead(calls=20000, middleware_class=MetricsMiddleware):
+    """µs `middleware_class` adds to a request (the view answers right away)."""
+    request = RequestFactory().get("/ready")
+    request.resolver_match = resolve("/ready")
+
+    def view(request):
+        return HttpResponse()
+
+    middleware = middleware_class(view)
+    try:
+        return _best(lambda: middleware(request), calls) - _best(lambda: view(request), calls)
+    finally:
+        metrics.reset()
+
+
+def query_overhead(calls=200000):
+    """µs `record_query` adds to a query: (without a measurement, during one)."""
+    def execute(sql, params, many, context):
+        return None
+
+    def wrapped():
+        instrumentation.record_query(execute, "SELECT 1", None, False, {})
+
+    bare = _best(lambda: execute("SELECT 1", None, False, {}), calls)
+    idle = _best(wrapped, calls)
+    with instrumentation.measure():
+        active = _best(wrapped, calls)
+    return idle - bare, active - bare
+
+
+def template_overhead(calls=20000):
+    """µs the render wrapper adds to a template render: (without a measurement, during one)."""
+    instrumentation.install()
+    template = Template("{{ name }}")
+    context = Context({"name": "Rex"})
+    render = Template.render.__wrapped__
+    bare = _best(lambda: render(template, context), calls)
+    idle = _best(lambda: template.render(context), calls)
+    with instrumentation.measure():
+        active = _best(lambda: template.render(context), calls)
+    return idle - bare, active - bare
+
+
+class Command(BaseCommand):
+    help = ("Measure the cost of the request metrics and of the Server-Timing breakdown: per request (middleware), "
+            "per SQL query and per template.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--calls", type=int, default=20000)
+
+    def handle(self, *args, **options):
+        calls = options["calls"]
+        self.stdout.write(f"metrics middleware:  {middleware_overhead(calls):6.2f} µs per request")
+        self.stdout.write(f"Server-Timing:       {middleware_overhead(calls, ServerTimingMiddleware):6.2f} µs per request")
+        idle, active = query_overhead(calls)
+        self.stdout.write(f"query wrapper:       {idle:6.2f} µs per query ({active:.2f} µs while measured)")
+        idle, active = template_overhead(calls)
+        self.stdout.write(f"template wrapper:    {idle:6.2f} µs per render ({active:.2f} µs while measured)")
@@ -0,0 +1,76 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ouaf_app import ratelimit
+
+
+class Command(BaseCommand):
+    help = ("Measure the per-request overhead of the rate limiter and check that concurrent hits "
+            "from many threads never exceed the limit, for the cache and database backends.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", choices=sorted(ratelimit.BACKENDS), action="append",
+                            help="Backend(s) to test (default: all).")
+        parser.add_argument("--requests", type=int, default=2000, help="Hits for the overhead measurement.")
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--hits-per-thread", type=int, default=50)
+        parser.add_argument("--limit", type=int, default=100)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'backend':<10}{'mean µs':>10}{'p95 µs':>10}{'p99 µs':>10}"
+                          f"{'attempts':>10}{'allowed':>10}{'limit':>8}  result")
+        for name in options["backend"] or sorted(ratelimit.BACKENDS):
+            backend = ratelimit.get_backend(name)
+            timings = self._overhead(backend, options["requests"])
+            allowed, attempts = self._accuracy(backend, options["threads"], options["hits_per_thread"],
+                                               options["limit"])
+            ok = allowed == min(options["limit"], attempts)
+            ordered = sorted(timings)
+            self.stdout.write(
+                f"{name:<10}{statistics.mean(timings):>10.1f}{ordered[int(len(ordered) * .95)]:>10.1f}"
+                f"{ordered[int(len(ordered) * .99)]:>10.1f}{attempts:>10}{allowed:>10}{options['limit']:>8}  "
+                + (self.style.SUCCESS("OK") if ok else self.style.ERROR("LIMIT EXCEEDED" if allowed > options["limit"]
+                                                                         else "UNDER LIMIT"))
+            )
+
+    @staticmethod
+    def _overhead(backend, n):
+        # A limit high enough never to block: only the cost of counting is measured.
+        rule = ratelimit.RateLimit(f"bench-{uuid.uuid4().hex}", limit=n * 2, window=3600, backend=backend)
+        timings = []
+        for i in range(n):
+            start = time.perf_counter()
+            rule.hit_key(f"client-{i % 50}")
+            timings.append((time.perf_counter() - start) * 1_000_000)
+        return timings
+
+    @staticmethod
+    def _accuracy(backend, threads, hits_per_thread, limit):
+        rule = ratelimit.RateLimit(f"bench-{uuid.uuid4().hex}", limit=limit, window=3600, backend=backend)
+        # Hits stay in the first half of one window, so the previous window never counts.
+        now = (time.time() // 3600) * 3600 + 1
+        allowed = []
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            count = 0
+            try:
+                barrier.wait()
+                for _ in range(hits_per_thread):
+                    if rule.hit_key("same-client", now=now).allowed:
+                        count += 1
+            finally:
+                connections.close_all()
+            allowed.append(count)
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        return sum(allowed), threads * hits_per_thread
@@ -0,0 +1,62 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from ouaf_app import perf, search, seeding
+
+# Frequent words, rare ones, several words, a phrase, an exclusion, a restriction to one kind, no match.
+QUERIES = [
+    ("chien", None), ("balade", None), ("refuge adoption", None), ("moka", None), ('"balade nature"', None),
+    ("chien -chat", None), ("atelier", ["activity"]), ("zzzz", None),
+]
+
+
+class Command(BaseCommand):
+    help = ("Measure the latency of search queries (matching, ranking and highlighting) on a test database filled "
+            "with synthetic search documents.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--documents", type=int, default=100_000)
+        parser.add_argument("--runs", type=int, default=20, help="Runs of each query (median and p95 are reported).")
+        parser.add_argument("--explain", action="store_true", help="Print the plan of the first query.")
+
+    def handle(self, *args, **options):
+        # A throwaway database and caches, as the test runner does.
+        with perf.isolated_caches():
+            setup_test_environment()
+            runner = DiscoverRunner(verbosity=0, interactive=False)
+            old_config = runner.setup_databases()
+            try:
+                start = time.perf_counter()
+                count = seeding.search_documents(options["documents"])
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE ouaf_app_searchdocument")
+                self.stdout.write(f"{count:,} documents written in {time.perf_counter() - start:.1f} s.")
+                self._bench(options["runs"])
+                if options["explain"]:
+                    self._explain(*QUERIES[0])
+            finally:
+                runner.teardown_databases(old_config)
+                teardown_test_environment()
+
+    def _bench(self, runs):
+        self.stdout.write(f"{'query':<24}{'matches':>9}{'results':>9}{'p50 ms':>9}{'p95 ms':>9}")
+        for text, kinds in QUERIES:
+            search.search(text, "fr", kinds)
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                results = search.search(text, "fr", kinds)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * .95))]
+            label = text + (f" ({','.join(kinds)})" if kinds else "")
+            self.stdout.write(f"{label:<24}{search.count(text, 'fr', kinds):>9,}{len(results):>9}"
+                              f"{statistics.median(timings):>9.1f}{p95:>9.1f}")
+
+    def _explain(self, text, kinds):
+        self.stdout.write(search.queryset(text, "fr", kinds)[:20].explain(analyze=True))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from ouaf_app import renditions
+from ouaf_app.signals import RENDITION_SOURCES, rendition_source
+
+
+class Command(BaseCommand):
+    help = "Generate the responsive renditions of every uploaded image that has none yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Rebuild existing renditions too.")
+
+    def handle(self, *args, **options):
+        for model in RENDITION_SOURCES:
+            built = 0
+            for instance in model.objects.order_by("pk").iterator():
+                source = rendition_source(instance)
+                if not source:
+                    continue
+                try:
+                    if renditions.generate(source, force=options["force"]):
+                        built += 1
+                except Exception as exc:
+                    self.stderr.write(f"{source}: {exc}")
+            self.stdout.write(f"{model.__name__}: {built} image(s) processed")
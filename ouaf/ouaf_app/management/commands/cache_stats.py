@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.redis import RedisCache
+from django.core.management.base import BaseCommand
+from django.db import connections, router
+
+from ouaf_app import page_cache
+
+
+class Command(BaseCommand):
+    help = "Show, for every cache alias, its backend, number of keys and hit ratio (when the backend tracks it)."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'alias':<12}{'backend':<18}{'keys':>10}{'hits':>12}{'misses':>12}{'hit ratio':>11}")
+        for alias in caches:
+            cache = caches[alias]
+            keys = self._key_count(cache)
+            hits, misses = self._hits(alias, cache)
+            total = (hits or 0) + (misses or 0)
+            ratio = f"{hits / total:.1%}" if hits is not None and total else "-"
+            self.stdout.write(f"{alias:<12}{type(cache).__name__:<18}{self._fmt(keys):>10}{self._fmt(hits):>12}"
+                              f"{self._fmt(misses):>12}{ratio:>11}")
+        self.stdout.write("Redis hits/misses are server-wide; the pages alias reports the page cache's own counters.")
+
+    @staticmethod
+    def _fmt(value):
+        return "-" if value is None else str(value)
+
+    @staticmethod
+    def _key_count(cache):
+        if isinstance(cache, RedisCache):
+            client = cache._cache.get_client()
+            return sum(1 for _ in client.scan_iter(match=f"{cache.key_prefix}:*", count=1000))
+        if isinstance(cache, DatabaseCache):
+            db = router.db_for_read(cache.cache_model_class)
+            connection = connections[db]
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(cache._table)}")
+                return cursor.fetchone()[0]
+        if isinstance(cache, FileBasedCache):
+            return sum(1 for _ in Path(cache._dir).glob(f"*{cache.cache_suffix}"))
+        if isinstance(cache, LocMemCache):
+            return len(cache._cache)
+        return None
+
+    @staticmethod
+    def _hits(alias, cache):
+        if alias == getattr(settings, "PAGE_CACHE_ALIAS", "default"):
+            stats = page_cache.stats()
+            return stats["hits"], stats["misses"]
+        if isinstance(cache, RedisCache):
+            info = cache._cache.get_client().info("stats")
+            return info.get("keyspace_hits"), info.get("keyspace_misses")
+        return None, None
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from ouaf_app import page_cache
+
+
+class Command(BaseCommand):
+    help = "Show the hit/miss counters of the public page cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Reset the counters after printing them.")
+
+    def handle(self, *args, **options):
+        stats = page_cache.stats()
+        self.stdout.write(f"hits: {stats['hits']}  misses: {stats['misses']}  hit ratio: {stats['hit_ratio']:.1%}")
+        if options["reset"]:
+            page_cache.reset_stats()
@@ -0,0 +1,61 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from ouaf_app import perf
+
+
+class Command(BaseCommand):
+    help = ("Seed a test database, request every public and backoffice page, and compare their query count, SQL, "
+            "template and total time with the budgets of ouaf_app/perf_budgets.json. Fails when a page is over "
+            "budget (or has none).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Measured requests per page (medians are reported).")
+        parser.add_argument("--scale", type=int, default=1, help="Size of the seeded dataset.")
+        parser.add_argument("--page", action="append", help="URL name of a page to measure (default: all).")
+        parser.add_argument("--json", default="perf-report.json", help="Path of the JSON report.")
+        parser.add_argument("--html", default="perf-report.html", help="Path of the HTML report.")
+        parser.add_argument("--update-budgets", action="store_true",
+                            help="Write the measured query counts to the budgets file instead of checking them.")
+
+    def handle(self, *args, **options):
+        # A throwaway database and caches, as the test runner does: the dataset mustn't end up in the real ones.
+        with perf.isolated_caches():
+            setup_test_environment()
+            settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, "testserver"]
+            runner = DiscoverRunner(verbosity=0, interactive=False)
+            old_config = runner.setup_databases()
+            try:
+                rows = perf.seed(options["scale"])
+                self.stdout.write(f"Seeded {rows} rows (scale {options['scale']}).")
+                results = perf.run(runs=options["runs"], names=options["page"])
+            finally:
+                runner.teardown_databases(old_config)
+                teardown_test_environment()
+
+        budgets = perf.load_budgets()
+        if options["update_budgets"]:
+            with open(perf.BUDGETS_PATH, "w") as f:
+                json.dump(perf.update_budgets(results, budgets), f, indent=2)
+                f.write("\n")
+            self.stdout.write(f"Query budgets written to {perf.BUDGETS_PATH}.")
+            return
+
+        violations = perf.check(results, budgets)
+        perf.write_json(results, violations, options["json"])
+        perf.write_html(results, violations, budgets, options["html"])
+
+        self.stdout.write(f"{'page':<36}{'status':>7}{'queries':>8}{'sql ms':>9}{'tpl ms':>9}{'total ms':>10}")
+        for name, result in results.items():
+            if "error" in result:
+                self.stdout.write(f"{name:<36}  {result['error']}")
+                continue
+            self.stdout.write(f"{name:<36}{result['status']:>7}{result['queries']:>8}{result['sql_ms']:>9.1f}"
+                              f"{result['template_ms']:>9.1f}{result['total_ms']:>10.1f}")
+        self.stdout.write(f"Reports: {options['json']}, {options['html']}")
+        if violations:
+            raise CommandError("Performance budget exceeded:\n  " + "\n  ".join(violations))
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from ouaf_app import search
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the search documents of every animal, activity, category, published event and team member, "
+            "batch by batch, and remove those of deleted objects. The signals keep them up to date afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        log = (lambda message: self.stdout.write(message)) if options["verbosity"] > 1 else None
+        counts = search.reindex(options["batch_size"], log=log)
+        for kind, count in counts.items():
+            self.stdout.write(f"{count:>10,}  {kind}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sum(counts.values()):,} documents in {time.perf_counter() - start:.1f} s."))
@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ouaf_app import seeding
+from ouaf_app.models import Person
+
+
+class Command(BaseCommand):
+    help = ("Fill the database with synthetic, deterministic data for load tests: people with groups and payments, "
+            "events with attendees, animals and activities with media. Scale 1 is about 5,000 rows, scale 200 "
+            "about a million. Not for a production database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", type=int, default=1)
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the random generator.")
+        parser.add_argument("--images", type=int, default=16, help="Number of generated image files (0: none).")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--noinput", "--no-input", action="store_false", dest="interactive")
+
+    def handle(self, *args, **options):
+        if Person.objects.filter(username__startswith=seeding.USERNAME_PREFIX).exists():
+            raise CommandError("The database already contains seeded data: use a fresh database.")
+        sizes = seeding.sizes(options["scale"])
+        if options["interactive"]:
+            answer = input(f"This adds about {self._total(sizes):,} rows to the database. Type 'yes' to continue: ")
+            if answer != "yes":
+                raise CommandError("Seeding cancelled.")
+
+        start = time.perf_counter()
+        counts = seeding.generate(sizes, seed=options["seed"], images=options["images"],
+                                  batch_size=options["batch_size"], log=lambda message: self.stdout.write(message))
+        elapsed = time.perf_counter() - start
+        for kind, count in counts.items():
+            self.stdout.write(f"{count:>10,}  {kind}")
+        total = sum(counts.values())
+        self.stdout.write(self.style.SUCCESS(f"{total:,} rows in {elapsed:.1f} s ({total / elapsed:,.0f} rows/s)."))
+
+    @staticmethod
+    def _total(sizes):
+        people, events = sizes["people"], sizes["events"]
+        return (people * (1 + sizes["payments_per_person"]) + events * (1 + sizes["attendees_per_event"])
+                + sizes["animals"] * (1 + sizes["media_per_animal"])
+                + sizes["activities"] * (1 + sizes["media_per_activity"]))
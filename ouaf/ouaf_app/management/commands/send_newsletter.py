@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ouaf_app import newsletter
+from ouaf_app.models import NewsletterCampaign
+
+
+class Command(BaseCommand):
+    help = ("Send a newsletter campaign to the subscribed members (see ouaf_app.newsletter). "
+            "Running it again on an interrupted campaign resumes it without sending twice.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("campaign", type=int, help="NewsletterCampaign id.")
+        parser.add_argument("--rate", type=float, help="Messages per second (default NEWSLETTER_RATE).")
+        parser.add_argument("--batch-size", type=int, help="Recipients per batch (default NEWSLETTER_BATCH_SIZE).")
+        parser.add_argument("--dry-run", action="store_true", help="Only count the recipients and estimate the duration.")
+
+    def handle(self, *args, **options):
+        try:
+            campaign = NewsletterCampaign.objects.get(pk=options["campaign"])
+        except NewsletterCampaign.DoesNotExist:
+            raise CommandError(f"Campaign {options['campaign']} does not exist.")
+        if campaign.status == NewsletterCampaign.Status.DONE:
+            raise CommandError(f"Campaign {campaign.pk} has already been sent.")
+
+        remaining = newsletter.recipient_count(campaign.last_person_id)
+        rate = options["rate"] if options["rate"] is not None else getattr(settings, "NEWSLETTER_RATE", 5)
+        estimate = f", about {remaining / rate / 60:.0f} min at {rate:g} msg/s" if rate > 0 else ""
+        self.stdout.write(f"«{campaign}»: {remaining} recipient(s) left{estimate}")
+        if options["dry_run"]:
+            return
+
+        campaign = newsletter.send_campaign(campaign, rate=options["rate"], batch_size=options["batch_size"],
+                                            progress=self._progress)
+        self.stdout.write(self.style.SUCCESS(
+            f"Done: {campaign.sent_count} sent, {campaign.failed_count} failed, "
+            f"{campaign.messages_per_second:.1f} msg/s"
+        ))
+
+    def _progress(self, campaign, elapsed):
+        left = newsletter.recipient_count(campaign.last_person_id)
+        eta = f", ETA {left / campaign.messages_per_second / 60:.1f} min" if campaign.messages_per_second else ""
+        self.stdout.write(f"{campaign.sent_count} sent, {campaign.failed_count} failed, "
+                          f"{campaign.messages_per_second:.1f} msg/s after {elapsed:.0f}s{eta}")
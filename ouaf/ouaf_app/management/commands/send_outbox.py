@@ -0,0 +1,37 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ouaf_app import outbox
+
+
+class Command(BaseCommand):
+    help = "Send the queued outbox emails (see ouaf_app.outbox), once or continuously with --loop."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new messages.")
+        parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls with --loop.")
+        parser.add_argument("--batch-size", type=int, default=50)
+
+    def handle(self, *args, **options):
+        self._stopping = False
+        if options["loop"]:
+            signal.signal(signal.SIGTERM, self._stop)
+            signal.signal(signal.SIGINT, self._stop)
+
+        while True:
+            sent, failed = outbox.process(batch_size=options["batch_size"])
+            if sent or failed or not options["loop"]:
+                self.stdout.write(f"{sent} sent, {failed} failed")
+            if not options["loop"] or self._stopping:
+                return
+            time.sleep(options["interval"])
+            if self._stopping:
+                return
+            # A long-running worker: don't keep a connection the server may have dropped.
+            close_old_connections()
+
+    def _stop(self, signum, frame):
+        self._stopping = True
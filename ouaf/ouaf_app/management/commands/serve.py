@@ -0,0 +1,123 @@
+import atexit
+import importlib.util
+import math
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ouaf_app import metrics, warmup
+
+ASGI_WORKER_CLASSES = ["uvicorn_worker.UvicornWorker", "uvicorn.workers.UvicornWorker"]
+
+
+def available_cpus():
+    """CPUs this process may use: its affinity mask, capped by the cgroup (container) CPU quota."""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            count = min(count, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return count
+
+
+def asgi_worker_class():
+    for path in ASGI_WORKER_CLASSES:
+        if importlib.util.find_spec(path.split(".")[0]) is not None:
+            return path
+    raise CommandError("--asgi needs uvicorn and uvicorn-worker: pip install uvicorn-worker")
+
+
+def server_config(asgi=False, bind="0.0.0.0:8000", workers=None, threads=None, preload=True, max_requests=None,
+                  timeout=None):
+    """gunicorn settings for this machine; None means derived from the CPU count or the SERVE_* settings."""
+    cpus = available_cpus()
+    workers = workers or getattr(settings, "SERVE_WORKERS", None) or (cpus + 1 if asgi else 2 * cpus + 1)
+    max_requests = getattr(settings, "SERVE_MAX_REQUESTS", 2000) if max_requests is None else max_requests
+    config = {
+        "bind": bind,
+        "workers": workers,
+        "preload_app": preload,
+        # Recycle workers now and then (bounds slow leaks); the jitter keeps them from restarting together.
+        "max_requests": max_requests,
+        "max_requests_jitter": max_requests // 10,
+        "timeout": timeout or getattr(settings, "SERVE_TIMEOUT", 60),
+        "graceful_timeout": 30,
+        "keepalive": 5,
+        "accesslog": "-",
+        "errorlog": "-",
+    }
+    if asgi:
+        # One event loop per worker: no threads.
+        config["worker_class"] = asgi_worker_class()
+    else:
+        config["worker_class"] = "gthread"
+        config["threads"] = threads or getattr(settings, "SERVE_THREADS", None) or 4
+    return config
+
+
+class Command(BaseCommand):
+    help = ("Run the production server (gunicorn): WSGI with threaded workers, or ASGI with uvicorn workers. "
+            "The application is loaded and warmed up before the workers are forked. kill -HUP recycles the "
+            "workers gracefully; to run new code, restart the command (or kill -USR2, then -TERM the old master).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bind", default=os.getenv("SERVE_BIND", "0.0.0.0:8000"))
+        parser.add_argument("--asgi", action="store_true", help="Serve ouaf.asgi with uvicorn workers.")
+        parser.add_argument("--workers", type=int, help="Default: 2 × CPUs + 1 (WSGI), CPUs + 1 (ASGI).")
+        parser.add_argument("--threads", type=int, help="Threads per WSGI worker (default 4).")
+        parser.add_argument("--max-requests", type=int, help="Requests before a worker is recycled (0: never).")
+        parser.add_argument("--timeout", type=int)
+        parser.add_argument("--no-preload", action="store_true", help="Load (and warm up) the app in each worker.")
+        parser.add_argument("--no-warm-up", action="store_true")
+        parser.add_argument("--print-config", action="store_true", help="Print the gunicorn settings and exit.")
+
+    def handle(self, *args, **options):
+        config = server_config(asgi=options["asgi"], bind=options["bind"], workers=options["workers"],
+                               threads=options["threads"], preload=not options["no_preload"],
+                               max_requests=options["max_requests"], timeout=options["timeout"])
+        if options["print_config"]:
+            for name, value in config.items():
+                self.stdout.write(f"{name} = {value}")
+            return
+
+        from gunicorn.app.base import BaseApplication
+
+        command = self
+
+        class Server(BaseApplication):
+            def load_config(self):
+                for name, value in config.items():
+                    self.cfg.set(name, value)
+
+            def load(self):
+                if options["asgi"]:
+                    from ouaf.asgi import application
+                else:
+                    from ouaf.wsgi import application
+                # Already done by ouaf.wsgi/ouaf.asgi when settings.WARMUP is on.
+                if not options["no_warm_up"] and (report := warmup.run_once()):
+                    command.stdout.write(f"[{os.getpid()}] Warm-up: {warmup.format_report(report)}")
+                # The warm-up requests aren't traffic.
+                metrics.reset()
+                return application
+
+        # The workers add up their metrics through this directory (see ouaf_app.metrics).
+        if not settings.METRICS_DIR:
+            settings.METRICS_DIR = os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="ouaf-metrics-")
+            # Workers inherit the handler: only the master removes the directory.
+            master, directory = os.getpid(), settings.METRICS_DIR
+            atexit.register(lambda: os.getpid() == master and shutil.rmtree(directory, ignore_errors=True))
+        metrics.prepare_directory(settings.METRICS_DIR)
+
+        self.stdout.write(f"Serving {'ASGI' if options['asgi'] else 'WSGI'} on {config['bind']}: "
+                          f"{config['workers']} workers × {config.get('threads', 1)} threads")
+        Server().run()
@@ -0,0 +1,103 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Generous on purpose: they catch a heavy import sneaking into the boot path, not small variations.
+IMPORT_BUDGET_MS = 1500
+RSS_BUDGET_MB = 150
+
+# What a worker imports before its first response: the WSGI entry point, then the URLconf (and with it the views,
+# forms...) that the first request loads.
+MODULES = ("ouaf.wsgi", "ouaf.urls")
+
+# Run in a fresh interpreter: import the modules, then report what they loaded and the process' RSS.
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {modules}
+elapsed = time.perf_counter() - start
+rss_kb = next(int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmRSS:"))
+print(json.dumps({{"import_ms": elapsed * 1000, "rss_mb": rss_kb / 1024, "modules": sorted(sys.modules)}}))
+"""
+
+
+def measure(modules=MODULES, importtime=False):
+    """Import `modules` in a fresh interpreter; return the import time, RSS and modules (+ the -X importtime log)."""
+    code = PROBE.format(modules=", ".join(modules))
+    argv = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    completed = subprocess.run(argv, cwd=settings.BASE_DIR, capture_output=True, text=True,
+                               env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1"))
+    if completed.returncode:
+        raise CommandError(f"Importing {', '.join(modules)} failed:\n{completed.stderr}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    result["importtime"] = completed.stderr if importtime else ""
+    return result
+
+
+def heaviest_packages(log, exclude=()):
+    """{top-level package: µs} from a -X importtime log, each package charged the cumulative time of its
+    costliest module (the first one imported, which pulls in the rest of the package)."""
+    packages = defaultdict(int)
+    for line in log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        try:
+            _, cumulative, name = line[len("import time:"):].split("|")
+        except ValueError:
+            continue
+        package = name.strip().split(".")[0]
+        if cumulative.strip().isdigit() and package not in exclude:
+            packages[package] = max(packages[package], int(cumulative))
+    return packages
+
+
+class Command(BaseCommand):
+    help = ("Report the import time and RSS of the WSGI entry point and the URLconf (fresh interpreter), the heaviest "
+            "imports (python -X importtime), and fail when they exceed the budget.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--module", action="append", help=f"Module to import (repeatable, default: {MODULES}).")
+        parser.add_argument("--top", type=int, default=15, help="Number of heaviest imports listed.")
+        parser.add_argument("--runs", type=int, default=3, help="Best of N for the import time.")
+        parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+        parser.add_argument("--budget-rss", type=float, default=RSS_BUDGET_MB, help="In MB.")
+        parser.add_argument("--json", action="store_true")
+
+    def handle(self, *args, **options):
+        modules = options["module"] or MODULES
+        runs = [measure(modules) for _ in range(options["runs"])]
+        best = min(runs, key=lambda run: run["import_ms"])
+        profile = measure(modules, importtime=True)
+
+        # The entry point's own package contains everything else.
+        heaviest = heaviest_packages(profile["importtime"], exclude={module.split(".")[0] for module in modules})
+        top = sorted(heaviest.items(), key=lambda item: -item[1])[:options["top"]]
+
+        report = {
+            "module": ", ".join(modules),
+            "import_ms": round(best["import_ms"], 1),
+            "rss_mb": round(best["rss_mb"], 1),
+            "modules": len(best["modules"]),
+            "heaviest_packages_ms": {name: round(us / 1000, 1) for name, us in top},
+        }
+        over = []
+        if report["import_ms"] > options["budget_ms"]:
+            over.append(f"import time {report['import_ms']} ms > {options['budget_ms']} ms")
+        if report["rss_mb"] > options["budget_rss"]:
+            over.append(f"RSS {report['rss_mb']} MB > {options['budget_rss']} MB")
+
+        if options["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(f"import {report['module']}: {report['import_ms']} ms (best of {options['runs']}), "
+                              f"RSS {report['rss_mb']} MB, {report['modules']} modules")
+            self.stdout.write("Heaviest packages (cumulative, -X importtime):")
+            for name, ms in report["heaviest_packages_ms"].items():
+                self.stdout.write(f"  {ms:>8.1f} ms  {name}")
+        if over:
+            raise CommandError("Startup budget exceeded: " + ", ".join(over))
@@ -0,0 +1,137 @@
+"""
+Production view for user uploads (MEDIA_ROOT).
+
+Compared to `django.views.static.serve` it answers conditional requests
+(ETag / Last-Modified), single byte ranges (so videos can be seeked), marks
+content-addressed renditions as immutable, and can hand the transfer over to
+the fronting web server so that no Python worker is held while bytes are sent.
+
+Settings:
+    MEDIA_OFFLOAD (str)              : "" (stream from Python, default),
+                                       "x-accel-redirect" (nginx) or "x-sendfile" (Apache/lighttpd).
+    MEDIA_ACCEL_REDIRECT_PREFIX (str): internal nginx location mapped to MEDIA_ROOT.
+    MEDIA_CACHE_MAX_AGE (int)        : max-age for files that may change.
+"""
+import mimetypes
+import re
+from pathlib import Path
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+from .renditions import IMMUTABLE_NAME_RE
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+CHUNK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def _parse_range(header, size):
+    """
+    Return (start, end) for a single satisfiable byte range, None when there is
+    no usable Range header, or False when the range can't be satisfied.
+    Multi-range requests are answered with the whole file.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if size == 0:
+        return False
+    if first == "":
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == mtime
+
+
+def _iter_range(path, start, length):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                return
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_media(request, path):
+    try:
+        fullpath = Path(safe_join(settings.MEDIA_ROOT, path))
+    except SuspiciousFileOperation:
+        raise Http404("Invalid path")
+    if not fullpath.is_file():
+        raise Http404("Media not found")
+
+    stat = fullpath.stat()
+    mtime = int(stat.st_mtime)
+    size = stat.st_size
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=mtime)
+    if not_modified is not None:
+        return not_modified
+
+    content_type, encoding = mimetypes.guess_type(str(fullpath))
+    content_type = content_type or "application/octet-stream"
+    offload = getattr(settings, "MEDIA_OFFLOAD", "")
+
+    byte_range = None
+    if not offload and "HTTP_RANGE" in request.META and _if_range_matches(request, etag, mtime):
+        byte_range = _parse_range(request.META["HTTP_RANGE"], size)
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    if offload == "x-accel-redirect":
+        # nginx streams the file itself (and handles Range) from an internal location.
+        response = HttpResponse(content_type=content_type)
+        prefix = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", "/protected-media/")
+        # Percent-encoded, as nginx expects a URI: a header can't hold any upload name otherwise.
+        response["X-Accel-Redirect"] = quote(prefix.rstrip("/") + "/" + path.lstrip("/"))
+    elif offload == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = quote(str(fullpath))
+    elif byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(_iter_range(fullpath, start, length), status=206,
+                                         content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(length)
+    else:
+        response = FileResponse(fullpath.open("rb"), content_type=content_type)
+
+    if encoding:
+        response["Content-Encoding"] = encoding
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(mtime)
+    if IMMUTABLE_NAME_RE.search(path):
+        patch_cache_control(response, public=True, max_age=IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=getattr(settings, "MEDIA_CACHE_MAX_AGE", 3600))
+    return response
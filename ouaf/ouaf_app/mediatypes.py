@@ -0,0 +1,111 @@
+"""
+Content type detection for uploaded media.
+
+The type of a media is detected once, when it is saved, by sniffing the first
+bytes of the file rather than trusting its extension. Remote media (URL only)
+are not fetched: their type is guessed from the URL.
+"""
+from mimetypes import guess_type
+
+KIND_IMAGE = "image"
+KIND_VIDEO = "video"
+KIND_OTHER = "other"
+
+SNIFF_LENGTH = 512
+
+# (offset, magic bytes, mime type), checked in order.
+SIGNATURES = [
+    (0, b"\xff\xd8\xff", "image/jpeg"),
+    (0, b"\x89PNG\r\n\x1a\n", "image/png"),
+    (0, b"GIF87a", "image/gif"),
+    (0, b"GIF89a", "image/gif"),
+    (0, b"BM", "image/bmp"),
+    (0, b"II*\x00", "image/tiff"),
+    (0, b"MM\x00*", "image/tiff"),
+    (0, b"\x1aE\xdf\xa3", "video/webm"),
+    (0, b"OggS", "video/ogg"),
+    (0, b"%PDF-", "application/pdf"),
+]
+
+# ISO base media file brands (bytes 8-12 of an "ftyp" box).
+FTYP_BRANDS = {
+    b"avif": "image/avif",
+    b"avis": "image/avif",
+    b"heic": "image/heic",
+    b"heix": "image/heic",
+    b"mif1": "image/heif",
+    b"msf1": "image/heif",
+    b"qt  ": "video/quicktime",
+    b"3gp4": "video/3gpp",
+    b"3gp5": "video/3gpp",
+    b"M4V ": "video/x-m4v",
+}
+
+VIDEO_HOSTS = ("youtube.com", "youtu.be", "vimeo.com")
+
+
+def sniff(head: bytes) -> str:
+    """Return the mime type matching the magic bytes of `head`, or ""."""
+    for offset, magic, mime in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return mime
+    if head[:4] == b"RIFF":
+        if head[8:12] == b"WEBP":
+            return "image/webp"
+        if head[8:12] == b"AVI ":
+            return "video/x-msvideo"
+    if head[4:8] == b"ftyp":
+        return FTYP_BRANDS.get(head[8:12], "video/mp4")
+    text = head.lstrip().lower()
+    if text.startswith(b"<svg") or (text.startswith(b"<?xml") and b"<svg" in text):
+        return "image/svg+xml"
+    return ""
+
+
+def kind_of(mime: str) -> str:
+    if mime.startswith("image/"):
+        return KIND_IMAGE
+    if mime.startswith("video/"):
+        return KIND_VIDEO
+    return KIND_OTHER
+
+
+def _read_head(field_file) -> bytes:
+    """Read the first bytes of a (possibly not yet saved) FieldFile."""
+    if not field_file._committed:
+        upload = field_file.file
+        position = upload.tell()
+        upload.seek(0)
+        head = upload.read(SNIFF_LENGTH)
+        upload.seek(position)
+        return head
+    with field_file.storage.open(field_file.name, "rb") as f:
+        return f.read(SNIFF_LENGTH)
+
+
+def guess(name: str = "", url: str = "") -> tuple[str, str]:
+    """
+    Guess the (kind, mime) of a media from its file name, or from its URL when
+    it has no file, without reading anything (video hosts are videos).
+    """
+    if not name and any(host in url for host in VIDEO_HOSTS):
+        return KIND_VIDEO, ""
+    mime = guess_type(name or url)[0] or ""
+    return kind_of(mime), mime
+
+
+def detect(field_file=None, url: str = "") -> tuple[str, str]:
+    """
+    Detect the (kind, mime) of a media from its file, or from its URL when it
+    has no file. Falls back to the extension when the file can't be read or
+    has an unknown signature.
+    """
+    if field_file:
+        try:
+            mime = sniff(_read_head(field_file))
+        except OSError:
+            mime = ""
+        if not mime:
+            return guess(field_file.name)
+        return kind_of(mime), mime
+    return guess(url=url)
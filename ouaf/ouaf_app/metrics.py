@@ -0,0 +1,237 @@
+"""
+Request metrics in the Prometheus text format, served on /metrics.
+
+`MetricsMiddleware` (ouaf_app.middleware) measures every request with
+`instrumentation` and adds it to the process' `registry`, labelled with the
+URL name of the view ("none" when no URL matched, e.g. static files):
+
+    ouaf_http_requests_total{view,method,status}     counter
+    ouaf_http_request_duration_seconds{view}          histogram
+    ouaf_db_queries_total{view}                       counter
+    ouaf_db_query_seconds_total{view}                 counter
+    ouaf_template_render_seconds_total{view}          counter
+
+Adding a request takes a lock and a few dict and list updates. With several
+processes (gunicorn workers), a thread of each one writes its totals to
+METRICS_DIR/<pid>.json every FLUSH_INTERVAL when they changed, and when the
+process exits; the process answering /metrics adds up every file. The totals of exited workers are merged into
+METRICS_DIR/dead.json, so the counters don't go down when a worker is
+recycled. `manage.py serve` creates (or empties) the directory at startup.
+
+Settings:
+    METRICS (bool)      : add MetricsMiddleware (default True).
+    METRICS_DIR (str)   : directory shared by the processes of a server (default: none, single process).
+    METRICS_TOKEN (str) : bearer token required by /metrics (default: none, open).
+"""
+import atexit
+import bisect
+import fcntl
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+# Upper bounds of the latency histogram, in seconds.
+BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+FLUSH_INTERVAL = 1.0
+
+# Position of the totals in a view's row, after the per-bucket counts (the last bucket is +Inf).
+SUM, QUERIES, SQL, TEMPLATES = range(len(BUCKETS) + 1, len(BUCKETS) + 5)
+
+
+def _new_row():
+    return [0] * (len(BUCKETS) + 1) + [0.0, 0, 0.0, 0.0]
+
+
+def _directory():
+    return getattr(settings, "METRICS_DIR", "")
+
+
+class Registry:
+    """The metrics of this process."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lock = threading.Lock()
+        # (view, method, status) -> requests
+        self.requests = defaultdict(int)
+        # view -> [count per bucket..., sum of durations, queries, SQL seconds, template seconds]
+        self.views = defaultdict(_new_row)
+        self.changed = False
+        # Started by the first request (threads don't survive a fork).
+        self.flusher = None
+
+    def observe(self, view, method, status, seconds, queries=0, sql_seconds=0.0, template_seconds=0.0):
+        bucket = bisect.bisect_left(BUCKETS, seconds)
+        with self.lock:
+            self.requests[view, method, status] += 1
+            row = self.views[view]
+            row[bucket] += 1
+            row[SUM] += seconds
+            row[QUERIES] += queries
+            row[SQL] += sql_seconds
+            row[TEMPLATES] += template_seconds
+            self.changed = True
+            if self.flusher is None and _directory():
+                self.flusher = threading.Thread(target=self._flush_loop, name="metrics", daemon=True)
+                self.flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            if self.changed:
+                self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "requests": [[*key, count] for key, count in self.requests.items()],
+                "views": {view: list(row) for view, row in self.views.items()},
+            }
+
+    def flush(self):
+        """Write this process' totals to METRICS_DIR/<pid>.json."""
+        directory = _directory()
+        if not directory:
+            return
+        self.changed = False
+        _write(os.path.join(directory, f"{os.getpid()}.json"), self.snapshot())
+
+
+def _write(path, snapshot):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge(snapshots):
+    """Add up snapshots; return one."""
+    requests = defaultdict(int)
+    views = defaultdict(_new_row)
+    for snapshot in snapshots:
+        for *key, count in snapshot["requests"]:
+            requests[tuple(key)] += count
+        for view, row in snapshot["views"].items():
+            views[view] = [a + b for a, b in zip(views[view], row)]
+    return {"requests": [[*key, count] for key, count in requests.items()], "views": dict(views)}
+
+
+def collect():
+    """This process' metrics plus those of the other processes sharing METRICS_DIR."""
+    snapshots = [registry.snapshot()]
+    directory = _directory()
+    if not directory:
+        return snapshots[0]
+    dead_path = os.path.join(directory, "dead.json")
+    with open(os.path.join(directory, ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        dead, exited = [], []
+        for name in os.listdir(directory):
+            pid = name.removesuffix(".json")
+            if not (name.endswith(".json") and pid.isdigit()) or int(pid) == os.getpid():
+                continue
+            path = os.path.join(directory, name)
+            if (snapshot := _read(path)) is None:
+                continue
+            if _alive(int(pid)):
+                snapshots.append(snapshot)
+            else:
+                dead.append(snapshot)
+                exited.append(path)
+        if previous := _read(dead_path):
+            dead.append(previous)
+        if exited:
+            # Written before the workers' files are removed: a crash in between counts them twice, never zero times.
+            _write(dead_path, merge(dead))
+            for path in exited:
+                os.remove(path)
+    return merge(snapshots + dead)
+
+
+def _label(value):
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def render(snapshot=None):
+    """The metrics in the Prometheus text exposition format."""
+    snapshot = snapshot or collect()
+    lines = [
+        "# HELP ouaf_http_requests_total Requests by view, method and status.",
+        "# TYPE ouaf_http_requests_total counter",
+    ]
+    for view, method, status, count in sorted(snapshot["requests"]):
+        lines.append(f'ouaf_http_requests_total{{view="{_label(view)}",method="{_label(method)}",'
+                     f'status="{status}"}} {count}')
+
+    views = sorted(snapshot["views"].items())
+    lines += [
+        "# HELP ouaf_http_request_duration_seconds Request duration by view.",
+        "# TYPE ouaf_http_request_duration_seconds histogram",
+    ]
+    for view, row in views:
+        label = _label(view)
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ("+Inf",), row):
+            cumulative += count
+            lines.append(f'ouaf_http_request_duration_seconds_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'ouaf_http_request_duration_seconds_sum{{view="{label}"}} {row[SUM]}')
+        lines.append(f'ouaf_http_request_duration_seconds_count{{view="{label}"}} {cumulative}')
+
+    for name, index, help_text in [
+        ("ouaf_db_queries_total", QUERIES, "SQL queries by view."),
+        ("ouaf_db_query_seconds_total", SQL, "Time spent in SQL queries by view."),
+        ("ouaf_template_render_seconds_total", TEMPLATES, "Time spent rendering templates by view."),
+    ]:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [f'{name}{{view="{_label(view)}"}} {row[index]}' for view, row in views]
+    return "\n".join(lines) + "\n"
+
+
+def reset():
+    """Forget this process' metrics (e.g. the warm-up requests of a server's master process)."""
+    registry.reset()
+    if directory := _directory():
+        try:
+            os.remove(os.path.join(directory, f"{os.getpid()}.json"))
+        except FileNotFoundError:
+            pass
+
+
+def prepare_directory(directory):
+    """Create METRICS_DIR, or remove the files of a previous server: the counters start again from zero."""
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith((".json", ".tmp")):
+            os.remove(os.path.join(directory, name))
+
+
+registry = Registry()
+# A forked worker starts from zero (and with a lock no other thread holds).
+os.register_at_fork(after_in_child=registry.reset)
+# Only when something changed since the last flush: the master of `serve`, which answers no request, has already
+# removed the directory by then.
+atexit.register(lambda: registry.changed and _directory() and registry.flush())
@@ -0,0 +1,244 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware as BaseWhiteNoiseMiddleware
+
+from . import instrumentation, logs, metrics, querycheck
+
+logger = logging.getLogger(__name__)
+
+
+class WhiteNoiseMiddleware(BaseWhiteNoiseMiddleware):
+    """
+    WhiteNoise that can also run in async mode. The stock middleware is sync
+    only, which makes Django run the whole middleware chain, and the async
+    views behind it, through a thread under ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        # With autorefresh (development) find_file() hits the filesystem; otherwise it's a dict lookup.
+        static_file = self.find_file(request.path_info) if self.autorefresh else self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestIdMiddleware:
+    """
+    Give each request an ID (see `ouaf_app.logs`): `request.request_id`, added
+    to the log records of the request and sent back in X-Request-ID. The ID of
+    the REQUEST_ID_HEADER header, set by a proxy, is kept when valid.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = getattr(settings, "REQUEST_ID_HEADER", "")
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = self._start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            logs.reset_request_id(token)
+        response["X-Request-ID"] = request.request_id
+        return response
+
+    async def __acall__(self, request):
+        token = self._start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            logs.reset_request_id(token)
+        response["X-Request-ID"] = request.request_id
+        return response
+
+    def _start(self, request):
+        request.request_id = logs.new_request_id(request.headers.get(self.header) if self.header else None)
+        return logs.set_request_id(request.request_id)
+
+
+class MetricsMiddleware:
+    """
+    Add every request to the process' metrics (see `ouaf_app.metrics`): duration,
+    status, SQL queries and template rendering, labelled by URL name.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        measure = instrumentation.start()
+        status = 500
+        try:
+            response = self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            self._observe(request, status, instrumentation.stop(measure))
+
+    async def __acall__(self, request):
+        measure = instrumentation.start()
+        status = 500
+        try:
+            response = await self.get_response(request)
+            status = response.status_code
+            return response
+        finally:
+            self._observe(request, status, instrumentation.stop(measure))
+
+    @staticmethod
+    def _observe(request, status, measure):
+        match = request.resolver_match
+        metrics.registry.observe(match.view_name if match else "none", request.method, status,
+                                 measure.total_ms / 1000, measure.queries, measure.sql_ms / 1000,
+                                 measure.template_ms / 1000)
+
+
+def server_timing(measure):
+    """Server-Timing value of a measurement: SQL, templates, named phases, the rest of the view, total.
+    Phases (e.g. "mail") overlap with SQL and templates; "view" is what isn't SQL or templates."""
+    entries = [f'db;dur={measure.sql_ms:.1f};desc="{measure.queries} queries"', f"tpl;dur={measure.template_ms:.1f}"]
+    entries += [f"{name};dur={ms:.1f}" for name, ms in measure.phases.items()]
+    view = max(measure.total_ms - measure.sql_ms - measure.template_ms, 0)
+    entries += [f"view;dur={view:.1f}", f"total;dur={measure.total_ms:.1f}"]
+    return ", ".join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Break the time of each request down (see `server_timing()`) into a
+    Server-Timing header, shown by the browser's devtools, and log the
+    requests slower than SLOW_REQUEST_MS with the same breakdown.
+
+    SERVER_TIMING: "all" (every response), "staff" (staff users only) or "off".
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.mode = getattr(settings, "SERVER_TIMING", "staff")
+        self.slow_ms = getattr(settings, "SLOW_REQUEST_MS", 0)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        measure = instrumentation.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.stop(measure)
+        show = self.mode == "all"
+        if self.mode == "staff" and hasattr(request, "user"):
+            show = request.user.is_staff
+        return self._finish(request, response, measure, show)
+
+    async def __acall__(self, request):
+        measure = instrumentation.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.stop(measure)
+        show = self.mode == "all"
+        if self.mode == "staff" and hasattr(request, "auser"):
+            show = (await request.auser()).is_staff
+        return self._finish(request, response, measure, show)
+
+    def _finish(self, request, response, measure, show):
+        if show:
+            response["Server-Timing"] = server_timing(measure)
+        if self.slow_ms and measure.total_ms >= self.slow_ms:
+            match = request.resolver_match
+            logger.warning("Slow request: %s %s took %.0f ms (%s)", request.method, request.path, measure.total_ms,
+                           server_timing(measure), extra={"view": match.view_name if match else None,
+                                          "status": response.status_code, "queries": measure.queries})
+        return response
+
+
+class QueryCheckMiddleware:
+    """
+    Development and test check of the SQL of each request (see
+    `ouaf_app.querycheck`): report the queries repeated more than
+    QUERY_CHECK_THRESHOLD times from one call site, and log the slow ones
+    with their plan.
+
+    QUERY_CHECK: "warn" (log), "raise" (RepeatedQueriesError) or "off".
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.mode = getattr(settings, "QUERY_CHECK", "off")
+        self.threshold = getattr(settings, "QUERY_CHECK_THRESHOLD", 5)
+        if self.mode == "off":
+            if not getattr(settings, "SLOW_QUERY_MS", 0):
+                raise MiddlewareNotUsed
+            # Slow queries only.
+            querycheck.install()
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if self.mode == "off":
+            return self.get_response(request)
+        log, token = querycheck.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            querycheck.stop(token)
+        self._check(request, log)
+        return response
+
+    async def __acall__(self, request):
+        if self.mode == "off":
+            return await self.get_response(request)
+        log, token = querycheck.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            querycheck.stop(token)
+        self._check(request, log)
+        return response
+
+    def _check(self, request, log):
+        if repeats := log.repeated(self.threshold):
+            message = querycheck.report(repeats, f"{request.method} {request.path}")
+            if self.mode == "raise":
+                raise querycheck.RepeatedQueriesError(message)
+            logger.warning(message)
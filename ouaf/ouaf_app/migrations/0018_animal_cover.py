@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:44
+
+from mimetypes import guess_type
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_covers(apps, schema_editor):
+    Animal = apps.get_model('ouaf_app', 'Animal')
+    AnimalMedia = apps.get_model('ouaf_app', 'AnimalMedia')
+    covers = {}
+    for media in AnimalMedia.objects.order_by('animal_id', 'position', 'id').iterator():
+        mime, _ = guess_type(media.file.name or media.url or '')
+        if media.animal_id not in covers and (mime or '').startswith('image/'):
+            covers[media.animal_id] = media.id
+    for animal_id, media_id in covers.items():
+        Animal.objects.filter(pk=animal_id).update(cover_id=media_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ouaf_app', '0017_alter_organisationchartentry_role_alter_person_email'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='animal',
+            name='cover',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ouaf_app.animalmedia', verbose_name='Image de présentation'),
+        ),
+        migrations.RunPython(fill_covers, migrations.RunPython.noop),
+    ]
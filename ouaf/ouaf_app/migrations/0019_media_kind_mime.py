@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:45
+
+from django.db import migrations, models
+
+from ouaf_app import mediatypes
+
+
+def guess_types(apps, schema_editor):
+    # From the file extension or URL only: `manage.py backfill_media_types --all` sniffs the files afterwards.
+    for model_name in ('ActivityMedia', 'AnimalMedia'):
+        model = apps.get_model('ouaf_app', model_name)
+        batch = []
+        for media in model.objects.filter(kind='').only('file', 'url').iterator():
+            media.kind, media.mime = mediatypes.guess(media.file.name or '', media.url or '')
+            batch.append(media)
+            if len(batch) == 500:
+                model.objects.bulk_update(batch, ['kind', 'mime'])
+                batch = []
+        model.objects.bulk_update(batch, ['kind', 'mime'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ouaf_app', '0018_animal_cover'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activitymedia',
+            name='kind',
+            field=models.CharField(blank=True, choices=[('image', 'Image'), ('video', 'Vidéo'), ('other', 'Autre')], db_index=True, editable=False, max_length=10, verbose_name='Type'),
+        ),
+        migrations.AddField(
+            model_name='activitymedia',
+            name='mime',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, verbose_name='Type MIME'),
+        ),
+        migrations.AddField(
+            model_name='animalmedia',
+            name='kind',
+            field=models.CharField(blank=True, choices=[('image', 'Image'), ('video', 'Vidéo'), ('other', 'Autre')], db_index=True, editable=False, max_length=10, verbose_name='Type'),
+        ),
+        migrations.AddField(
+            model_name='animalmedia',
+            name='mime',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, verbose_name='Type MIME'),
+        ),
+        migrations.RunPython(guess_types, migrations.RunPython.noop),
+    ]
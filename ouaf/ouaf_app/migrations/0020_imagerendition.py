@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ouaf_app', '0019_media_kind_mime'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(db_index=True, max_length=255, verbose_name='Original')),
+                ('file', models.FileField(max_length=255, upload_to='', verbose_name='Fichier')),
+                ('width', models.PositiveIntegerField(verbose_name='Largeur')),
+                ('height', models.PositiveIntegerField(verbose_name='Hauteur')),
+                ('format', models.CharField(max_length=10, verbose_name='Format')),
+            ],
+            options={
+                'ordering': ['source', 'format', 'width'],
+                'constraints': [models.UniqueConstraint(fields=('source', 'format', 'width'), name='unique_image_rendition')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ouaf_app', '0021_person_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('request_id', models.CharField(db_index=True, max_length=64, verbose_name='Identifiant de requête')),
+                ('purpose', models.CharField(max_length=30, verbose_name='Objet')),
+                ('subject', models.CharField(max_length=255, verbose_name='Sujet')),
+                ('body', models.TextField(verbose_name='Texte')),
+                ('html', models.TextField(blank=True, verbose_name='HTML')),
+                ('from_email', models.CharField(max_length=255, verbose_name='Expéditeur')),
+                ('to', models.JSONField(default=list, verbose_name='Destinataires')),
+                ('reply_to', models.JSONField(blank=True, default=list, verbose_name='Répondre à')),
+                ('headers', models.JSONField(blank=True, default=dict, verbose_name='En-têtes')),
+                ('status', models.CharField(choices=[('queued', 'En attente'), ('sent', 'Envoyé'), ('dead', 'Abandonné')], default='queued', max_length=10, verbose_name='Statut')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentatives')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Prochaine tentative')),
+                ('last_error', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créé le')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Envoyé le')),
+            ],
+            options={
+                'ordering': ['next_attempt_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx')],
+                'constraints': [models.UniqueConstraint(fields=('request_id', 'purpose'), name='unique_outbox_request_purpose')],
+            },
+        ),
+    ]
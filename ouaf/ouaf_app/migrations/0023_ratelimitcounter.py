@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ouaf_app', '0022_outboxemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RateLimitCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.CharField(max_length=255)),
+                ('window_index', models.BigIntegerField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bucket', 'window_index'), name='unique_ratelimit_window')],
+            },
+        ),
+    ]
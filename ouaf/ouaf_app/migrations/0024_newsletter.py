@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ouaf_app', '0023_ratelimitcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NewsletterCampaign',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255, verbose_name='Sujet')),
+                ('body_html', models.TextField(help_text='$first_name, $last_name et $email sont remplacés pour chaque destinataire.', verbose_name='Contenu HTML')),
+                ('status', models.CharField(choices=[('draft', 'Brouillon'), ('sending', "En cours d'envoi"), ('done', 'Envoyée')], default='draft', max_length=10, verbose_name='Statut')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Créée le')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name="Début de l'envoi")),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name="Fin de l'envoi")),
+                ('last_person_id', models.BigIntegerField(default=0, verbose_name='Dernier destinataire traité')),
+                ('sent_count', models.PositiveIntegerField(default=0, verbose_name='Envoyés')),
+                ('failed_count', models.PositiveIntegerField(default=0, verbose_name='Échecs')),
+                ('messages_per_second', models.FloatField(default=0, verbose_name='Messages par seconde')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NewsletterDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('sending', 'En cours'), ('sent', 'Envoyé'), ('failed', 'Échec')], default='sending', max_length=10, verbose_name='Statut')),
+                ('error', models.TextField(blank=True, verbose_name='Erreur')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Envoyé le')),
+                ('campaign', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deliveries', to='ouaf_app.newslettercampaign')),
+                ('person', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('campaign', 'person'), name='unique_newsletter_delivery')],
+            },
+        ),
+    ]
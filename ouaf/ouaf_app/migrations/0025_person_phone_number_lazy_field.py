@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:18
+
+import ouaf_app.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ouaf_app', '0024_newsletter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='person',
+            name='phone_number',
+            field=ouaf_app.fields.PhoneNumberField(max_length=128, null=True, region='FR', verbose_name='Téléphone'),
+        ),
+    ]
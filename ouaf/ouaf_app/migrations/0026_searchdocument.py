@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:42
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ouaf_app', '0025_person_phone_number_lazy_field'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('animal', 'Animal'), ('activity', 'Activité'), ('category', "Catégorie d'activités"), ('event', 'Événement'), ('team', 'Équipe')], max_length=10, verbose_name='Type')),
+                ('object_id', models.BigIntegerField(verbose_name='Identifiant')),
+                ('title', models.CharField(max_length=1000, verbose_name='Titre')),
+                ('body', models.TextField(blank=True, verbose_name='Texte')),
+                ('url_name', models.CharField(blank=True, max_length=100)),
+                ('url_args', models.JSONField(blank=True, default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('vector_fr', models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='french', weight='A'), '||', django.contrib.postgres.search.SearchVector('body', config='french', weight='B'), django.contrib.postgres.search.SearchConfig('french')), output_field=django.contrib.postgres.search.SearchVectorField())),
+                ('vector_en', models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('title', config='english', weight='A'), '||', django.contrib.postgres.search.SearchVector('body', config='english', weight='B'), django.contrib.postgres.search.SearchConfig('english')), output_field=django.contrib.postgres.search.SearchVectorField())),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.GinIndex(fields=['vector_fr'], name='search_vector_fr'), django.contrib.postgres.indexes.GinIndex(fields=['vector_en'], name='search_vector_en')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='unique_search_document')],
+            },
+        ),
+        # STORAGE MAIN keeps the vectors inline in the row, still compressed, rather than out of line in TOAST:
+        # a search reads each matching vector once, a TOAST lookup per vector doubled the latency of frequent
+        # words (see `manage.py bench_search`).
+        migrations.RunSQL(
+            "ALTER TABLE ouaf_app_searchdocument ALTER COLUMN vector_fr SET STORAGE MAIN, "
+            "ALTER COLUMN vector_en SET STORAGE MAIN",
+            "ALTER TABLE ouaf_app_searchdocument ALTER COLUMN vector_fr SET STORAGE EXTENDED, "
+            "ALTER COLUMN vector_en SET STORAGE EXTENDED",
+        ),
+    ]
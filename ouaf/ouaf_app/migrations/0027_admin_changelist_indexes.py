@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:57
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ouaf_app', '0026_searchdocument'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['start', 'id'], name='event_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('summary'), name='gin_trgm_ops'), name='event_summary_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('description'), name='gin_trgm_ops'), name='event_description_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='memberpayment',
+            index=models.Index(fields=['paymentDate', 'id'], name='memberpayment_date_idx'),
+        ),
+    ]
@@ -1,11 +1,16 @@
-from mimetypes import guess_type
-
 from django.db import models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Upper
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.contrib.auth.models import AbstractUser, Group
 from django.conf import settings
+from django.core.mail import EmailMultiAlternatives
+from django.utils import timezone
 from .groups import *
 from django.utils.translation import gettext_lazy as _
-from phonenumber_field.modelfields import PhoneNumberField
+from . import auth_cache, instrumentation, mediatypes
+from .fields import PhoneNumberField
 
 
 # Create your models here.
@@ -44,7 +49,7 @@ class Person(AbstractUser):
     )
 
     def belongs_to_group(self, group_name):
-        return self.groups.filter(name=group_name).exists()
+        return group_name in auth_cache.get_authorizations(self)["groups"]
 
     def set_group(self, group_name, value):
         group = Group.objects.get(name=group_name)
@@ -54,6 +59,11 @@ class Person(AbstractUser):
         permissions = [
             ("can_change_user_role", _("Peut changer les rôles utilisateurs"))
         ]
+        # Trigram indexes backing the backoffice person autocomplete (UPPER(...) LIKE ...).
+        indexes = [
+            GinIndex(OpClass(Upper(field), name="gin_trgm_ops"), name=f"person_{field}_trgm")
+            for field in ("username", "email", "first_name", "last_name")
+        ]
 
 
 class Event(models.Model):
@@ -83,6 +93,12 @@ class Event(models.Model):
         permissions = [
             ("can_publish_event", _("Peut publier un événement")),
         ]
+        # Admin changelist (see ouaf_app.changelists): date_hierarchy and ordering, search (UPPER(...) LIKE ...).
+        indexes = [
+            models.Index(fields=["start", "id"], name="event_start_idx"),
+            *(GinIndex(OpClass(Upper(field), name="gin_trgm_ops"), name=f"event_{field}_trgm")
+              for field in ("summary", "description")),
+        ]
 
 
 class MemberPayment(models.Model):
@@ -95,6 +111,10 @@ class MemberPayment(models.Model):
     paymentDate = models.DateTimeField(_("Date de paiement"))
     amount = models.FloatField(_("Montant"))
 
+    class Meta:
+        # Admin changelist (see ouaf_app.changelists): date_hierarchy and ordering.
+        indexes = [models.Index(fields=["paymentDate", "id"], name="memberpayment_date_idx")]
+
 
 class Animal(models.Model):
     name = models.CharField(_("Nom"), max_length=100)
@@ -102,6 +122,22 @@ class Animal(models.Model):
     birth = models.DateField(_("Date de naissance"), null=True, blank=True)
     death = models.DateField(_("Date de décès"), null=True, blank=True)
     pet_amount = models.PositiveIntegerField(_("Nombre de caresses"), default=0, blank=True)
+    cover = models.ForeignKey(
+        "AnimalMedia",
+        verbose_name=_("Image de présentation"),
+        null=True,
+        blank=True,
+        editable=False,
+        on_delete=models.SET_NULL,
+        related_name="+",
+    )
+
+    def refresh_cover(self):
+        """
+        Store the first image of the animal (by position) as its cover, so that
+        lists can resolve it with a single join instead of walking every media.
+        """
+        Animal.objects.filter(pk=self.pk).update(cover=AnimalMedia.first_image("animal"))
 
 
 class OrganisationChartEntry(models.Model):
@@ -127,10 +163,20 @@ class Activity(models.Model):
     description = models.TextField(_("Description"))
 
 
+class MediaKind(models.TextChoices):
+    IMAGE = mediatypes.KIND_IMAGE, _("Image")
+    VIDEO = mediatypes.KIND_VIDEO, _("Vidéo")
+    OTHER = mediatypes.KIND_OTHER, _("Autre")
+
+
 class AbstractMedia(models.Model):
     url = models.URLField(_("URL"), blank=True)
     caption = models.CharField(_("Légende"), max_length=200, blank=True)
     position = models.PositiveIntegerField(_("Position"), default=0)
+    # Detected once on save (see mediatypes.detect); empty until then.
+    kind = models.CharField(_("Type"), max_length=10, choices=MediaKind.choices, blank=True, editable=False,
+                            db_index=True)
+    mime = models.CharField(_("Type MIME"), max_length=100, blank=True, editable=False, db_index=True)
 
     class Meta:
         abstract = True
@@ -139,19 +185,43 @@ class AbstractMedia(models.Model):
     def __str__(self):
         return self.caption or (self.file.name if self.file else self.url or "media")
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_source = instance._source()
+        return instance
+
+    def _source(self):
+        return self.__dict__.get("file"), self.__dict__.get("url")
+
+    def save(self, *args, **kwargs):
+        new_upload = bool(self.file) and not self.file._committed
+        if new_upload or not self.kind or self._source() != getattr(self, "_loaded_source", None):
+            self.detect_type()
+        super().save(*args, **kwargs)
+        self._loaded_source = self._source()
+
+    def detect_type(self):
+        with instrumentation.phase("media"):
+            self.kind, self.mime = mediatypes.detect(self.file, self.url)
+
+    @classmethod
+    def first_image(cls, owner, field="pk"):
+        """Subquery selecting `field` of the first image attached to the outer `owner` row."""
+        images = cls.objects.filter(**{owner: OuterRef("pk")}, kind=MediaKind.IMAGE).order_by("position", "id")
+        return Subquery(images.values(field)[:1])
+
     @property
-    def mime(self):
-        src = self.file.name if self.file else self.url
-        m, _ = guess_type(src or "")
-        return m or ""
+    def src(self):
+        return self.file.url if self.file else self.url
 
     @property
     def is_image(self):
-        return self.mime.startswith("image/")
+        return self.kind == MediaKind.IMAGE
 
     @property
     def is_video(self):
-        return self.mime.startswith("video") or ("youtu" in (self.url or ""))
+        return self.kind == MediaKind.VIDEO
 
 
 class ActivityMedia(AbstractMedia):
@@ -168,3 +238,181 @@ class AnimalMedia(AbstractMedia):
         return f"{self.animal.name} - {super().__str__()}"
     class Meta:
         ordering = ["position", "id"]
+
+
+class ImageRendition(models.Model):
+    """A resized copy of an uploaded image, see `ouaf_app.renditions`."""
+    source = models.CharField(_("Original"), max_length=255, db_index=True)
+    file = models.FileField(_("Fichier"), max_length=255)
+    width = models.PositiveIntegerField(_("Largeur"))
+    height = models.PositiveIntegerField(_("Hauteur"))
+    format = models.CharField(_("Format"), max_length=10)
+
+    class Meta:
+        ordering = ["source", "format", "width"]
+        constraints = [
+            models.UniqueConstraint(fields=["source", "format", "width"], name="unique_image_rendition"),
+        ]
+
+    def __str__(self):
+        return self.file.name
+
+
+class OutboxEmail(models.Model):
+    """An email waiting to be sent by the `send_outbox` command, see `ouaf_app.outbox`."""
+
+    class Status(models.TextChoices):
+        QUEUED = "queued", _("En attente")
+        SENT = "sent", _("Envoyé")
+        DEAD = "dead", _("Abandonné")
+
+    request_id = models.CharField(_("Identifiant de requête"), max_length=64, db_index=True)
+    purpose = models.CharField(_("Objet"), max_length=30)
+    subject = models.CharField(_("Sujet"), max_length=255)
+    body = models.TextField(_("Texte"))
+    html = models.TextField(_("HTML"), blank=True)
+    from_email = models.CharField(_("Expéditeur"), max_length=255)
+    to = models.JSONField(_("Destinataires"), default=list)
+    reply_to = models.JSONField(_("Répondre à"), default=list, blank=True)
+    headers = models.JSONField(_("En-têtes"), default=dict, blank=True)
+    status = models.CharField(_("Statut"), max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveIntegerField(_("Tentatives"), default=0)
+    next_attempt_at = models.DateTimeField(_("Prochaine tentative"), default=timezone.now)
+    last_error = models.TextField(_("Dernière erreur"), blank=True)
+    created_at = models.DateTimeField(_("Créé le"), auto_now_add=True)
+    sent_at = models.DateTimeField(_("Envoyé le"), null=True, blank=True)
+
+    class Meta:
+        ordering = ["next_attempt_at", "id"]
+        indexes = [models.Index(fields=["status", "next_attempt_at"], name="outbox_due_idx")]
+        constraints = [
+            # One message per purpose and request: a replayed submission can't be queued twice.
+            models.UniqueConstraint(fields=["request_id", "purpose"], name="unique_outbox_request_purpose"),
+        ]
+
+    def __str__(self):
+        return f"{self.request_id} ({self.purpose})"
+
+    def to_message(self, connection=None):
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            to=self.to,
+            reply_to=self.reply_to,
+            headers=self.headers,
+            connection=connection,
+        )
+        if self.html:
+            message.attach_alternative(self.html, "text/html")
+        return message
+
+
+class RateLimitCounter(models.Model):
+    """Hits of one rate-limit bucket in one fixed window, for `ratelimit.DatabaseBackend`."""
+    bucket = models.CharField(max_length=255)
+    window_index = models.BigIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["bucket", "window_index"], name="unique_ratelimit_window"),
+        ]
+
+
+class NewsletterCampaign(models.Model):
+    """A newsletter sent to the subscribed members by the `send_newsletter` command."""
+
+    class Status(models.TextChoices):
+        DRAFT = "draft", _("Brouillon")
+        SENDING = "sending", _("En cours d'envoi")
+        DONE = "done", _("Envoyée")
+
+    subject = models.CharField(_("Sujet"), max_length=255)
+    body_html = models.TextField(
+        _("Contenu HTML"),
+        help_text=_("$first_name, $last_name et $email sont remplacés pour chaque destinataire."),
+    )
+    status = models.CharField(_("Statut"), max_length=10, choices=Status.choices, default=Status.DRAFT)
+    created_at = models.DateTimeField(_("Créée le"), auto_now_add=True)
+    started_at = models.DateTimeField(_("Début de l'envoi"), null=True, blank=True)
+    finished_at = models.DateTimeField(_("Fin de l'envoi"), null=True, blank=True)
+    # Progress, saved after every batch: the send can be followed and resumed.
+    last_person_id = models.BigIntegerField(_("Dernier destinataire traité"), default=0)
+    sent_count = models.PositiveIntegerField(_("Envoyés"), default=0)
+    failed_count = models.PositiveIntegerField(_("Échecs"), default=0)
+    messages_per_second = models.FloatField(_("Messages par seconde"), default=0)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return self.subject
+
+
+class NewsletterDelivery(models.Model):
+    """
+    One recipient of a campaign. The row is written before the message is sent
+    and is unique per campaign and person, so a person never receives a
+    campaign twice, even when a crashed send is resumed.
+    """
+
+    class Status(models.TextChoices):
+        SENDING = "sending", _("En cours")
+        SENT = "sent", _("Envoyé")
+        FAILED = "failed", _("Échec")
+
+    campaign = models.ForeignKey(NewsletterCampaign, on_delete=models.CASCADE, related_name="deliveries")
+    person = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="+")
+    status = models.CharField(_("Statut"), max_length=10, choices=Status.choices, default=Status.SENDING)
+    error = models.TextField(_("Erreur"), blank=True)
+    sent_at = models.DateTimeField(_("Envoyé le"), null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["campaign", "person"], name="unique_newsletter_delivery"),
+        ]
+
+
+def _search_vector(config):
+    # Title words rank above body words.
+    return SearchVector("title", weight="A", config=config) + SearchVector("body", weight="B", config=config)
+
+
+class SearchDocument(models.Model):
+    """
+    Searchable copy of a public object (see `ouaf_app.search`), kept up to date
+    by signals. PostgreSQL computes the French and English vectors.
+    """
+
+    class Kind(models.TextChoices):
+        ANIMAL = "animal", _("Animal")
+        ACTIVITY = "activity", _("Activité")
+        CATEGORY = "category", _("Catégorie d'activités")
+        EVENT = "event", _("Événement")
+        TEAM = "team", _("Équipe")
+
+    kind = models.CharField(_("Type"), max_length=10, choices=Kind.choices)
+    object_id = models.BigIntegerField(_("Identifiant"))
+    title = models.CharField(_("Titre"), max_length=1000)
+    body = models.TextField(_("Texte"), blank=True)
+    # Page of the object: URL name and arguments (empty: no page).
+    url_name = models.CharField(max_length=100, blank=True)
+    url_args = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    vector_fr = models.GeneratedField(expression=_search_vector("french"), output_field=SearchVectorField(),
+                                      db_persist=True)
+    vector_en = models.GeneratedField(expression=_search_vector("english"), output_field=SearchVectorField(),
+                                      db_persist=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "object_id"], name="unique_search_document"),
+        ]
+        indexes = [
+            GinIndex(fields=["vector_fr"], name="search_vector_fr"),
+            GinIndex(fields=["vector_en"], name="search_vector_en"),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}: {self.title}"
@@ -0,0 +1,179 @@
+"""
+Newsletter delivery, driven by the `send_newsletter` command.
+
+The campaign is rendered once (emails/newsletter.html); each recipient only
+costs a `string.Template` substitution of $first_name, $last_name and $email.
+Recipients are the active, subscribed members, read by keyset batches of ids
+so memory stays flat whatever the member count.
+
+Messages go through one SMTP connection, reopened after an error or every
+NEWSLETTER_RECONNECT_EVERY messages, and are paced to NEWSLETTER_RATE
+messages per second.
+
+Each send is preceded by a NewsletterDelivery row (unique per campaign and
+person): a resumed or concurrent run skips every person who already has one,
+so nobody gets a campaign twice. A delivery left "sending" by a crash is not
+retried, since the message may have gone out. Progress (cursor, counters,
+throughput) is saved on the campaign after every batch.
+
+Settings:
+    NEWSLETTER_RATE (float)          : messages per second (default 5).
+    NEWSLETTER_BATCH_SIZE (int)      : recipients per batch (default 200).
+    NEWSLETTER_RECONNECT_EVERY (int) : messages per SMTP connection (default 500).
+"""
+import html
+import logging
+import string
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .models import NewsletterCampaign, NewsletterDelivery, Person
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def recipient_count(after_id=0):
+    return (Person.objects.filter(newsletter_subscription=True, is_active=True, id__gt=after_id)
+            .exclude(email="").count())
+
+
+def recipients(after_id=0, batch_size=200):
+    """Yield lists of subscribed recipients (as dicts), by increasing id."""
+    people = (Person.objects.filter(newsletter_subscription=True, is_active=True).exclude(email="")
+              .order_by("id").values("id", "email", "first_name", "last_name"))
+    while batch := list(people.filter(id__gt=after_id)[:batch_size]):
+        yield batch
+        after_id = batch[-1]["id"]
+
+
+class Renderer:
+    """The campaign rendered once; `message()` fills in one recipient."""
+
+    def __init__(self, campaign):
+        html_body = render_to_string("emails/newsletter.html", {"campaign": campaign})
+        self.subject = " ".join(campaign.subject.splitlines()).strip()
+        self.html = string.Template(html_body)
+        self.text = string.Template(strip_tags(html_body))
+
+    def message(self, person, connection=None):
+        values = {key: person[key] for key in ("first_name", "last_name", "email")}
+        escaped = {key: html.escape(value) for key, value in values.items()}
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.text.safe_substitute(values),
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=[person["email"]],
+            connection=connection,
+        )
+        message.attach_alternative(self.html.safe_substitute(escaped), "text/html")
+        return message
+
+
+class Throttle:
+    """Space calls `rate` per second apart (no limit when rate <= 0)."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate if rate > 0 else 0
+        self.next_at = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        delay = self.next_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.next_at = max(self.next_at, time.monotonic()) + self.interval
+
+
+def _reserve(campaign, person_id):
+    try:
+        with transaction.atomic():
+            return NewsletterDelivery.objects.create(campaign=campaign, person_id=person_id)
+    except IntegrityError:
+        return None
+
+
+def send_campaign(campaign, rate=None, batch_size=None, connection=None, progress=None):
+    """
+    Send (or resume) `campaign`; return the campaign with its counters updated.
+    `progress(campaign, elapsed)` is called after every batch.
+    """
+    rate = _setting("NEWSLETTER_RATE", 5) if rate is None else rate
+    batch_size = batch_size or _setting("NEWSLETTER_BATCH_SIZE", 200)
+    reconnect_every = _setting("NEWSLETTER_RECONNECT_EVERY", 500)
+
+    if campaign.status == NewsletterCampaign.Status.DRAFT:
+        campaign.status = NewsletterCampaign.Status.SENDING
+        campaign.started_at = timezone.now()
+        campaign.save(update_fields=["status", "started_at"])
+    else:
+        # Resuming: the counters saved before a crash may lag behind the deliveries.
+        counts = dict(campaign.deliveries.values_list("status").annotate(n=Count("id")))
+        campaign.sent_count = counts.get(NewsletterDelivery.Status.SENT, 0)
+        campaign.failed_count = counts.get(NewsletterDelivery.Status.FAILED, 0)
+
+    renderer = Renderer(campaign)
+    throttle = Throttle(rate)
+    connection = connection or get_connection(fail_silently=False)
+    start = time.monotonic()
+    sent_this_run = on_connection = 0
+
+    try:
+        for batch in recipients(campaign.last_person_id, batch_size):
+            done = set(NewsletterDelivery.objects.filter(campaign=campaign, person_id__in=[p["id"] for p in batch])
+                       .values_list("person_id", flat=True))
+            for person in batch:
+                if person["id"] in done:
+                    continue
+                delivery = _reserve(campaign, person["id"])
+                if delivery is None:
+                    # Another sender got this person first.
+                    continue
+                throttle.wait()
+                try:
+                    if on_connection >= reconnect_every:
+                        connection.close()
+                        on_connection = 0
+                    connection.open()
+                    connection.send_messages([renderer.message(person, connection)])
+                except Exception as error:
+                    connection.close()
+                    on_connection = 0
+                    delivery.status = NewsletterDelivery.Status.FAILED
+                    delivery.error = f"{type(error).__name__}: {error}"[:2000]
+                    delivery.save(update_fields=["status", "error"])
+                    campaign.failed_count += 1
+                    logger.warning("Newsletter delivery failed",
+                                   extra={"campaign": campaign.pk, "person": person["id"]})
+                    continue
+                on_connection += 1
+                sent_this_run += 1
+                delivery.status = NewsletterDelivery.Status.SENT
+                delivery.sent_at = timezone.now()
+                delivery.save(update_fields=["status", "sent_at"])
+                campaign.sent_count += 1
+
+            elapsed = time.monotonic() - start
+            campaign.last_person_id = batch[-1]["id"]
+            campaign.messages_per_second = sent_this_run / elapsed if elapsed else 0
+            campaign.save(update_fields=["last_person_id", "sent_count", "failed_count", "messages_per_second"])
+            if progress:
+                progress(campaign, elapsed)
+    finally:
+        connection.close()
+
+    campaign.status = NewsletterCampaign.Status.DONE
+    campaign.finished_at = timezone.now()
+    campaign.save(update_fields=["status", "finished_at"])
+    return campaign
@@ -0,0 +1,125 @@
+"""
+Transactional outbox for outgoing emails.
+
+Views don't talk to SMTP: `enqueue()` stores the rendered message as an
+OutboxEmail row, in the caller's transaction. The `send_outbox` management
+command (a separate worker) claims due rows, sends them over one reused SMTP
+connection and records the outcome. A failed message is retried with an
+exponential backoff and marked "dead" after OUTBOX_MAX_ATTEMPTS tries.
+
+Claiming a batch leases its rows for OUTBOX_LEASE seconds (using
+SELECT ... FOR UPDATE SKIP LOCKED), so several workers can run side by side
+and a crashed worker's messages are picked up again once the lease expires.
+
+Settings:
+    OUTBOX_MAX_ATTEMPTS (int): attempts before a message is dead (default 8).
+    OUTBOX_BACKOFF_BASE (int): delay after the first failure, in seconds (default 30).
+    OUTBOX_BACKOFF_MAX (int) : upper bound of the delay, in seconds (default 6 hours).
+    OUTBOX_LEASE (int)       : how long a claimed message is reserved, in seconds (default 300).
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(message, request_id, purpose):
+    """Store an EmailMessage/EmailMultiAlternatives to be sent by the worker."""
+    html = next((content for content, mimetype in getattr(message, "alternatives", [])
+                 if mimetype == "text/html"), "")
+    return OutboxEmail.objects.create(
+        request_id=request_id,
+        purpose=purpose,
+        subject=message.subject,
+        body=message.body,
+        html=html,
+        from_email=message.from_email,
+        to=list(message.to),
+        reply_to=list(message.reply_to),
+        headers=dict(message.extra_headers),
+    )
+
+
+def backoff(attempts):
+    """Delay before the next try once `attempts` tries have failed (with ±10% jitter)."""
+    base = _setting("OUTBOX_BACKOFF_BASE", 30)
+    delay = min(base * 2 ** (attempts - 1), _setting("OUTBOX_BACKOFF_MAX", 6 * 60 * 60))
+    return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+def claim(batch_size):
+    """Lease up to `batch_size` due messages to this worker and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.Status.QUEUED, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if batch:
+            OutboxEmail.objects.filter(pk__in=[m.pk for m in batch]).update(
+                next_attempt_at=now + timedelta(seconds=_setting("OUTBOX_LEASE", 300))
+            )
+    return batch
+
+
+def _record_failure(email, error):
+    email.attempts += 1
+    email.last_error = f"{type(error).__name__}: {error}"[:2000]
+    if email.attempts >= _setting("OUTBOX_MAX_ATTEMPTS", 8):
+        email.status = OutboxEmail.Status.DEAD
+        logger.error("Outbox email dead", extra={"request_id": email.request_id, "purpose": email.purpose})
+    else:
+        email.next_attempt_at = timezone.now() + backoff(email.attempts)
+        logger.warning("Outbox email failed, will retry",
+                       extra={"request_id": email.request_id, "purpose": email.purpose})
+    email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+
+
+def send_batch(batch, connection):
+    """Send `batch` over `connection`; return (sent, failed) counts."""
+    sent = failed = 0
+    for email in batch:
+        try:
+            # No-op while the connection is open: it is only (re)opened when needed.
+            connection.open()
+            connection.send_messages([email.to_message(connection)])
+        except Exception as error:
+            failed += 1
+            _record_failure(email, error)
+            # The connection may be unusable now: start a fresh one for the rest.
+            connection.close()
+            continue
+        sent += 1
+        email.attempts += 1
+        email.status = OutboxEmail.Status.SENT
+        email.sent_at = timezone.now()
+        email.last_error = ""
+        email.save(update_fields=["attempts", "status", "sent_at", "last_error"])
+    return sent, failed
+
+
+def process(batch_size=50, connection=None):
+    """Send every due message, batch after batch; return (sent, failed) counts."""
+    connection = connection or get_connection(fail_silently=False)
+    sent = failed = 0
+    try:
+        while batch := claim(batch_size):
+            batch_sent, batch_failed = send_batch(batch, connection)
+            sent += batch_sent
+            failed += batch_failed
+    finally:
+        connection.close()
+    return sent, failed
@@ -0,0 +1,150 @@
+"""
+Full-page cache for anonymous visitors of the public pages.
+
+A cached page is keyed on its language, its path, the query parameters the
+cached views read (QUERY_PARAMETERS) and the current version of every model
+it depends on:
+
+    @cache_public_page(Animal, AnimalMedia)
+    def animal_list(request): ...
+
+Saving or deleting an instance of one of those models bumps the model's
+version (see `ouaf_app.signals`), so only the pages depending on it are
+invalidated. Responses that carry flash messages, set cookies or embed a CSRF
+token are never stored.
+
+Settings:
+    PAGE_CACHE_ALIAS (str)  : cache alias used for pages ("pages" in settings.py).
+    PAGE_CACHE_TIMEOUT (int): lifetime of a cached page in seconds.
+"""
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.utils.translation import get_language
+
+# The only query parameters read by the cached views.
+QUERY_PARAMETERS = ("after", "page")
+
+HITS_KEY = "pagecache:hits"
+MISSES_KEY = "pagecache:misses"
+
+
+def _cache():
+    return caches[getattr(settings, "PAGE_CACHE_ALIAS", "default")]
+
+
+def _version_key(model):
+    return f"pagecache:version:{model._meta.label_lower}"
+
+
+def _count(key):
+    cache = _cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def _versions(models):
+    """Current version of each model; a missing (evicted) version gets a fresh, unique one."""
+    cache = _cache()
+    keys = [_version_key(model) for model in models]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), timeout=None)
+            found[key] = cache.get(key)
+    return [str(found[key]) for key in keys]
+
+
+def invalidate(*models):
+    """Drop every cached page depending on one of `models`."""
+    cache = _cache()
+    for model in models:
+        key = _version_key(model)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def _page_key(request, models):
+    # Other query parameters don't change the page: they mustn't multiply its entries.
+    params = urlencode(sorted((name, request.GET[name]) for name in QUERY_PARAMETERS if name in request.GET))
+    path = hashlib.md5(f"{request.path}?{params}".encode()).hexdigest()
+    return f"pagecache:page:{get_language()}:{'.'.join(_versions(models))}:{path}"
+
+
+def _is_cacheable(request, response):
+    if response.status_code != 200 or response.streaming or response.cookies:
+        return False
+    # A CSRF token was rendered: the page is bound to this visitor.
+    if request.META.get("CSRF_COOKIE_NEEDS_UPDATE"):
+        return False
+    messages = get_messages(request)
+    return not (messages.used or len(messages))
+
+
+def _lookup(request, models):
+    """Return (key, cached response or None)."""
+    key = _page_key(request, models)
+    response = _cache().get(key)
+    _count(MISSES_KEY if response is None else HITS_KEY)
+    return key, response
+
+
+def _store(request, key, response):
+    """Render `response` if needed and cache it when it can be shared; return it."""
+    if hasattr(response, "render") and callable(response.render):
+        response = response.render()
+    if _is_cacheable(request, response):
+        _cache().set(key, response, getattr(settings, "PAGE_CACHE_TIMEOUT", 3600))
+    return response
+
+
+def cache_public_page(*models):
+    """Cache the decorated view (sync or async) for anonymous GET requests, see the module docstring."""
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapped(request, *args, **kwargs):
+                if request.method != "GET" or (await request.auser()).is_authenticated:
+                    return await view(request, *args, **kwargs)
+                key, response = await sync_to_async(_lookup)(request, models)
+                if response is None:
+                    response = await sync_to_async(_store)(request, key, await view(request, *args, **kwargs))
+                return response
+
+            return async_wrapped
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method != "GET" or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            key, response = _lookup(request, models)
+            if response is None:
+                response = _store(request, key, view(request, *args, **kwargs))
+            return response
+
+        return wrapped
+
+    return decorator
+
+
+def stats():
+    cache = _cache()
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counters.get(HITS_KEY, 0), counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_ratio": hits / total if total else 0.0}
+
+
+def reset_stats():
+    _cache().delete_many([HITS_KEY, MISSES_KEY])
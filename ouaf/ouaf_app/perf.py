@@ -0,0 +1,223 @@
+"""
+Performance suite: request every page of ouaf_app.urls and
+ouaf_backoffice_app.urls on the synthetic dataset of `seeding` and compare what it costs with
+the budgets checked in perf_budgets.json.
+
+For each page (see `instrumentation`):
+
+    queries     : SQL queries of a request with cold caches;
+    sql_ms      : time spent in SQL      (median of the runs);
+    template_ms : time spent rendering   (median of the runs);
+    total_ms    : time of the request    (median of the runs).
+
+Every run starts with empty caches (the shared page cache would otherwise
+answer most requests without a query); the template loader is warmed by a
+first, unmeasured request. Public pages are requested anonymously, except
+those behind a login (member), backoffice pages by a Backoffice member.
+
+A page without a budget fails like a page over its budget, so that a new
+URL gets one. `manage.py perf_report` runs the suite on a test database and
+writes the JSON/HTML report; the test suite runs it too.
+"""
+import html
+import json
+import statistics
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import NoReverseMatch, URLPattern, URLResolver, get_resolver, reverse
+from django.utils import translation
+
+from . import instrumentation, seeding
+from .groups import GROUP_BACKOFFICE, GROUP_MEMBER
+from .models import Activity, ActivityCategory, Animal, Event, OrganisationChartEntry, Person
+
+BUDGETS_PATH = Path(__file__).with_name("perf_budgets.json")
+METRICS = ("queries", "sql_ms", "template_ms", "total_ms")
+
+URLCONFS = {"ouaf_app.urls": None, "ouaf_backoffice_app.urls": "backoffice"}
+
+# Not requested: they log out, need a one-time token, or only answer POST.
+SKIP = {"my_logout", "logout", "password_reset_confirm"}
+
+# Public pages behind a login.
+MEMBER_PAGES = {"account_edit", "password_change", "password_change_done"}
+
+# URL arguments: the first object of the model.
+ARGS = {
+    "activities_by_category": ActivityCategory,
+    "animal_detail": Animal,
+    "backoffice:user_edit": Person,
+    "backoffice:activity_detail": Activity,
+    "backoffice:activity_update": Activity,
+    "backoffice:activity_delete": Activity,
+    "backoffice:event_edit": Event,
+    "backoffice:event_delete": Event,
+    "backoffice:animal_edit": Animal,
+    "backoffice:animal_delete": Animal,
+    "backoffice:team_update": OrganisationChartEntry,
+    "backoffice:team_delete": OrganisationChartEntry,
+}
+
+# Query strings: the search pages answer without a query, without searching.
+QUERY_STRINGS = {"search": "q=balade+chien", "search_json": "q=balade+chien"}
+
+PERF_USERS = {"member": ("perf-member", GROUP_MEMBER), "backoffice": ("perf-backoffice", GROUP_BACKOFFICE)}
+
+
+def seed(scale=1):
+    """Create the suite's dataset (`seeding.sizes(scale)`, without image files); return the number of rows."""
+    return sum(seeding.generate(seeding.sizes(scale), images=0).values())
+
+
+def url_names(patterns, namespace=None):
+    """Names of the URL patterns of a urlconf, included ones too, prefixed with `namespace:`."""
+    names = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            nested = ":".join(filter(None, [namespace, pattern.namespace])) or None
+            names += url_names(pattern.url_patterns, nested)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.append(f"{namespace}:{pattern.name}" if namespace else pattern.name)
+    return names
+
+
+def pages():
+    """[(URL name, user role)] of every page of the suite."""
+    result = []
+    for urlconf, namespace in URLCONFS.items():
+        for name in url_names(get_resolver(urlconf).url_patterns, namespace):
+            if name in SKIP:
+                continue
+            role = "backoffice" if namespace == "backoffice" else "member" if name in MEMBER_PAGES else None
+            result.append((name, role))
+    return result
+
+
+def _user(role):
+    username, group = PERF_USERS[role]
+    user = Person.objects.filter(username=username).first()
+    if user is None:
+        user = Person.objects.create_user(username, email=f"{username}@example.org", password="!")
+        user.set_group(group, True)
+    return user
+
+
+def isolated_caches(prefix="perf"):
+    """
+    override_settings() replacing every cache alias with a local-memory cache of
+    its own: clear_caches() must not flush shared caches (a Redis FLUSHDB), nor
+    leave entries computed from a test database in them.
+    """
+    return override_settings(CACHES={
+        alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"{prefix}-{alias}"}
+        for alias in settings.CACHES
+    })
+
+
+def clear_caches():
+    """Empty every configured cache (see isolated_caches())."""
+    for cache in caches.all():
+        cache.clear()
+
+
+def measure_page(client, path, runs=3):
+    """Request `path` (once to warm up, then `runs` times with cold caches); return its metrics."""
+    client.get(path)
+    measures = []
+    for _ in range(runs):
+        clear_caches()
+        with instrumentation.measure() as measure:
+            response = client.get(path)
+        measures.append(measure)
+    result = {"status": response.status_code, "queries": measures[0].queries}
+    for metric in METRICS[1:]:
+        result[metric] = round(statistics.median(getattr(m, metric) for m in measures), 2)
+    return result
+
+
+def run(runs=3, language="fr", names=None):
+    """Measure every page (or those of `names`); return {URL name: metrics (or {"error": ...})}."""
+    results = {}
+    clients = {}
+    for name, role in pages():
+        if names is not None and name not in names:
+            continue
+        model = ARGS.get(name)
+        try:
+            with translation.override(language):
+                path = reverse(name, args=[model.objects.order_by("pk").values_list("pk", flat=True)[0]] if model
+                               else [])
+        except (NoReverseMatch, IndexError):
+            results[name] = {"error": "no URL arguments (add the page to perf.ARGS and seed its model)"}
+            continue
+        if name in QUERY_STRINGS:
+            path = f"{path}?{QUERY_STRINGS[name]}"
+        if role not in clients:
+            # A failing page is reported (status 500) rather than stopping the suite.
+            clients[role] = Client(raise_request_exception=False)
+            if role:
+                clients[role].force_login(_user(role))
+        results[name] = {"path": path, **measure_page(clients[role], path, runs)}
+    return results
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def check(results, budgets):
+    """[violation message] of the results against the budgets."""
+    violations = []
+    for name, result in results.items():
+        if "error" in result:
+            violations.append(f"{name}: {result['error']}")
+            continue
+        if result["status"] != 200:
+            violations.append(f"{name}: status {result['status']}")
+        if name not in budgets["pages"]:
+            violations.append(f"{name}: no budget in {BUDGETS_PATH.name}")
+            continue
+        budget = {**budgets.get("default", {}), **budgets["pages"][name]}
+        for metric in METRICS:
+            if metric in budget and result[metric] > budget[metric]:
+                violations.append(f"{name}: {metric} {result[metric]} > {budget[metric]}")
+    return violations
+
+
+def update_budgets(results, budgets):
+    """Set the query budget of every measured page to its current count (latency budgets are kept)."""
+    for name, result in results.items():
+        if "queries" in result:
+            budgets["pages"].setdefault(name, {})["queries"] = result["queries"]
+    budgets["pages"] = dict(sorted(budgets["pages"].items()))
+    return budgets
+
+
+def write_json(results, violations, path):
+    with open(path, "w") as f:
+        json.dump({"pages": results, "violations": violations}, f, indent=2)
+
+
+def write_html(results, violations, budgets, path):
+    rows = []
+    for name, result in sorted(results.items()):
+        budget = {**budgets.get("default", {}), **budgets["pages"].get(name, {})}
+        over = any(v.startswith(f"{name}: ") for v in violations)
+        cells = [html.escape(name), html.escape(result.get("path", result.get("error", "")))]
+        cells += [f"{result[m]} / {budget[m]}" if m in budget else str(result.get(m, "")) for m in METRICS]
+        rows.append(f'<tr class="{"over" if over else "ok"}">' + "".join(f"<td>{c}</td>" for c in cells) + "</tr>")
+    headers = "".join(f"<th>{h}</th>" for h in ("page", "path") + METRICS)
+    items = "".join(f"<li>{html.escape(v)}</li>" for v in violations) or "<li>none</li>"
+    with open(path, "w") as f:
+        f.write(
+            "<!doctype html><meta charset=utf-8><title>Performance report</title>"
+            "<style>body{font-family:sans-serif}td,th{padding:2px 8px;text-align:left}"
+            ".over{background:#fdd}.ok{background:#efe}</style>"
+            f"<h1>Performance report</h1><p>measured / budget</p><table><tr>{headers}</tr>{''.join(rows)}</table>"
+            f"<h2>Violations</h2><ul>{items}</ul>"
+        )
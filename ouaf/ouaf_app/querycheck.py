@@ -0,0 +1,190 @@
+"""
+Development and test checks on the SQL of each request: repeated queries
+(N+1) and slow queries.
+
+`QueryCheckMiddleware` (ouaf_app.middleware) records the queries of each
+request, grouped by normalized statement (parameters, literals and IN lists
+replaced) and call site: the innermost line of the project's code that ran
+it, and the innermost template tag or variable when a template did. A
+statement repeated more than QUERY_CHECK_THRESHOLD times from the same call
+site is a lazy load in a loop: it is logged, or raised as
+RepeatedQueriesError, which fails the test that made the request (the test
+runner, `QueryCheckRunner`, turns the check on in "raise" mode).
+
+    with querycheck.check() as log:
+        ...
+    log.repeated(threshold)
+
+Code that repeats a query on purpose opts out with `querycheck.allow()`
+(context manager or decorator).
+
+Queries slower than SLOW_QUERY_MS are logged with their plan (EXPLAIN, run
+on the same connection, in a savepoint).
+
+Settings:
+    QUERY_CHECK (str)           : "warn", "raise" or "off" (default "off").
+    QUERY_CHECK_THRESHOLD (int) : repeats allowed per statement and call site (default 5).
+    SLOW_QUERY_MS (int)         : log the queries slower than this, with their plan (default 0, never).
+"""
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("ouaf_querycheck", default=None)
+_allowed = ContextVar("ouaf_querycheck_allowed", default=False)
+_installed = False
+
+_IN_LIST = re.compile(r"\bIN \(\?(?:, \?)*\)")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+
+_TEMPLATE_MODULE = os.path.join("django", "template", "base.py")
+# Execute wrappers: not call sites.
+_WRAPPERS = {__file__, instrumentation.__file__}
+
+
+class RepeatedQueriesError(AssertionError):
+    """A request repeated a query more than QUERY_CHECK_THRESHOLD times from one call site."""
+
+
+def normalize(sql):
+    """The statement without its values: queries differing only by parameters are the same."""
+    sql = _NUMBER.sub("?", _STRING.sub("?", sql)).replace("%s", "?")
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+def call_site():
+    """Where the current query comes from: the innermost project line, and template node if any."""
+    code = template = None
+    frame = sys._getframe(1)
+    while frame is not None and not (code and template):
+        filename = frame.f_code.co_filename
+        if template is None and frame.f_code.co_name == "render_annotated" and filename.endswith(_TEMPLATE_MODULE):
+            node = frame.f_locals.get("self")
+            origin, token = getattr(node, "origin", None), getattr(node, "token", None)
+            if origin is not None and token is not None:
+                template = f"{origin.template_name}:{token.lineno}"
+        elif code is None and filename.startswith(_project_dir()) and "site-packages" not in filename \
+                and filename not in _WRAPPERS:
+            code = f"{os.path.relpath(filename, _project_dir())}:{frame.f_lineno} ({frame.f_code.co_name})"
+        frame = frame.f_back
+    return " in ".join(site for site in (code, template) if site) or "?"
+
+
+def _project_dir():
+    return str(settings.BASE_DIR)
+
+
+class QueryLog:
+    """The queries of a request, counted by (normalized statement, call site)."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def add(self, sql):
+        self.counts[normalize(sql), call_site()] += 1
+
+    def repeated(self, threshold):
+        """[(count, statement, call site)] of the statements run more than `threshold` times, most first."""
+        return sorted(((count, sql, site) for (sql, site), count in self.counts.items() if count > threshold),
+                      reverse=True)
+
+
+def report(repeats, where=""):
+    lines = [f"Repeated queries{f' in {where}' if where else ''} (N+1): load them with select_related(), "
+             f"prefetch_related() or an annotation."]
+    lines += [f"  {count}× at {site}: {sql}" for count, sql, site in repeats]
+    return "\n".join(lines)
+
+
+def explain(connection, sql, params):
+    """The plan of a SELECT, or None."""
+    if not sql.lstrip().upper().startswith("SELECT"):
+        return None
+    token = _allowed.set(True)
+    try:
+        # In a savepoint: an error must not break the request's transaction.
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {sql}", params)
+            return "\n".join(row[0] for row in cursor.fetchall())
+    except DatabaseError:
+        return None
+    finally:
+        _allowed.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding the query to the current log and logging it when slow."""
+    if _allowed.get():
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    result = execute(sql, params, many, context)
+    elapsed = (time.perf_counter() - start) * 1000
+    if (log := _current.get()) is not None:
+        log.add(sql)
+    slow_ms = getattr(settings, "SLOW_QUERY_MS", 0)
+    if slow_ms and elapsed >= slow_ms and not many:
+        plan = explain(context["connection"], sql, params)
+        logger.warning("Slow query (%.0f ms) at %s: %s\n%s", elapsed, call_site(), sql, plan or "(no plan)",
+                       extra={"duration_ms": elapsed})
+    return result
+
+
+def _wrap_connection(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def install():
+    """Check the queries of every database connection, the ones opened later too (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    for connection in connections.all():
+        _wrap_connection(connection)
+    connection_created.connect(_wrap_connection, dispatch_uid="ouaf_app_querycheck")
+
+
+def start():
+    """Start recording the queries of the current context; stop with `stop(token)`."""
+    install()
+    log = QueryLog()
+    return log, _current.set(log)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def check():
+    """Record the queries of the enclosed code; the yielded QueryLog is complete once the block exits."""
+    log, token = start()
+    try:
+        yield log
+    finally:
+        stop(token)
+
+
+@contextmanager
+def allow():
+    """Neither record nor time the queries of the enclosed code (e.g. a loop that can't be batched)."""
+    token = _allowed.set(True)
+    try:
+        yield
+    finally:
+        _allowed.reset(token)
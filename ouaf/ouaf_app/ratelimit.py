@@ -0,0 +1,262 @@
+"""
+Sliding-window rate limiting shared by every worker.
+
+A limit allows `limit` hits per `window` seconds for each value of a key
+(client IP, submitted email, user id, or any callable of the request). The
+sliding window is approximated with two fixed windows: the previous window's
+count is weighted by the part of it still inside the sliding window.
+
+Counters are only touched with atomic operations (`incr` on the cache,
+INSERT ... ON CONFLICT DO UPDATE on the database), so concurrent requests
+from several processes can't exceed the limit. Blocked hits are not counted
+against the window, and are tallied per scope (see `stats()`).
+
+    @ratelimit("signup", limit=10, window=3600, key="ip")
+    def signup(request): ...
+
+    class ContactView(RateLimitMixin, FormView):
+        rate_limits = [RateLimit("contact", limit=5, window=900, key="ip")]
+
+Settings:
+    RATELIMIT_BACKEND (str)    : "cache" (default) or "db" (RateLimitCounter table).
+    RATELIMIT_CACHE_ALIAS (str): cache used by the "cache" backend and for the
+                                 blocked counters. It must be shared by the
+                                 workers (not locmem) for a global limit, and
+                                 support atomic incr (redis, memcached).
+"""
+import hashlib
+import math
+import random
+import time
+from dataclasses import dataclass
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.http import HttpResponse
+
+BLOCKED_KEY = "ratelimit:blocked:{scope}"
+
+
+def _cache():
+    return caches[getattr(settings, "RATELIMIT_CACHE_ALIAS", "default")]
+
+
+def client_ip(request):
+    xff = request.META.get("HTTP_X_FORWARDED_FOR")
+    if xff:
+        return xff.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR", "0.0.0.0")
+
+
+KEY_FUNCTIONS = {
+    "ip": client_ip,
+    "user": lambda request: str(request.user.pk) if request.user.is_authenticated else None,
+    "email": lambda request: (request.POST.get("email") or "").strip().lower() or None,
+}
+
+
+@dataclass(frozen=True)
+class Decision:
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: int
+
+
+class CacheBackend:
+    """Counters in a cache; atomic as long as the cache's incr/decr are."""
+
+    def _incr(self, key, timeout):
+        cache = _cache()
+        cache.add(key, 0, timeout=timeout)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Evicted between add() and incr().
+            cache.add(key, 1, timeout=timeout)
+            return 1
+
+    def hit(self, bucket, index, window):
+        current = self._incr(f"ratelimit:{bucket}:{index}", timeout=2 * window)
+        previous = _cache().get(f"ratelimit:{bucket}:{index - 1}", 0)
+        return previous, current
+
+    def undo(self, bucket, index):
+        try:
+            _cache().decr(f"ratelimit:{bucket}:{index}")
+        except ValueError:
+            pass
+
+
+class DatabaseBackend:
+    """Counters in the RateLimitCounter table, incremented with an upsert."""
+
+    def _table(self):
+        from .models import RateLimitCounter
+
+        return connection.ops.quote_name(RateLimitCounter._meta.db_table)
+
+    def hit(self, bucket, index, window):
+        table = self._table()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (bucket, window_index, count) VALUES (%s, %s, 1) "
+                f"ON CONFLICT (bucket, window_index) DO UPDATE SET count = {table}.count + 1 "
+                f"RETURNING count",
+                [bucket, index],
+            )
+            current = cursor.fetchone()[0]
+            cursor.execute(f"SELECT count FROM {table} WHERE bucket = %s AND window_index = %s",
+                           [bucket, index - 1])
+            row = cursor.fetchone()
+            # Now and then, drop the windows nobody will read again.
+            if random.random() < 0.01:
+                cursor.execute(f"DELETE FROM {table} WHERE window_index < %s AND bucket LIKE %s",
+                               [index - 1, bucket.split(":", 1)[0] + ":%"])
+        return (row[0] if row else 0), current
+
+    def undo(self, bucket, index):
+        with connection.cursor() as cursor:
+            cursor.execute(f"UPDATE {self._table()} SET count = count - 1 WHERE bucket = %s AND window_index = %s",
+                           [bucket, index])
+
+
+BACKENDS = {"cache": CacheBackend, "db": DatabaseBackend}
+
+
+def get_backend(name=None):
+    return BACKENDS[name or getattr(settings, "RATELIMIT_BACKEND", "cache")]()
+
+
+class RateLimit:
+    def __init__(self, scope, limit, window, key="ip", methods=("POST",), backend=None):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        self.key = KEY_FUNCTIONS[key] if isinstance(key, str) else key
+        self.key_name = key if isinstance(key, str) else getattr(key, "__name__", "key")
+        self.methods = {m.upper() for m in methods} if methods else None
+        self.backend = backend
+
+    def applies_to(self, request):
+        return self.methods is None or request.method in self.methods
+
+    def _bucket(self, value):
+        digest = hashlib.md5(value.encode()).hexdigest()
+        return f"{self.scope}:{self.key_name}:{digest}"
+
+    def hit(self, request, now=None):
+        """Count one hit for this request; return a Decision (None when the key has no value)."""
+        value = self.key(request)
+        if value is None:
+            return None
+        return self.hit_key(value, now)
+
+    def hit_key(self, value, now=None):
+        backend = self.backend or get_backend()
+        now = time.time() if now is None else now
+        index, elapsed = divmod(now, self.window)
+        index = int(index)
+        weight = 1 - elapsed / self.window
+
+        bucket = self._bucket(value)
+        previous, current = backend.hit(bucket, index, self.window)
+        estimate = previous * weight + current
+        if estimate <= self.limit:
+            return Decision(True, self.limit, int(self.limit - estimate), 0)
+
+        backend.undo(bucket, index)
+        _count_blocked(self.scope)
+        current -= 1
+        if current < self.limit:
+            # Room is made in this window once the previous one's weight has decayed enough.
+            retry_after = (weight - (self.limit - current - 1) / previous) * self.window
+        else:
+            # Wait for the next window, and for this one's weight to decay in it.
+            retry_after = self.window - elapsed + max(0.0, 1 - (self.limit - 1) / current) * self.window
+        return Decision(False, self.limit, 0, max(1, math.ceil(retry_after)))
+
+
+def _count_blocked(scope):
+    cache = _cache()
+    for key in (BLOCKED_KEY.format(scope=scope), BLOCKED_KEY.format(scope="*")):
+        if not cache.add(key, 1, timeout=None):
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, timeout=None)
+
+
+def stats(*scopes):
+    """Number of blocked hits per scope ("*" is the total)."""
+    keys = {scope: BLOCKED_KEY.format(scope=scope) for scope in ("*",) + scopes}
+    found = _cache().get_many(list(keys.values()))
+    return {scope: found.get(key, 0) for scope, key in keys.items()}
+
+
+def too_many_requests(decision):
+    response = HttpResponse("Rate limit exceeded", status=429)
+    response["Retry-After"] = str(decision.retry_after)
+    return response
+
+
+def check(limits, request):
+    """Apply `limits` to `request`; return the first blocking Decision, or None."""
+    for limit in limits:
+        if limit.applies_to(request):
+            decision = limit.hit(request)
+            if decision is not None and not decision.allowed:
+                return decision
+    return None
+
+
+def ratelimit(scope, limit, window, key="ip", methods=("POST",)):
+    """Rate-limit a function view (sync or async); blocked requests get a 429 with Retry-After."""
+    rule = RateLimit(scope, limit, window, key=key, methods=methods)
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapped(request, *args, **kwargs):
+                decision = await sync_to_async(check)([rule], request)
+                if decision:
+                    return too_many_requests(decision)
+                return await view(request, *args, **kwargs)
+
+            return async_wrapped
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            decision = check([rule], request)
+            if decision:
+                return too_many_requests(decision)
+            return view(request, *args, **kwargs)
+
+        return wrapped
+
+    return decorator
+
+
+class RateLimitMixin:
+    """Apply `rate_limits` (a list of RateLimit) in dispatch(); override `rate_limited()` to customize the 429."""
+    rate_limits = []
+
+    def rate_limited(self, request, decision):
+        return too_many_requests(decision)
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self._async_dispatch(request, *args, **kwargs)
+        decision = check(self.rate_limits, request)
+        if decision:
+            return self.rate_limited(request, decision)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def _async_dispatch(self, request, *args, **kwargs):
+        decision = await sync_to_async(check)(self.rate_limits, request)
+        if decision:
+            return await sync_to_async(self.rate_limited)(request, decision)
+        return await super().dispatch(request, *args, **kwargs)
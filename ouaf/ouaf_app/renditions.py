@@ -0,0 +1,155 @@
+"""
+Responsive image renditions.
+
+After an image is uploaded, width-bounded WebP and JPEG variants are generated
+in a background thread and stored next to the original, e.g.
+
+    animals/media/rex.jpg  ->  animals/media/rex.1a2b3c4d.w640.webp
+
+The short content hash in the name makes every rendition immutable, so it can
+be served with a long-lived cache. Each variant is recorded as an
+ImageRendition row; the `responsive_image` template tag reads them (through
+the cache) to emit `srcset`/`sizes`.
+"""
+import hashlib
+import logging
+import posixpath
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from . import page_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (320, 640, 1024, 1600)
+DEFAULT_FORMATS = ("webp", "jpeg")
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+CACHE_TIMEOUT = 24 * 60 * 60
+
+# Matches the names built by rendition_name(): their content never changes.
+IMMUTABLE_NAME_RE = re.compile(r"\.[0-9a-f]{8}\.w\d+\.(webp|jpg)$")
+
+_executor = None
+
+
+def _widths():
+    return tuple(getattr(settings, "RENDITION_WIDTHS", DEFAULT_WIDTHS))
+
+
+def _formats():
+    return tuple(getattr(settings, "RENDITION_FORMATS", DEFAULT_FORMATS))
+
+
+def _cache_key(source):
+    return "renditions:" + hashlib.sha1(source.encode()).hexdigest()
+
+
+def rendition_name(source, digest, width, fmt):
+    root, _ext = posixpath.splitext(source)
+    return f"{root}.{digest}.w{width}.{EXTENSIONS[fmt]}"
+
+
+def generate(source, force=False):
+    """Create the renditions of the image stored at `source` (a storage name)."""
+    from PIL import Image, ImageOps
+    from .models import ImageRendition
+
+    if not force and ImageRendition.objects.filter(source=source).exists():
+        return []
+
+    with default_storage.open(source, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha1(data).hexdigest()[:8]
+
+    with Image.open(ContentFile(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = "A" in image.getbands() or "transparency" in image.info
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+    # Never upscale: an image smaller than every width gets a single variant.
+    widths = [w for w in _widths() if w < image.width] or [image.width]
+    renditions = []
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.Resampling.LANCZOS)
+        for fmt in _formats():
+            name = rendition_name(source, digest, width, fmt)
+            if not default_storage.exists(name):
+                out = ContentFile(b"")
+                frame = resized.convert("RGB") if fmt == "jpeg" else resized
+                frame.save(out, format=fmt.upper(), quality=82, optimize=True)
+                name = default_storage.save(name, out)
+            renditions.append(ImageRendition(source=source, file=name, width=width, height=height, format=fmt))
+
+    with transaction.atomic():
+        ImageRendition.objects.filter(source=source).delete()
+        ImageRendition.objects.bulk_create(renditions)
+    cache.delete(_cache_key(source))
+    page_cache.invalidate(ImageRendition)
+    return renditions
+
+
+def _generate_in_background(source):
+    try:
+        generate(source)
+    except Exception:
+        logger.exception("Rendition generation failed", extra={"source": source})
+    finally:
+        close_old_connections()
+
+
+def schedule(source):
+    """Generate the renditions of `source` once the current transaction commits."""
+    global _executor
+    if getattr(settings, "RENDITIONS_ASYNC", True):
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="renditions")
+        transaction.on_commit(lambda: _executor.submit(_generate_in_background, source))
+    else:
+        transaction.on_commit(lambda: _generate_in_background(source))
+
+
+def delete(source):
+    """Remove the renditions of `source`, files included."""
+    from .models import ImageRendition
+
+    renditions = list(ImageRendition.objects.filter(source=source))
+    for rendition in renditions:
+        rendition.file.delete(save=False)
+    ImageRendition.objects.filter(source=source).delete()
+    cache.delete(_cache_key(source))
+    page_cache.invalidate(ImageRendition)
+
+
+def renditions_for(source):
+    """Return [(name, width, format), ...] for `source`, cached."""
+    from .models import ImageRendition
+
+    key = _cache_key(source)
+    found = cache.get(key)
+    if found is None:
+        found = list(ImageRendition.objects.filter(source=source).values_list("file", "width", "format"))
+        cache.set(key, found, CACHE_TIMEOUT)
+    return found
+
+
+def prime(sources):
+    """Cache the renditions of every source in `sources` with one query, so that a list page's
+    `responsive_image` tags don't query them one by one."""
+    from .models import ImageRendition
+
+    keys = {_cache_key(source): source for source in sources if source}
+    missing = {keys[key] for key in keys.keys() - cache.get_many(keys).keys()}
+    if not missing:
+        return
+    found = {source: [] for source in missing}
+    for source, name, width, fmt in (ImageRendition.objects.filter(source__in=missing)
+                                     .values_list("source", "file", "width", "format")):
+        found[source].append((name, width, fmt))
+    cache.set_many({_cache_key(source): renditions for source, renditions in found.items()}, CACHE_TIMEOUT)
@@ -0,0 +1,190 @@
+"""
+Full-text search on the public content: animals, activities and their
+categories, published events and the team.
+
+Each searchable object has a SearchDocument row (kind, object id, title,
+body, page), written by `index()` from the post_save/post_delete receivers
+of `ouaf_app.signals`; `reindex()` (`manage.py reindex_search`) rebuilds
+them all, batch by batch. PostgreSQL generates a French and an English
+tsvector of each row (title weighted above body), each with a GIN index.
+
+`search()` matches the query (web search syntax: words, "phrases", -word,
+or) with the vector of the current language, ranks the matches and
+highlights the matched words in the title and an excerpt of the body:
+
+    search.search("balade chien", language="fr")
+    [Result(kind="activity", title="...", url="/fr/activities/category/3/",
+            title_html="<mark>Balade</mark> ...", excerpt_html="...", rank=0.6), ...]
+
+The highlighted text is escaped: only the <mark> tags are HTML.
+"""
+from dataclasses import dataclass
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank
+from django.db.models import F
+from django.urls import NoReverseMatch, reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+
+from .models import Activity, ActivityCategory, Animal, Event, OrganisationChartEntry, SearchDocument
+
+Kind = SearchDocument.Kind
+
+# Text search configuration of each language.
+CONFIGS = {"fr": "french", "en": "english"}
+MAX_RESULTS = 50
+
+# Around the matched words in ts_headline()'s output: can't appear in the text, replaced after escaping.
+_START, _STOP = "\x02", "\x03"
+
+
+def _animal(animal):
+    return animal.name, animal.description or "", "animal_detail", [animal.pk]
+
+
+def _activity(activity):
+    category = activity.category
+    body = f"{category.title}\n{activity.description}" if category else activity.description
+    page = ("activities_by_category", [activity.category_id]) if category else ("", [])
+    return activity.title, body, *page
+
+
+def _category(category):
+    return category.title, "", "activities_by_category", [category.pk]
+
+
+def _event(event):
+    # Only published events are searchable; they have no page of their own.
+    if not event.is_published:
+        return None
+    return event.summary, f"{event.description}\n{event.address}", "", []
+
+
+def _team_member(entry):
+    return f"{entry.first_name} {entry.last_name}", f"{entry.role}\n{entry.description}", "organisation_chart", []
+
+
+# Searchable models: (kind, function giving (title, body, URL name, URL args) or None, related rows to load).
+SOURCES = {
+    Animal: (Kind.ANIMAL, _animal, ()),
+    Activity: (Kind.ACTIVITY, _activity, ("category",)),
+    ActivityCategory: (Kind.CATEGORY, _category, ()),
+    Event: (Kind.EVENT, _event, ()),
+    OrganisationChartEntry: (Kind.TEAM, _team_member, ()),
+}
+
+
+def index(model, objects):
+    """Write the documents of `objects` (instances of `model`); remove those no longer searchable."""
+    kind, build, _ = SOURCES[model]
+    documents, hidden = [], []
+    for obj in objects:
+        fields = build(obj)
+        if fields is None:
+            hidden.append(obj.pk)
+            continue
+        title, body, url_name, url_args = fields
+        documents.append(SearchDocument(kind=kind, object_id=obj.pk, title=title[:1000], body=body,
+                                        url_name=url_name, url_args=url_args))
+    if documents:
+        SearchDocument.objects.bulk_create(documents, update_conflicts=True, unique_fields=["kind", "object_id"],
+                                           update_fields=["title", "body", "url_name", "url_args", "updated_at"])
+    if hidden:
+        remove(model, hidden)
+    return len(documents)
+
+
+def remove(model, pks):
+    SearchDocument.objects.filter(kind=SOURCES[model][0], object_id__in=pks).delete()
+
+
+def reindex(batch_size=1000, log=None):
+    """Rebuild every document, `batch_size` objects at a time; return {kind: documents}."""
+    log = log or (lambda message: None)
+    counts = {}
+    for model, (kind, build, related) in SOURCES.items():
+        queryset = model.objects.select_related(*related).order_by("pk")
+        count, last = 0, 0
+        while batch := list(queryset.filter(pk__gt=last)[:batch_size]):
+            count += index(model, batch)
+            last = batch[-1].pk
+            log(f"{kind}: {count}")
+        # Documents of deleted objects (e.g. removed while the receivers were disconnected).
+        SearchDocument.objects.filter(kind=kind).exclude(object_id__in=model.objects.values("pk")).delete()
+        counts[kind] = count
+    return counts
+
+
+@dataclass
+class Result:
+    kind: str
+    title: str
+    url: str
+    title_html: str
+    excerpt_html: str
+    rank: float
+
+    @property
+    def kind_label(self):
+        return Kind(self.kind).label
+
+    def as_dict(self):
+        return {"kind": self.kind, "title": self.title, "url": self.url, "title_html": self.title_html,
+                "excerpt_html": self.excerpt_html, "rank": round(self.rank, 4)}
+
+
+def _highlight(text):
+    return mark_safe(escape(text).replace(_START, "<mark>").replace(_STOP, "</mark>"))
+
+
+def _url(document):
+    if not document.url_name:
+        return ""
+    try:
+        return reverse(document.url_name, args=document.url_args)
+    except NoReverseMatch:
+        return ""
+
+
+def queryset(text, language=None, kinds=None):
+    """SearchDocuments matching `text`, best first, with their `rank`, `title_headline` and `excerpt`."""
+    language = (language or get_language() or "fr")[:2]
+    config = CONFIGS.get(language, "french")
+    vector = F("vector_en" if config == "english" else "vector_fr")
+    query = SearchQuery(text, config=config, search_type="websearch")
+    highlight = {"config": config, "start_sel": _START, "stop_sel": _STOP}
+
+    documents = (
+        SearchDocument.objects.filter(**{vector.name: query})
+        .annotate(
+            rank=SearchRank(vector, query),
+            # Computed for the returned rows only: PostgreSQL evaluates them after the sort and limit.
+            title_headline=SearchHeadline("title", query, highlight_all=True, **highlight),
+            excerpt=SearchHeadline("body", query, max_words=30, min_words=15, max_fragments=2,
+                                   fragment_delimiter=" … ", **highlight),
+        )
+        .order_by("-rank", "pk")
+        .only("kind", "title", "url_name", "url_args")
+    )
+    if kinds:
+        documents = documents.filter(kind__in=kinds)
+    return documents
+
+
+def count(text, language=None, kinds=None):
+    """Number of documents matching `text`."""
+    return queryset(text, language, kinds).count() if (text or "").strip() else 0
+
+
+def search(text, language=None, kinds=None, limit=20):
+    """The `limit` documents best matching `text`, best first, as Results (see the module docstring)."""
+    text = (text or "").strip()
+    if not text:
+        return []
+    return [
+        Result(kind=document.kind, title=document.title, url=_url(document),
+               title_html=_highlight(document.title_headline), excerpt_html=_highlight(document.excerpt),
+               rank=document.rank)
+        for document in queryset(text, language, kinds)[:min(limit, MAX_RESULTS)]
+    ]
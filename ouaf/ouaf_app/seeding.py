@@ -0,0 +1,220 @@
+"""
+Synthetic data for load tests and the performance suite (see `manage.py seed_perf`).
+
+Every value comes from a random generator seeded with `seed`, and dates are
+relative to a fixed BASE_DATE: the same sizes and seed always give the same
+rows. Rows are written with bulk_create, batch by batch, and the
+many-to-many links (groups, event attendees) straight into their through
+tables, in one transaction. No post_save is sent: what the signals would
+maintain (animal covers, search documents, cached pages) is done once at
+the end.
+
+Media and images point to a few small generated JPEG files (`seed/N.jpg`),
+shared by every row; `generate(..., images=0)` only sets the names.
+
+`sizes(scale)` gives the number of rows of each kind: scale 1 is about 5,000
+rows, scale 200 about a million.
+"""
+import io
+import random
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+
+from django.contrib.auth.models import Group
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import page_cache, search
+from .groups import GROUP_BACKOFFICE, GROUP_MEMBER, GROUP_VOLUNTEER
+from .models import Activity, ActivityCategory, ActivityMedia, Animal, AnimalMedia, Event, MemberPayment, \
+    OrganisationChartEntry, Person, SearchDocument
+
+BASE_DATE = datetime(2025, 1, 1, tzinfo=timezone.utc)
+USERNAME_PREFIX = "seed"
+
+# Rows per unit of scale.
+UNIT = {
+    "people": 1000,
+    "payments_per_person": 2,
+    "events": 100,
+    "attendees_per_event": 10,
+    "animals": 10,
+    "media_per_animal": 3,
+    "activities": 10,
+    "media_per_activity": 3,
+}
+
+# Share of the people in each group.
+GROUP_SHARES = {GROUP_MEMBER: .6, GROUP_VOLUNTEER: .1, GROUP_BACKOFFICE: .01}
+
+FIRST_NAMES = ["Camille", "Léa", "Manon", "Chloé", "Inès", "Jade", "Louise", "Emma", "Alice", "Lina", "Lucas",
+               "Hugo", "Louis", "Gabriel", "Arthur", "Jules", "Nathan", "Théo", "Raphaël", "Paul"]
+LAST_NAMES = ["Martin", "Bernard", "Dubois", "Thomas", "Robert", "Richard", "Petit", "Durand", "Leroy", "Moreau",
+              "Simon", "Laurent", "Lefebvre", "Michel", "Garcia", "David", "Bertrand", "Roux", "Vincent", "Fournier"]
+CITIES = [("Lyon", 45.76, 4.84), ("Paris", 48.86, 2.35), ("Marseille", 43.30, 5.37), ("Lille", 50.63, 3.06),
+          ("Nantes", 47.22, -1.55), ("Bordeaux", 44.84, -0.58), ("Grenoble", 45.19, 5.72), ("Rennes", 48.11, -1.68)]
+ANIMAL_NAMES = ["Rex", "Filou", "Caramel", "Noisette", "Praline", "Biscotte", "Pompon", "Réglisse", "Olive", "Moka"]
+CATEGORIES = ["Balades", "Ateliers", "Visites", "Médiation", "Soins", "Éducation", "Fêtes", "Formations"]
+WORDS = ("chien chat animal balade atelier bénévole soin famille enfant parc médiation visite rencontre jeu "
+         "découverte nature association refuge adoption éducation").split()
+
+
+def sizes(scale=1):
+    """Number of rows of each kind for `scale` (per-row ratios are kept as is)."""
+    result = {name: count if "_per_" in name else count * scale for name, count in UNIT.items()}
+    result.update(categories=min(len(CATEGORIES), 4 + scale), team=12)
+    return result
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def _insert(model, rows, batch_size):
+    """bulk_create `rows` (any iterable) `batch_size` at a time; return the primary keys."""
+    pks = []
+    for batch in _batches(rows, batch_size):
+        pks += [obj.pk for obj in model.objects.bulk_create(batch)]
+    return pks
+
+
+def _text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def make_images(count, rng):
+    """Write `count` small JPEG files (kept if already there); return their names."""
+    from PIL import Image, ImageDraw
+
+    names = []
+    for i in range(count):
+        name = f"seed/{i}.jpg"
+        if not default_storage.exists(name):
+            image = Image.new("RGB", (160, 120), tuple(rng.randrange(256) for _ in range(3)))
+            ImageDraw.Draw(image).ellipse((40, 20, 120, 100), fill=tuple(rng.randrange(256) for _ in range(3)))
+            data = io.BytesIO()
+            image.save(data, "JPEG", quality=70)
+            default_storage.save(name, ContentFile(data.getvalue()))
+        names.append(name)
+    return names
+
+
+def generate(sizes, seed=0, images=16, batch_size=5000, log=None):
+    """Create the rows of `sizes` (see `sizes()`); return {kind: number of rows}."""
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    files = make_images(images, rng) if images else [f"seed/{i}.jpg" for i in range(16)]
+    counts = {}
+
+    with transaction.atomic():
+        log(f"{sizes['people']} people")
+        people = _insert(Person, (
+            Person(username=f"{USERNAME_PREFIX}{i:07d}", email=f"{USERNAME_PREFIX}{i:07d}@example.org",
+                   first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                   address=f"{rng.randint(1, 200)} rue {rng.choice(LAST_NAMES)}", city=rng.choice(CITIES)[0],
+                   country="France", newsletter_subscription=rng.random() < .3, password="!",
+                   date_joined=BASE_DATE - timedelta(days=rng.randrange(3 * 365)))
+            for i in range(sizes["people"])
+        ), batch_size)
+        counts["people"] = len(people)
+
+        groups = dict(Group.objects.filter(name__in=GROUP_SHARES).values_list("name", "pk"))
+        Membership = Person.groups.through
+        counts["group memberships"] = len(_insert(Membership, (
+            Membership(person_id=person, group_id=groups[name])
+            for person in people for name, share in GROUP_SHARES.items() if rng.random() < share
+        ), batch_size))
+
+        counts["payments"] = len(_insert(MemberPayment, (
+            MemberPayment(personId_id=person, amount=rng.choice([10, 20, 30, 50]),
+                          paymentDate=BASE_DATE - timedelta(days=365 * year + rng.randrange(365)))
+            for person in people for year in range(sizes["payments_per_person"])
+        ), batch_size))
+
+        log(f"{sizes['events']} events")
+        events = []
+        for _ in range(sizes["events"]):
+            city, latitude, longitude = rng.choice(CITIES)
+            start = BASE_DATE + timedelta(days=rng.randrange(-365, 730), hours=rng.randrange(8, 20))
+            duration = timedelta(hours=rng.choice([1, 2, 3, 4]))
+            events.append(Event(summary=_text(rng, 4), description=_text(rng, 40), start=start,
+                                until=start + duration, duration=duration, organizer_id=rng.choice(people),
+                                address=f"{rng.randint(1, 200)} rue {rng.choice(LAST_NAMES)}, {city}",
+                                latitude=latitude + rng.uniform(-.05, .05),
+                                longitude=longitude + rng.uniform(-.05, .05), is_published=rng.random() < .7))
+        events = _insert(Event, events, batch_size)
+        counts["events"] = len(events)
+        Attendee = Event.attendees.through
+        counts["attendees"] = len(_insert(Attendee, (
+            Attendee(event_id=event, person_id=person)
+            for event in events for person in rng.sample(people, min(sizes["attendees_per_event"], len(people)))
+        ), batch_size))
+
+        log(f"{sizes['animals']} animals, {sizes['activities']} activities")
+        animals = _insert(Animal, (
+            Animal(name=f"{rng.choice(ANIMAL_NAMES)} {i}", description=_text(rng, 20), pet_amount=rng.randrange(500),
+                   birth=(BASE_DATE - timedelta(days=rng.randrange(365, 15 * 365))).date())
+            for i in range(sizes["animals"])
+        ), batch_size)
+        counts["animals"] = len(animals)
+        counts["animal media"] = len(_insert(AnimalMedia, (
+            AnimalMedia(animal_id=animal, file=rng.choice(files), position=position, kind="image", mime="image/jpeg")
+            for animal in animals for position in range(sizes["media_per_animal"])
+        ), batch_size))
+        # What the AnimalMedia post_save receiver would have done.
+        Animal.objects.filter(cover__isnull=True).update(cover=AnimalMedia.first_image("animal"))
+
+        categories = _insert(ActivityCategory, (
+            ActivityCategory(title=title, image=rng.choice(files)) for title in CATEGORIES[:sizes["categories"]]
+        ), batch_size)
+        counts["categories"] = len(categories)
+        activities = _insert(Activity, (
+            Activity(title=_text(rng, 3), category_id=rng.choice(categories), description=_text(rng, 60))
+            for _ in range(sizes["activities"])
+        ), batch_size)
+        counts["activities"] = len(activities)
+        counts["activity media"] = len(_insert(ActivityMedia, (
+            ActivityMedia(activity_id=activity, file=rng.choice(files), position=position, kind="image",
+                          mime="image/jpeg")
+            for activity in activities for position in range(sizes["media_per_activity"])
+        ), batch_size))
+
+        counts["team"] = len(_insert(OrganisationChartEntry, (
+            OrganisationChartEntry(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                                   role=rng.choice(["Présidente", "Trésorier", "Secrétaire", "Bénévole"]),
+                                   description=_text(rng, 20), photo=rng.choice(files))
+            for _ in range(sizes["team"])
+        ), batch_size))
+
+        log("search documents")
+        counts["search documents"] = sum(search.reindex(batch_size).values())
+
+    page_cache.invalidate(Animal, AnimalMedia, Activity, ActivityCategory, ActivityMedia, Event,
+                          OrganisationChartEntry)
+    return counts
+
+
+def search_documents(count, seed=0, batch_size=5000):
+    """
+    Write `count` synthetic search documents, for `manage.py bench_search`: a
+    vocabulary of the words above and made-up ones, drawn with Zipf-like
+    frequencies like in real text (a few words everywhere, most of them rare).
+    """
+    rng = random.Random(seed)
+    syllables = ["ba", "lo", "mi", "ra", "tu", "ne", "sa", "po", "ri", "ca", "de", "fu", "gal", "tor", "vin"]
+    made_up = sorted({"".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(8000)})
+    vocabulary = WORDS + [name.lower() for name in FIRST_NAMES + LAST_NAMES + ANIMAL_NAMES + CATEGORIES] + made_up
+    cum_weights = list(accumulate(1 / (rank + 50) for rank in range(len(vocabulary))))
+    kinds = SearchDocument.Kind.values
+
+    def text(words):
+        return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words))
+
+    return len(_insert(SearchDocument, (
+        SearchDocument(kind=kinds[i % len(kinds)], object_id=i, title=text(rng.randint(2, 5)).capitalize(),
+                       body=text(rng.randint(20, 120)))
+        for i in range(count)
+    ), batch_size))
@@ -1,7 +1,14 @@
 from django.contrib.auth import get_user_model
+from django.contrib.auth.management import create_permissions
 from django.contrib.auth.models import Group, Permission
 from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import m2m_changed, post_init, post_save, post_delete
+from django.dispatch import receiver
 from .groups import *
+from .models import Animal, AnimalMedia, Activity, ActivityMedia, ActivityCategory, OrganisationChartEntry
+from . import auth_cache, page_cache, renditions, search
 
 User = get_user_model()
 
@@ -27,7 +34,17 @@ class PermissionDefiner:
         return f"{self.__app_name}.{self.__codename}"
 
 
+def create_cache_tables(sender, **kwargs):
+    # With CACHE_BACKEND=db, the caches used below (and by the site) live in tables
+    # that `migrate` doesn't create by itself. Existing tables are left alone.
+    call_command("createcachetable", database=kwargs.get("using", DEFAULT_DB_ALIAS), verbosity=0)
+
+
 def ensure_roles_and_permission(sender, **kwargs):
+    # Our receiver is connected before the contenttypes/auth ones: make sure the
+    # permissions of this app exist, otherwise a fresh database can't be migrated.
+    create_permissions(sender, verbosity=0, using=kwargs.get("using", DEFAULT_DB_ALIAS))
+
     backoffice, _ = Group.objects.get_or_create(name=GROUP_BACKOFFICE)
     volunteer, _ = Group.objects.get_or_create(name=GROUP_VOLUNTEER)
     member, _ = Group.objects.get_or_create(name=GROUP_MEMBER)
@@ -50,6 +67,7 @@ def ensure_roles_and_permission(sender, **kwargs):
     volunteer.permissions.set({p._perm_object() for p in volunteer_perms if p})
     member.permissions.set({p._perm_object() for p in member_perms if p})
     backoffice.permissions.set({p._perm_object() for p in backoffice_perms if p})
+    auth_cache.bump_version()
 
 
 event_view = PermissionDefiner("ouaf_app", "event", "view_event")
@@ -83,3 +101,128 @@ organisationChartEntry_delete = PermissionDefiner("ouaf_app", "organisationChart
 # memberpayment_add = _perm("ouaf_app", "memberpayment", "add_memberpayment")
 # memberpayment_change = _perm("ouaf_app", "memberpayment", "change_memberpayment")
 # memberpayment_delete = _perm("ouaf_app", "memberpayment", "delete_memberpayment")
+
+
+@receiver([post_save, post_delete], sender=AnimalMedia, dispatch_uid="ouaf_app_animal_cover")
+def refresh_animal_cover(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # The animal may already be gone when its media are cascade-deleted.
+    animal = Animal.objects.filter(pk=instance.animal_id).first()
+    if animal is not None:
+        animal.refresh_cover()
+
+
+# Image field of every model whose uploads get responsive renditions.
+RENDITION_SOURCES = {
+    AnimalMedia: "file",
+    ActivityMedia: "file",
+    ActivityCategory: "image",
+    OrganisationChartEntry: "photo",
+}
+
+
+def rendition_source(instance):
+    image = getattr(instance, RENDITION_SOURCES[type(instance)])
+    if not image or image.name.lower().endswith(".svg"):
+        return None
+    if isinstance(instance, (AnimalMedia, ActivityMedia)) and not instance.is_image:
+        return None
+    return image.name
+
+
+def _stored_name(instance):
+    # The raw value, as AbstractMedia._source(): reading a deferred field would query it.
+    value = instance.__dict__.get(RENDITION_SOURCES[type(instance)])
+    return getattr(value, "name", value) or None
+
+
+def remember_rendition_source(sender, instance, **kwargs):
+    instance._loaded_rendition_source = _stored_name(instance)
+
+
+def schedule_renditions(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous, current = getattr(instance, "_loaded_rendition_source", None), _stored_name(instance)
+    if previous and previous != current:
+        # The image was replaced: the renditions of the previous one are orphans.
+        transaction.on_commit(lambda: renditions.delete(previous))
+    instance._loaded_rendition_source = current
+    source = rendition_source(instance)
+    if source:
+        renditions.schedule(source)
+
+
+def delete_renditions(sender, instance, **kwargs):
+    source = rendition_source(instance)
+    if source:
+        renditions.delete(source)
+
+
+for _model in RENDITION_SOURCES:
+    post_init.connect(remember_rendition_source, sender=_model,
+                      dispatch_uid=f"ouaf_app_renditions_init_{_model.__name__}")
+    post_save.connect(schedule_renditions, sender=_model, dispatch_uid=f"ouaf_app_renditions_{_model.__name__}")
+    post_delete.connect(delete_renditions, sender=_model, dispatch_uid=f"ouaf_app_renditions_del_{_model.__name__}")
+
+
+# Models rendered by the cached public pages (see page_cache.cache_public_page).
+PAGE_CACHE_MODELS = [Animal, AnimalMedia, Activity, ActivityMedia, ActivityCategory, OrganisationChartEntry]
+
+
+def invalidate_pages(sender, **kwargs):
+    page_cache.invalidate(sender)
+
+
+for _model in PAGE_CACHE_MODELS:
+    post_save.connect(invalidate_pages, sender=_model, dispatch_uid=f"ouaf_app_page_cache_{_model.__name__}")
+    post_delete.connect(invalidate_pages, sender=_model, dispatch_uid=f"ouaf_app_page_cache_del_{_model.__name__}")
+
+
+# Search documents (see ouaf_app.search); an activity's document contains its category's title.
+def index_search_document(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index(sender, [instance])
+
+
+def remove_search_document(sender, instance, **kwargs):
+    search.remove(sender, [instance.pk])
+
+
+def index_category_activities(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index(Activity, instance.activity_set.select_related("category"))
+
+
+for _model in search.SOURCES:
+    post_save.connect(index_search_document, sender=_model, dispatch_uid=f"ouaf_app_search_{_model.__name__}")
+    post_delete.connect(remove_search_document, sender=_model, dispatch_uid=f"ouaf_app_search_del_{_model.__name__}")
+post_save.connect(index_category_activities, sender=ActivityCategory, dispatch_uid="ouaf_app_search_category")
+
+
+# Cached authorizations (see auth_cache): memberships and group permissions
+# affect many users at once, a saved Person only itself.
+def invalidate_authorizations(sender, instance, action, **kwargs):
+    if action.startswith("post_"):
+        auth_cache.bump_version()
+        instance._authorizations = None
+
+
+def forget_person_authorizations(sender, instance, **kwargs):
+    auth_cache.forget(instance.pk)
+    instance._authorizations = None
+
+
+def invalidate_all_authorizations(sender, **kwargs):
+    auth_cache.bump_version()
+
+
+for _through in (get_user_model().groups.through, get_user_model().user_permissions.through,
+                 Group.permissions.through):
+    m2m_changed.connect(invalidate_authorizations, sender=_through,
+                        dispatch_uid=f"ouaf_app_auth_cache_{_through.__name__}")
+post_save.connect(forget_person_authorizations, sender=get_user_model(), dispatch_uid="ouaf_app_auth_cache_person")
+post_delete.connect(forget_person_authorizations, sender=get_user_model(),
+                    dispatch_uid="ouaf_app_auth_cache_person_del")
+post_delete.connect(invalidate_all_authorizations, sender=Group, dispatch_uid="ouaf_app_auth_cache_group_del")
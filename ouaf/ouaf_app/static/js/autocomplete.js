@@ -0,0 +1,84 @@
+// Autocomplete for <select data-autocomplete-url="..."> (see ouaf_backoffice_app/widgets.py).
+// The select only holds the selected options; matches are fetched from the
+// JSON endpoint ({"results": [{"id": ..., "text": ...}]}) while typing.
+(function () {
+    const MIN_LENGTH = 2;
+    const DELAY_MS = 250;
+
+    function setup(select) {
+        const search = document.createElement('input');
+        search.type = 'search';
+        search.className = 'autocomplete__input';
+        search.placeholder = 'Rechercher (nom, identifiant, e-mail)…';
+        search.autocomplete = 'off';
+
+        const results = document.createElement('ul');
+        results.className = 'autocomplete__results';
+        results.hidden = true;
+
+        select.before(search, results);
+        if (select.multiple) {
+            select.title = 'Double-cliquez sur une personne pour la retirer';
+            select.addEventListener('dblclick', () => {
+                Array.from(select.selectedOptions).forEach(option => option.remove());
+            });
+            // Every listed option is part of the value, whatever is highlighted.
+            select.form.addEventListener('submit', () => {
+                Array.from(select.options).forEach(option => option.selected = true);
+            });
+        }
+
+        let timer = null;
+        let controller = null;
+
+        function choose(item) {
+            let option = Array.from(select.options).find(o => o.value === String(item.id));
+            if (!option) {
+                option = new Option(item.text, item.id, true, true);
+                if (!select.multiple) {
+                    select.innerHTML = '';
+                }
+                select.add(option);
+            }
+            option.selected = true;
+            search.value = '';
+            results.hidden = true;
+        }
+
+        function show(items) {
+            results.innerHTML = '';
+            items.forEach(item => {
+                const li = document.createElement('li');
+                li.textContent = item.text;
+                li.tabIndex = 0;
+                li.addEventListener('click', () => choose(item));
+                li.addEventListener('keydown', e => { if (e.key === 'Enter') { e.preventDefault(); choose(item); } });
+                results.appendChild(li);
+            });
+            results.hidden = items.length === 0;
+        }
+
+        search.addEventListener('input', () => {
+            clearTimeout(timer);
+            const q = search.value.trim();
+            if (q.length < MIN_LENGTH) {
+                show([]);
+                return;
+            }
+            timer = setTimeout(() => {
+                if (controller) controller.abort();
+                controller = new AbortController();
+                const url = new URL(select.dataset.autocompleteUrl, window.location.origin);
+                url.searchParams.set('q', q);
+                fetch(url, {headers: {'X-Requested-With': 'XMLHttpRequest'}, signal: controller.signal})
+                    .then(r => r.ok ? r.json() : {results: []})
+                    .then(data => show(data.results))
+                    .catch(() => {});
+            }, DELAY_MS);
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', () => {
+        document.querySelectorAll('select[data-autocomplete-url]').forEach(setup);
+    });
+})();
@@ -0,0 +1,13 @@
+from django import template
+from django.contrib.admin.templatetags.base import InclusionAdminNode
+
+from ouaf_app.changelists import date_hierarchy
+
+register = template.Library()
+
+
+@register.tag(name="probed_date_hierarchy")
+def probed_date_hierarchy_tag(parser, token):
+    """{% date_hierarchy cl %} for the FastChangeListMixin changelists: the periods come from index probes."""
+    return InclusionAdminNode(parser, token, func=date_hierarchy, template_name="date_hierarchy.html",
+                              takes_context=False)
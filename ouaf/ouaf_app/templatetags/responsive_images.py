@@ -0,0 +1,39 @@
+from collections import defaultdict
+
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from ouaf_app.renditions import renditions_for
+
+register = template.Library()
+
+
+@register.simple_tag
+def responsive_image(image, sizes="100vw", **attrs):
+    """
+    Render an uploaded image with the `srcset`/`sizes` of its renditions:
+
+        {% responsive_image member.photo sizes="220px" class="team__photo" alt="..." %}
+
+    WebP variants go in a <picture> source, JPEG variants on the <img> itself.
+    Until the renditions exist, the original is rendered alone.
+    """
+    if not image:
+        return ""
+
+    srcsets = defaultdict(list)
+    for name, width, fmt in renditions_for(image.name):
+        srcsets[fmt].append(f"{default_storage.url(name)} {width}w")
+
+    img_attrs = {"src": image.url, **attrs}
+    if srcsets["jpeg"]:
+        img_attrs.update(srcset=", ".join(srcsets["jpeg"]), sizes=sizes)
+    img = format_html("<img{}>", flatatt(img_attrs))
+    if not srcsets["webp"]:
+        return img
+    return format_html(
+        '<picture class="rendition"><source type="image/webp" srcset="{}" sizes="{}">{}</picture>',
+        ", ".join(srcsets["webp"]), sizes, img,
+    )
@@ -0,0 +1,38 @@
+import logging
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from .perf import isolated_caches
+
+MIDDLEWARE = "ouaf_app.middleware.QueryCheckMiddleware"
+
+
+class QueryCheckRunner(DiscoverRunner):
+    """
+    The test runner (TEST_RUNNER): every request made by the tests goes through
+    QueryCheckMiddleware in "raise" mode, so a new N+1 fails the test that
+    renders it (see `ouaf_app.querycheck`). Caches are local-memory ones,
+    whatever CACHE_BACKEND says, so the tests neither need nor flush a shared
+    cache. The logs (checked with assertLogs) are only written with
+    --verbosity 2 or more.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        middleware = list(settings.MIDDLEWARE)
+        if MIDDLEWARE not in middleware:
+            middleware.insert(middleware.index("django.middleware.security.SecurityMiddleware"), MIDDLEWARE)
+        self._query_check = override_settings(QUERY_CHECK="raise", MIDDLEWARE=middleware)
+        self._query_check.enable()
+        self._caches = isolated_caches("test")
+        self._caches.enable()
+        if self.verbosity < 2:
+            for handler in logging.getLogger().handlers:
+                handler.setLevel(logging.CRITICAL + 1)
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        self._query_check.disable()
+        super().teardown_test_environment(**kwargs)
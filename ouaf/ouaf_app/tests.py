@@ -1,3 +1,952 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib import messages
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import Http404, HttpResponse
+from django.template import engines
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+from PIL import Image
+
+from . import async_views, logs, media_serving, mediatypes, metrics, newsletter, outbox, page_cache, perf, querycheck, \
+    ratelimit, renditions, search, seeding, signals, warmup
+from .management.commands import bench_metrics, startup_report
+from .management.commands.serve import server_config
+from .middleware import QueryCheckMiddleware
+from .models import Activity, ActivityCategory, ActivityMedia, Animal, AnimalMedia, Event, ImageRendition, \
+    MemberPayment, NewsletterCampaign, NewsletterDelivery, OrganisationChartEntry, OutboxEmail, Person, SearchDocument
+from .forms import PersonForm
+from .perf import clear_caches
+from .views import ANIMALS_PAGE_SIZE, ContactView
+
+
+class ActivitiesByCategoryViewTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.category = ActivityCategory.objects.create(title="Balades", image="images/categories/balades.jpg")
+        with translation.override("fr"):
+            self.url = reverse("activities_by_category", args=[self.category.pk])
+
+    def _add_activities(self, count):
+        for i in range(count):
+            activity = Activity.objects.create(title=f"Activité {i}", category=self.category, description="...")
+            for position in range(3):
+                ActivityMedia.objects.create(activity=activity, url=f"https://example.org/{i}-{position}.jpg",
+                                             position=position)
+
+    def _count_queries(self):
+        clear_caches()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_activities(self):
+        self._add_activities(2)
+        few = self._count_queries()
+        self._add_activities(8)
+        many = self._count_queries()
+        self.assertEqual(few, many)
+
+    def test_activities_are_paginated(self):
+        self._add_activities(12)
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.context["activities"]), 10)
+        response = self.client.get(self.url + "?page=2")
+        self.assertEqual(len(response.context["activities"]), 2)
+
+    def test_unknown_category_is_404(self):
+        response = self.client.get(self.url.replace(f"/{self.category.pk}/", f"/{self.category.pk + 1}/"))
+        self.assertEqual(response.status_code, 404)
+
+
+class AnimalListTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        with translation.override("fr"):
+            self.url = reverse("animals_list")
+
+    def _page(self, after=None):
+        response = self.client.get(self.url, {"after": after} if after is not None else {})
+        self.assertEqual(response.status_code, 200)
+        return [animal.id for animal in response.context["animals"]], response.context["next_after"]
+
+    def test_keyset_pages(self):
+        size = ANIMALS_PAGE_SIZE
+        Animal.objects.bulk_create(Animal(name=f"Animal {i}") for i in range(2 * size + 1))
+        ids = list(Animal.objects.order_by("id").values_list("id", flat=True))
+        first, next_after = self._page()
+        self.assertEqual((first, next_after), (ids[:size], ids[size - 1]))
+        second, next_after = self._page(next_after)
+        self.assertEqual((second, next_after), (ids[size:2 * size], ids[2 * size - 1]))
+        self.assertEqual(self._page(next_after), (ids[2 * size:], None))
+        self.assertEqual(self._page(ids[-1]), ([], None))
+
+    def test_non_numeric_after_is_ignored(self):
+        Animal.objects.bulk_create(Animal(name=f"Animal {i}") for i in range(3))
+        first = self._page()
+        self.assertEqual(first[0], list(Animal.objects.order_by("id").values_list("id", flat=True)))
+        self.assertEqual(self._page("abc"), first)
+        self.assertEqual(self._page("-1"), first)
+
+    def test_cover_is_the_first_image(self):
+        animal = Animal.objects.create(name="Rex")
+        AnimalMedia.objects.create(animal=animal, file="animals/media/rex.mp4", position=0)
+        first = AnimalMedia.objects.create(animal=animal, file="animals/media/rex-1.jpg", position=1)
+        second = AnimalMedia.objects.create(animal=animal, file="animals/media/rex-2.jpg", position=2)
+
+        def cover():
+            return Animal.objects.get(pk=animal.pk).cover_id
+
+        self.assertEqual(cover(), first.pk)
+        second.position = 0
+        second.save()
+        self.assertEqual(cover(), second.pk)
+        second.delete()
+        self.assertEqual(cover(), first.pk)
+        first.delete()
+        self.assertIsNone(cover())
+
+
+class AsyncViewsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.category = ActivityCategory.objects.create(title="Balades", image="images/categories/balades.jpg")
+        for i in range(12):
+            Activity.objects.create(title=f"Activité {i}", category=self.category, description="...")
+
+    def _request(self, method="get", path="/", data=None):
+        request = getattr(AsyncRequestFactory(), method)(path, data)
+        request.user = AnonymousUser()
+        request.auser = sync_to_async(lambda: request.user)
+        request._messages = CookieStorage(request)
+        return request
+
+    async def _render(self, response):
+        return await sync_to_async(response.render)()
+
+    async def test_activities_by_category_is_paginated(self):
+        response = await async_views.activities_by_category(self._request(path="/?page=2"), self.category.pk)
+        response = await self._render(response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context_data["activities"]), 2)
+        self.assertEqual(response.context_data["page_obj"].number, 2)
+
+    async def test_unknown_category_is_404(self):
+        with self.assertRaises(Http404):
+            await async_views.activities_by_category(self._request(), self.category.pk + 1)
+
+    @override_settings(CONTACT_RECIPIENTS=["contact@example.org"])
+    async def test_contact_only_queues_the_emails(self):
+        request = self._request("post", "/contact/", {
+            "honeypot": "", "ts": int(time.time()) - 10, "first_name": "Camille", "last_name": "Martin",
+            "email": "camille@example.org", "phone": "+33612345678", "message": "Bonjour !",
+        })
+        response = await async_views.AsyncContactView.as_view()(request)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(await OutboxEmail.objects.acount(), 2)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend",
+                   CONTACT_RECIPIENTS=["contact@example.org"])
+class ContactOutboxTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        with translation.override("fr"):
+            self.url = reverse("contact")
+
+    def _submit(self):
+        return self.client.post(self.url, {
+            "honeypot": "", "ts": int(time.time()) - 10, "first_name": "Camille", "last_name": "Martin",
+            "email": "camille@example.org", "phone": "+33612345678", "message": "Bonjour !",
+        })
+
+    def test_request_only_queues_the_emails(self):
+        response = self._submit()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(mail.outbox, [])
+        queued = OutboxEmail.objects.order_by("purpose")
+        self.assertEqual([e.purpose for e in queued], ["contact_ack", "contact_to_org"])
+        # The ID of the HTTP request, logs and emails correlate.
+        self.assertEqual({e.request_id for e in queued}, {response["X-Request-ID"]})
+
+        call_command("send_outbox", stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        request_id = queued[0].request_id
+        self.assertTrue(all(m.extra_headers["X-Contact-Request-ID"] == request_id for m in mail.outbox))
+        self.assertFalse(OutboxEmail.objects.exclude(status=OutboxEmail.Status.SENT).exists())
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_are_retried_then_dead_lettered(self):
+        self._submit()
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages",
+                        side_effect=ConnectionError("SMTP down")):
+            outbox.process()
+            email = OutboxEmail.objects.get(purpose="contact_to_org")
+            self.assertEqual((email.status, email.attempts), (OutboxEmail.Status.QUEUED, 1))
+            self.assertGreater(email.next_attempt_at, timezone.now())
+            self.assertIn("SMTP down", email.last_error)
+
+            OutboxEmail.objects.update(next_attempt_at=timezone.now())
+            outbox.process()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), (OutboxEmail.Status.DEAD, 2))
+        outbox.process()
+        self.assertEqual(mail.outbox, [])
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        clear_caches()
+
+    def _check_window(self, backend):
+        rule = ratelimit.RateLimit("test", limit=3, window=100, backend=backend)
+        start = 1_000_000 * 100
+        self.assertEqual([rule.hit_key("a", now=start + 10).allowed for _ in range(4)], [True, True, True, False])
+        self.assertTrue(rule.hit_key("b", now=start + 10).allowed)
+        # Halfway through the next window, half of the previous hits still count.
+        self.assertEqual([rule.hit_key("a", now=start + 150).allowed for _ in range(3)], [True, False, False])
+        blocked = rule.hit_key("a", now=start + 150)
+        self.assertEqual(blocked.retry_after, 17)
+        self.assertTrue(rule.hit_key("a", now=start + 150 + blocked.retry_after).allowed)
+
+    def test_cache_backend_sliding_window(self):
+        self._check_window(ratelimit.CacheBackend())
+
+    def test_database_backend_sliding_window(self):
+        self._check_window(ratelimit.DatabaseBackend())
+
+    def test_contact_view_answers_429_with_retry_after(self):
+        with translation.override("fr"):
+            url = reverse("contact")
+        for i in range(ContactView.RATE_LIMIT_MAX):
+            self.assertNotEqual(self.client.post(url, {"email": f"{i}@example.org"}).status_code, 429)
+        response = self.client.post(url, {"email": "other@example.org"})
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(ratelimit.stats("contact"), {"*": 1, "contact": 1})
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class NewsletterTests(TestCase):
+    def setUp(self):
+        Person.objects.bulk_create(
+            Person(username=f"m{i}", email=f"m{i}@example.org", first_name=f"Prénom{i}",
+                   newsletter_subscription=i % 4 != 0)
+            for i in range(40)
+        )
+        self.campaign = NewsletterCampaign.objects.create(subject="Nouvelles", body_html="<p>Bonjour à $email</p>")
+
+    def test_each_subscriber_gets_one_personalised_message(self):
+        call_command("send_newsletter", self.campaign.pk, rate=0, batch_size=7, stdout=io.StringIO())
+        self.assertEqual(len(mail.outbox), 30)
+        self.assertEqual(len({m.to[0] for m in mail.outbox}), 30)
+        first = next(m for m in mail.outbox if m.to == ["m1@example.org"])
+        self.assertIn("Bonjour Prénom1", first.body)
+        self.assertIn("Bonjour à m1@example.org", first.alternatives[0][0])
+        self.campaign.refresh_from_db()
+        self.assertEqual((self.campaign.status, self.campaign.sent_count), (NewsletterCampaign.Status.DONE, 30))
+
+    def test_resumed_campaign_does_not_send_twice(self):
+        real_send = mail.get_connection().send_messages
+        calls = []
+
+        def crash_after_ten(messages):
+            calls.append(messages)
+            if len(calls) > 10:
+                raise KeyboardInterrupt
+            return real_send(messages)
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages", side_effect=crash_after_ten):
+            with self.assertRaises(KeyboardInterrupt):
+                newsletter.send_campaign(self.campaign, rate=0, batch_size=7)
+        self.assertEqual(len(mail.outbox), 10)
+
+        # The 11th recipient may or may not have been reached: it is not retried.
+        newsletter.send_campaign(NewsletterCampaign.objects.get(pk=self.campaign.pk), rate=0, batch_size=7)
+        self.assertEqual(len(mail.outbox), 29)
+        self.assertEqual(len({m.to[0] for m in mail.outbox}), 29)
+        self.assertEqual(self.campaign.deliveries.filter(status=NewsletterDelivery.Status.SENDING).count(), 1)
+        self.assertEqual(NewsletterCampaign.objects.get(pk=self.campaign.pk).sent_count, 29)
+
+
+class PageCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        page_cache.reset_stats()
+        self.calls = 0
+
+    def _request(self, method="get", user=None, path="/animaux/?page=2"):
+        request = getattr(RequestFactory(), method)(path)
+        request.user = user or AnonymousUser()
+        request._messages = CookieStorage(request)
+        return request
+
+    def _view(self, render=None):
+        @page_cache.cache_public_page(Animal)
+        def view(request):
+            self.calls += 1
+            if render:
+                render(request)
+            return HttpResponse(f"{translation.get_language()} {self.calls}")
+
+        return view
+
+    def test_saving_or_deleting_a_listed_model_invalidates_its_pages(self):
+        category = ActivityCategory.objects.create(title="Balades", image="images/categories/balades.jpg")
+        activity = Activity.objects.create(title="Balade", category=category, description="...")
+        animal = Animal.objects.create(name="Rex")
+        factories = {
+            Animal: lambda: Animal.objects.create(name="Moka"),
+            AnimalMedia: lambda: AnimalMedia.objects.create(animal=animal, file="animals/media/rex.png"),
+            Activity: lambda: Activity.objects.create(title="Atelier", category=category, description="..."),
+            ActivityMedia: lambda: ActivityMedia.objects.create(activity=activity, url="https://example.org/a.jpg"),
+            ActivityCategory: lambda: ActivityCategory.objects.create(title="Ateliers", image="images/a.jpg"),
+            OrganisationChartEntry: lambda: OrganisationChartEntry.objects.create(
+                first_name="Camille", last_name="Martin", role="Présidente", description="..."),
+        }
+        self.assertEqual(set(factories), set(signals.PAGE_CACHE_MODELS))
+        for model, create in factories.items():
+            with self.subTest(model=model.__name__):
+                before = page_cache._versions([model])
+                instance = create()
+                saved = page_cache._versions([model])
+                self.assertNotEqual(saved, before)
+                instance.delete()
+                self.assertNotEqual(page_cache._versions([model]), saved)
+
+    def test_pages_are_served_from_the_cache_until_invalidated(self):
+        view = self._view()
+        self.assertEqual(view(self._request()).content, view(self._request()).content)
+        self.assertEqual(self.calls, 1)
+        Animal.objects.create(name="Rex")
+        view(self._request())
+        self.assertEqual(self.calls, 2)
+
+    def test_only_the_read_query_parameters_make_a_new_page(self):
+        view = self._view()
+        for path in ("/animaux/?page=2", "/animaux/?utm_source=x&page=2", "/animaux/?page=2&fbclid=1"):
+            view(self._request(path=path))
+        self.assertEqual(self.calls, 1)
+        for path in ("/animaux/?page=3", "/animaux/", "/animaux/?page=2&after=5", "/chiens/?page=2"):
+            view(self._request(path=path))
+        self.assertEqual(self.calls, 5)
+
+    def test_languages_have_their_own_pages(self):
+        view = self._view()
+        with translation.override("fr"):
+            self.assertEqual(view(self._request()).content, b"fr 1")
+        with translation.override("en"):
+            self.assertEqual(view(self._request()).content, b"en 2")
+        with translation.override("fr"):
+            self.assertEqual(view(self._request()).content, b"fr 1")
+
+    def test_pages_with_a_csrf_token_or_messages_are_not_stored(self):
+        def csrf_token(request):
+            engines["django"].from_string("{% csrf_token %}").render(request=request)
+
+        for render in (csrf_token, lambda request: messages.info(request, "Merci !")):
+            self.calls = 0
+            view = self._view(render)
+            view(self._request())
+            view(self._request())
+            self.assertEqual(self.calls, 2)
+
+    def test_authenticated_and_non_get_requests_bypass_the_cache(self):
+        view = self._view()
+        user = get_user_model()(username="camille")
+        for request in (self._request(user=user), self._request(user=user), self._request("post"),
+                        self._request("head")):
+            view(request)
+        self.assertEqual(self.calls, 4)
+        self.assertEqual(page_cache.stats(), {"hits": 0, "misses": 0, "hit_ratio": 0.0})
+
+    def test_stats_count_hits_and_misses(self):
+        view = self._view()
+        for _ in range(4):
+            view(self._request())
+        self.assertEqual(page_cache.stats(), {"hits": 3, "misses": 1, "hit_ratio": 0.75})
+        page_cache.reset_stats()
+        self.assertEqual(page_cache.stats()["misses"], 0)
+
+
+class MediaServingTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=directory.name, MEDIA_OFFLOAD=""))
+        self.root = directory.name
+        with open(os.path.join(self.root, "clip.mp4"), "wb") as f:
+            f.write(bytes(range(100)))
+
+    def _get(self, path="clip.mp4", **headers):
+        return media_serving.serve_media(RequestFactory().get(f"/media/{path}", headers=headers), path)
+
+    def _etag(self):
+        response = self._get()
+        response.close()
+        return response["ETag"]
+
+    def _content(self, response):
+        content = b"".join(response.streaming_content)
+        response.close()
+        return content
+
+    def test_parse_range(self):
+        self.assertEqual(media_serving._parse_range("bytes=0-9", 100), (0, 9))
+        self.assertEqual(media_serving._parse_range("bytes=90-", 100), (90, 99))
+        self.assertEqual(media_serving._parse_range("bytes=50-500", 100), (50, 99))
+        self.assertEqual(media_serving._parse_range("bytes=-5", 100), (95, 99))
+        self.assertEqual(media_serving._parse_range("bytes=-500", 100), (0, 99))
+        self.assertIs(media_serving._parse_range("bytes=100-", 100), False)
+        self.assertIs(media_serving._parse_range("bytes=9-0", 100), False)
+        self.assertIs(media_serving._parse_range("bytes=-0", 100), False)
+        self.assertIsNone(media_serving._parse_range("bytes=0-1,5-6", 100))
+        self.assertIsNone(media_serving._parse_range("bytes=-", 100))
+
+    def test_byte_range(self):
+        response = self._get(range="bytes=0-9")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 0-9/100")
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(self._content(response), bytes(range(10)))
+
+    def test_suffix_range(self):
+        response = self._get(range="bytes=-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 95-99/100")
+        self.assertEqual(self._content(response), bytes(range(95, 100)))
+
+    def test_unsatisfiable_range(self):
+        response = self._get(range="bytes=100-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+    def test_range_of_an_empty_file(self):
+        open(os.path.join(self.root, "empty.mp4"), "wb").close()
+        self.assertIs(media_serving._parse_range("bytes=-500", 0), False)
+        response = self._get("empty.mp4", range="bytes=-500")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */0")
+
+    def test_offloaded_paths_are_quoted(self):
+        name = "chien été 🐕.mp4"
+        open(os.path.join(self.root, name), "wb").close()
+        with override_settings(MEDIA_OFFLOAD="x-accel-redirect", MEDIA_ACCEL_REDIRECT_PREFIX="/protected-media/"):
+            response = self._get(name)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/chien%20%C3%A9t%C3%A9%20%F0%9F%90%95.mp4")
+        with override_settings(MEDIA_OFFLOAD="x-sendfile"):
+            response = self._get(name)
+        self.assertTrue(response["X-Sendfile"].endswith("/chien%20%C3%A9t%C3%A9%20%F0%9F%90%95.mp4"))
+
+    def test_stale_if_range_gets_the_whole_file(self):
+        etag = self._etag()
+        self.assertEqual(self._get(range="bytes=0-9", if_range=etag).status_code, 206)
+        response = self._get(range="bytes=0-9", if_range='"0-0"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._content(response), bytes(range(100)))
+
+    def test_if_none_match(self):
+        etag = self._etag()
+        self.assertEqual(self._get(if_none_match=etag).status_code, 304)
+
+    def test_path_traversal_is_404(self):
+        for path in ("../settings.py", "/etc/passwd", "missing.mp4"):
+            with self.subTest(path=path), self.assertRaises(Http404):
+                self._get(path)
+
+    def test_hashed_renditions_are_immutable(self):
+        os.makedirs(os.path.join(self.root, "renditions"))
+        name = "renditions/rex.0123abcd.w320.webp"
+        with open(os.path.join(self.root, name), "wb") as f:
+            f.write(b"RIFF")
+        response = self._get(name)
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertIn(f"max-age={media_serving.IMMUTABLE_MAX_AGE}", response["Cache-Control"])
+        response.close()
+        response = self._get()
+        self.assertNotIn("immutable", response["Cache-Control"])
+        response.close()
+
+
+@override_settings(RENDITION_WIDTHS=[320, 640], RENDITION_FORMATS=["webp", "jpeg"])
+class RenditionTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=directory.name))
+
+    def _image(self, name, size=(800, 600)):
+        out = io.BytesIO()
+        Image.new("RGB", size, "tan").save(out, format="JPEG")
+        return default_storage.save(name, ContentFile(out.getvalue()))
+
+    def test_generate(self):
+        source = self._image("images/categories/balades.jpg")
+        created = renditions.generate(source)
+        self.assertEqual(sorted((r.width, r.height, r.format) for r in created),
+                         [(320, 240, "jpeg"), (320, 240, "webp"), (640, 480, "jpeg"), (640, 480, "webp")])
+        for rendition in created:
+            self.assertRegex(rendition.file.name, media_serving.IMMUTABLE_NAME_RE)
+            self.assertTrue(default_storage.exists(rendition.file.name))
+        self.assertEqual(renditions.generate(source), [])
+        small = renditions.generate(self._image("images/small.jpg", (200, 100)))
+        self.assertEqual({r.width for r in small}, {200})
+
+    def test_renditions_for_is_cached(self):
+        source = self._image("images/categories/balades.jpg")
+        self.assertEqual(renditions.renditions_for(source), [])
+        renditions.generate(source)
+        found = renditions.renditions_for(source)
+        self.assertEqual(len(found), 4)
+        with self.assertNumQueries(0):
+            self.assertEqual(renditions.renditions_for(source), found)
+
+    def test_responsive_image_tag(self):
+        category = ActivityCategory.objects.create(title="Balades", image=self._image("images/balades.jpg"))
+        template = engines["django"].from_string(
+            '{% load responsive_images %}{% responsive_image category.image sizes="50vw" alt="Balades" %}')
+        html = template.render({"category": category})
+        self.assertNotIn("<picture", html)
+        self.assertIn('src="/media/images/balades.jpg"', html)
+        renditions.generate(category.image.name)
+        clear_caches()
+        html = template.render({"category": category})
+        self.assertRegex(html, r'^<picture class="rendition"><source type="image/webp" srcset="[^"]+\.w320\.webp 320w, '
+                               r'[^"]+\.w640\.webp 640w" sizes="50vw"><img [^>]*srcset="[^"]+\.w320\.jpg 320w')
+        self.assertIn('alt="Balades"', html)
+        self.assertEqual(engines["django"].from_string(
+            "{% load responsive_images %}{% responsive_image None %}").render({}), "")
+
+    def test_replaced_image_loses_its_renditions(self):
+        category = ActivityCategory.objects.create(title="Balades", image=self._image("images/old.jpg"))
+        old = [rendition.file.name for rendition in renditions.generate("images/old.jpg")]
+        category = ActivityCategory.objects.get(pk=category.pk)
+        category.image = self._image("images/new.jpg")
+        with mock.patch.object(renditions, "schedule") as schedule, self.captureOnCommitCallbacks(execute=True):
+            category.save()
+        schedule.assert_called_once_with("images/new.jpg")
+        self.assertFalse(ImageRendition.objects.filter(source="images/old.jpg").exists())
+        self.assertFalse(any(default_storage.exists(name) for name in old))
+        renditions.generate("images/new.jpg")
+        with mock.patch.object(renditions, "schedule"), self.captureOnCommitCallbacks(execute=True):
+            category.title = "Promenades"
+            category.save()
+        self.assertEqual(ImageRendition.objects.filter(source="images/new.jpg").count(), 4)
+
+
+class ServeTests(TestCase):
+    @mock.patch("ouaf_app.management.commands.serve.available_cpus", return_value=4)
+    def test_workers_follow_the_cpu_count(self, cpus):
+        config = server_config()
+        self.assertEqual((config["workers"], config["threads"], config["worker_class"]), (9, 4, "gthread"))
+        self.assertTrue(config["preload_app"])
+        self.assertEqual((config["max_requests"], config["max_requests_jitter"]), (2000, 200))
+        with override_settings(SERVE_WORKERS=2, SERVE_THREADS=8):
+            config = server_config()
+        self.assertEqual((config["workers"], config["threads"]), (2, 8))
+
+    def test_warm_up_fills_the_page_cache(self):
+        clear_caches()
+        page_cache.reset_stats()
+        warmup.prime_pages()
+        self.client.get(reverse("index"))
+        self.assertEqual(page_cache.stats()["hits"], 1)
+
+    def test_warm_up_reports_every_step(self):
+        with mock.patch("ouaf_app.warmup.release_connections"), mock.patch("ouaf_app.warmup._report", None):
+            report = warmup.run_once()
+            self.assertIsNone(warmup.run_once())
+        self.assertEqual(list(report), [name for name, _ in warmup.STEPS] + ["total"])
+        self.assertGreater(warmup.compile_templates(), 20)
+        self.assertGreater(warmup.resolve_urls(), 0)
+
+    def test_readiness(self):
+        response = self.client.get(reverse("ready"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["checks"], {"database": "ok", "cache": "ok"})
+        with mock.patch("django.core.cache.cache.get", return_value=None):
+            self.assertEqual(self.client.get(reverse("ready")).status_code, 503)
+
+
+class StartupTests(SimpleTestCase):
+    def test_boot_stays_within_budget(self):
+        # The WSGI application and the URLconf (views, forms) that the first request loads.
+        result = startup_report.measure()
+        self.assertIn("ouaf_app.forms", result["modules"])
+        self.assertNotIn("phonenumbers", result["modules"])
+        self.assertLess(result["import_ms"], startup_report.IMPORT_BUDGET_MS)
+        self.assertLess(result["rss_mb"], startup_report.RSS_BUDGET_MB)
+
+
+class PhoneNumberFieldTests(TestCase):
+    def test_numbers_are_normalized_and_parsed_on_access(self):
+        person = Person.objects.create(username="camille", email="camille@example.org", phone_number="06 12 34 56 78")
+        self.assertEqual(Person.objects.filter(phone_number="+33612345678").count(), 1)
+
+        person = Person.objects.get(pk=person.pk)
+        self.assertEqual(person.__dict__["phone_number"], "+33612345678")
+        self.assertEqual(person.phone_number.as_national, "06 12 34 56 78")
+        person.phone_number = "not a number"
+        person.save()
+        self.assertEqual(Person.objects.values_list("phone_number", flat=True).get(pk=person.pk), "not a number")
+
+    def test_forms_validate_numbers(self):
+        form = PersonForm(data={"phone_number": "06 12 34 56 78"})
+        form.is_valid()
+        self.assertEqual(str(form.cleaned_data["phone_number"]), "+33612345678")
+        self.assertIn("phone_number", PersonForm(data={"phone_number": "abc"}).errors)
+
+
+class PerformanceBudgetTests(TestCase):
+    def test_public_pages_stay_within_budget(self):
+        perf.seed()
+        names = {name for name, _ in perf.pages() if not name.startswith("backoffice:")}
+        results = perf.run(runs=1, names=names)
+        self.assertEqual(results.keys(), names)
+        self.assertEqual(perf.check(results, perf.load_budgets()), [])
+
+    def test_page_without_budget_fails(self):
+        result = {"path": "/fr/nouvelle", "status": 200, "queries": 1, "sql_ms": 1, "template_ms": 1, "total_ms": 1}
+        self.assertEqual(perf.check({"nouvelle": result}, {"pages": {}}),
+                         ["nouvelle: no budget in perf_budgets.json"])
+        self.assertEqual(perf.check({"nouvelle": result}, {"pages": {"nouvelle": {"queries": 0}}}),
+                         ["nouvelle: queries 1 > 0"])
+
+
+class SeedingTests(TestCase):
+    def _generate(self, seed):
+        sizes = {**seeding.sizes(1), "people": 50, "events": 20, "animals": 5, "activities": 5}
+        with transaction.atomic():
+            counts = seeding.generate(sizes, seed=seed, images=0, batch_size=7)
+            events = list(Event.objects.order_by("start", "summary", "organizer__username", "attendees__username")
+                          .values_list("summary", "start", "organizer__username", "attendees__username"))
+            self.assertFalse(Animal.objects.filter(cover__isnull=True).exists())
+            transaction.set_rollback(True)
+        return counts, events
+
+    def test_same_seed_gives_same_data(self):
+        counts, events = self._generate(seed=1)
+        self.assertEqual(counts["people"], 50)
+        self.assertEqual(counts["attendees"], 20 * seeding.UNIT["attendees_per_event"])
+        self.assertEqual(self._generate(seed=1), (counts, events))
+        self.assertNotEqual(self._generate(seed=2)[1], events)
+
+
+@override_settings(METRICS_TOKEN="s3cret")
+class MetricsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        metrics.reset()
+
+    def test_requests_are_counted_by_view(self):
+        self.client.get(reverse("ready"))
+        self.client.get(reverse("ready"))
+        with translation.override("fr"):
+            self.client.get(reverse("animals_list") + "?after=x")
+        response = self.client.get(reverse("metrics"), headers={"Authorization": "Bearer s3cret"})
+        self.assertEqual(response.status_code, 200)
+        text = response.content.decode()
+        self.assertIn('ouaf_http_requests_total{view="ready",method="GET",status="200"} 2', text)
+        self.assertIn('ouaf_http_request_duration_seconds_count{view="ready"} 2', text)
+        self.assertIn('ouaf_http_request_duration_seconds_bucket{view="ready",le="+Inf"} 2', text)
+        self.assertIn('ouaf_db_queries_total{view="ready"} 2', text)
+        self.assertIn('ouaf_http_requests_total{view="animals_list",method="GET",status="200"} 1', text)
+
+    def test_processes_are_added_up(self):
+        dead = subprocess.Popen(["true"])
+        dead.wait()
+        worker = {"requests": [["index", "GET", 200, 3]], "views": {"index": [3] + [0] * 11 + [0.01, 0, 0.0, 0.0]}}
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            for pid in (os.getppid(), dead.pid):
+                with open(os.path.join(directory, f"{pid}.json"), "w") as f:
+                    json.dump(worker, f)
+            metrics.registry.observe("index", "GET", 200, 0.001)
+            for _ in range(2):
+                snapshot = metrics.collect()
+                self.assertEqual(snapshot["requests"], [["index", "GET", 200, 7]])
+                self.assertEqual(snapshot["views"]["index"][0], 7)
+            # The exited worker's totals were merged.
+            self.assertEqual(sorted(os.listdir(directory)), sorted([".lock", "dead.json", f"{os.getppid()}.json"]))
+
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        response = self.client.get(reverse("metrics"), headers={"Authorization": "Bearer s3cret"})
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_hidden_without_token_unless_debug(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+    def test_overhead_stays_in_microseconds(self):
+        self.assertLess(bench_metrics.middleware_overhead(2000), 50)
+
+
+@override_settings(DEFAULT_FROM_EMAIL="noreply@example.org", CONTACT_RECIPIENTS=["contact@example.org"])
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        with translation.override("fr"):
+            self.url = reverse("animals_list")
+            self.contact_url = reverse("contact")
+
+    @override_settings(SERVER_TIMING="staff")
+    def test_header_is_sent_to_staff_only(self):
+        self.assertNotIn("Server-Timing", self.client.get(self.url))
+        self.client.force_login(Person.objects.create_user("admin", email="admin@example.org", is_staff=True))
+        timing = self.client.get(self.url)["Server-Timing"]
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, view;dur=[\d.]+, total;dur=[\d.]+$')
+
+    @override_settings(SERVER_TIMING="all")
+    def test_contact_emails_are_timed(self):
+        response = self.client.post(self.contact_url, {
+            "honeypot": "", "ts": int(time.time()) - 10, "first_name": "Camille", "last_name": "Martin",
+            "email": "camille@example.org", "phone": "+33612345678", "message": "Bonjour !",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertIn("mail;dur=", response["Server-Timing"])
+
+    @override_settings(SERVER_TIMING="off", SLOW_REQUEST_MS=1e-6)
+    def test_slow_requests_are_logged(self):
+        with self.assertLogs("ouaf_app.middleware", "WARNING") as logs:
+            response = self.client.get(self.url)
+        self.assertNotIn("Server-Timing", response)
+        self.assertIn("Slow request: GET " + self.url, logs.output[0])
+        self.assertEqual(logs.records[0].view, "animals_list")
+
+
+class QueryCheckTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        animal = Animal.objects.create(name="Rex", description="", pet_amount=0)
+        AnimalMedia.objects.bulk_create(
+            AnimalMedia(animal=animal, file=f"animals/{i}.jpg", position=i, kind="image") for i in range(6))
+
+    def test_statements_are_grouped_by_call_site(self):
+        self.assertEqual(querycheck.normalize('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, %s) AND "b" = \'x\' LIMIT 21'),
+                         'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (...) AND "b" = ? LIMIT ?')
+        with querycheck.check() as log:
+            [str(media) for media in AnimalMedia.objects.all()]
+            with querycheck.allow():
+                [str(media) for media in AnimalMedia.objects.all()]
+        [(count, sql, site)] = log.repeated(5)
+        self.assertEqual(count, 6)
+        self.assertIn('FROM "ouaf_app_animal"', sql)
+        self.assertRegex(site, r"^ouaf_app/models.py:\d+ \(__str__\)$")
+
+    def test_repeated_queries_fail_the_request(self):
+        def view(request):
+            return HttpResponse(", ".join(str(media) for media in AnimalMedia.objects.all()))
+
+        request = RequestFactory().get("/media")
+        with override_settings(QUERY_CHECK="raise"), self.assertRaisesMessage(
+                querycheck.RepeatedQueriesError, "6× at ouaf_app/models.py"):
+            QueryCheckMiddleware(view)(request)
+        with override_settings(QUERY_CHECK="warn"), self.assertLogs("ouaf_app.middleware", "WARNING") as logs:
+            self.assertEqual(QueryCheckMiddleware(view)(request).status_code, 200)
+        self.assertIn("Repeated queries in GET /media", logs.output[0])
+
+    def test_admin_lists_load_related_rows(self):
+        people = [Person.objects.create_user(f"p{i}", email=f"p{i}@example.org") for i in range(6)]
+        for person in people:
+            Event.objects.create(summary="Balade", description="", start=timezone.now(), until=timezone.now(),
+                                 duration=timedelta(hours=1), organizer=person, address="", latitude=0, longitude=0)
+            MemberPayment.objects.create(personId=person, amount=20, paymentDate=timezone.now())
+        self.client.force_login(Person.objects.create_superuser("root", email="root@example.org"))
+        for model in ("animalmedia", "event", "memberpayment"):
+            self.assertEqual(self.client.get(f"/fr/admin/ouaf_app/{model}/").status_code, 200)
+
+    @override_settings(SLOW_QUERY_MS=1e-6)
+    def test_slow_queries_are_logged_with_their_plan(self):
+        querycheck.install()
+        with self.assertLogs("ouaf_app.querycheck", "WARNING") as logs:
+            Animal.objects.filter(name="Rex").count()
+        self.assertIn("Slow query", logs.output[0])
+        self.assertIn("Scan on ouaf_app_animal", logs.output[0])
+
+
+class LoggingTests(TestCase):
+    def test_request_id_is_kept_from_the_proxy_or_created(self):
+        url = reverse("ready")
+        self.assertEqual(self.client.get(url, HTTP_X_REQUEST_ID="lb-42.a")["X-Request-ID"], "lb-42.a")
+        self.assertRegex(self.client.get(url, HTTP_X_REQUEST_ID="not valid!")["X-Request-ID"], r"^[0-9a-f]{32}$")
+
+    def test_records_are_written_as_json_lines_by_a_thread(self):
+        released = threading.Event()
+
+        class SlowStream(io.StringIO):
+            def write(self, text):
+                released.wait(5)
+                return super().write(text)
+
+        stream = SlowStream()
+        handler = logs.QueueHandler(stream, maxsize=2)
+        handler.setFormatter(logs.JsonFormatter())
+        handler.addFilter(logs.RequestIdFilter())
+        logger = logging.getLogger("ouaf_app.tests.logging")
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        token = logs.set_request_id("req-1")
+        try:
+            start = time.perf_counter()
+            for i in range(5):
+                logger.warning("Record %d", i, extra={"view": "index"})
+            # The stream is stuck: the records wait in the queue, then are dropped, without blocking.
+            self.assertLess(time.perf_counter() - start, 1)
+        finally:
+            logs.reset_request_id(token)
+            released.set()
+            handler.close()
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertGreaterEqual(handler.dropped, 2)
+        self.assertEqual(len(lines), 5 - handler.dropped)
+        self.assertEqual(lines[0] | {"time": None}, {"time": None, "level": "WARNING", "logger": "ouaf_app.tests.logging",
+                                                     "message": "Record 0", "request_id": "req-1", "view": "index"})
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.category = ActivityCategory.objects.create(title="Balades", image="images/categories/balades.jpg")
+        Activity.objects.create(title="Balade au parc", category=self.category,
+                                description="Avec les chiens & les chats")
+        Animal.objects.create(name="Moka", description="Un chien calme, qui aime les balades.")
+
+    def _event(self, **fields):
+        return Event.objects.create(summary="Fête du refuge", description="Portes ouvertes", start=timezone.now(),
+                                    until=timezone.now(), duration=timedelta(hours=2), address="Lyon", latitude=0,
+                                    longitude=0, **fields)
+
+    def test_only_published_events_are_indexed(self):
+        event = self._event()
+        self.assertEqual(search.search("refuge", language="fr"), [])
+        event.is_published = True
+        event.save()
+        self.assertEqual([r.title for r in search.search("refuge", language="fr")], ["Fête du refuge"])
+        event.delete()
+        self.assertFalse(SearchDocument.objects.filter(kind=SearchDocument.Kind.EVENT).exists())
+
+    def test_results_are_ranked_and_highlighted(self):
+        results = search.search("balade", language="fr")
+        # The title weighs more than the body; the words are matched on their stem (balades, chiens).
+        self.assertEqual([r.kind for r in results], ["activity", "category", "animal"])
+        self.assertEqual(results[0].title_html, "<mark>Balade</mark> au parc")
+        self.assertEqual(results[0].url, reverse("activities_by_category", args=[self.category.pk]))
+        excerpt = search.search("chien", language="fr", kinds=["activity"])[0].excerpt_html
+        self.assertIn("<mark>chiens</mark> &amp; les chats", excerpt)
+
+    def test_category_rename_updates_its_activities(self):
+        self.category.title = "Promenades"
+        self.category.save()
+        self.assertEqual([r.kind for r in search.search("promenade", language="fr")], ["category", "activity"])
+
+    def test_json_endpoint(self):
+        with translation.override("fr"):
+            url = reverse("search_json")
+        response = self.client.get(url, {"q": "moka", "kind": ["animal", "bogus"], "limit": "5"})
+        data = response.json()
+        self.assertEqual((data["query"], len(data["results"])), ("moka", 1))
+        self.assertEqual(data["results"][0]["title_html"], "<mark>Moka</mark>")
+        self.assertEqual(self.client.get(url).json()["results"], [])
+
+    def test_reindex_removes_stale_documents(self):
+        SearchDocument.objects.create(kind=SearchDocument.Kind.ANIMAL, object_id=10 ** 9, title="Fantôme", body="")
+        SearchDocument.objects.filter(kind=SearchDocument.Kind.ACTIVITY).delete()
+        self.assertEqual(search.reindex(batch_size=1), {"animal": 1, "activity": 1, "category": 1, "event": 0,
+                                                         "team": 0})
+        self.assertFalse(SearchDocument.objects.filter(title="Fantôme").exists())
+
+
+class AdminChangeListTests(TestCase):
+    def setUp(self):
+        person = Person.objects.create_user("payeur", email="payeur@example.org")
+        tz = timezone.get_current_timezone()
+        MemberPayment.objects.bulk_create(
+            MemberPayment(personId=person, amount=20, paymentDate=timezone.datetime(year, month, 1, 12, tzinfo=tz))
+            for year, month in [(2024, 3), (2024, 11), (2026, 5), (2026, 5), (2026, 9)] * 6
+        )
+        self.client.force_login(Person.objects.create_superuser("root", email="root@example.org"))
+
+    def _changelist(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/fr/admin/ouaf_app/memberpayment/", params)
+        self.assertEqual(response.status_code, 200)
+        return response, [query["sql"] for query in queries]
+
+    def test_large_lists_are_not_counted(self):
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE ouaf_app_memberpayment")
+        with override_settings(ADMIN_COUNT_ESTIMATE_ABOVE=10):
+            response, sql = self._changelist()
+        self.assertEqual(response.context["cl"].result_count, 30)
+        self.assertFalse([statement for statement in sql if "COUNT(" in statement.upper()])
+        with override_settings(ADMIN_COUNT_ESTIMATE_ABOVE=10):
+            self.assertIn("EXPLAIN", "".join(self._changelist(q="payeur")[1]))
+        # Small lists are counted exactly.
+        response, sql = self._changelist(q="payeur")
+        self.assertEqual(response.context["cl"].result_count, 30)
+
+    def test_date_hierarchy_probes_periods(self):
+        response, sql = self._changelist()
+        self.assertContains(response, "?paymentDate__year=2024")
+        self.assertContains(response, "?paymentDate__year=2026")
+        self.assertNotContains(response, "?paymentDate__year=2025")
+        self.assertFalse([statement for statement in sql if "DISTINCT" in statement])
+        response, sql = self._changelist(paymentDate__year=2026)
+        links = [f"?paymentDate__month={month}&amp;paymentDate__year=2026" for month in range(1, 13)]
+        self.assertEqual([link for link in links if link in response.content.decode()], [links[4], links[8]])
+
+
+class MediaTypesTests(TestCase):
+    PNG = b"\x89PNG\r\n\x1a\n" + bytes(24)
+
+    def _file(self, name, content):
+        return AnimalMedia(file=SimpleUploadedFile(name, content)).file
+
+    def test_magic_bytes_win_over_the_extension(self):
+        self.assertEqual(mediatypes.detect(self._file("photo.mp4", self.PNG)), ("image", "image/png"))
+        self.assertEqual(mediatypes.detect(self._file("clip.jpg", b"\x00\x00\x00\x18ftypmp42")),
+                         ("video", "video/mp4"))
+
+    def test_unknown_bytes_fall_back_to_the_extension(self):
+        self.assertEqual(mediatypes.detect(self._file("clip.webm", b"????")), ("video", "video/webm"))
+        self.assertEqual(mediatypes.detect(self._file("notes.ouaf", b"????")), ("other", ""))
+
+    def test_urls(self):
+        self.assertEqual(mediatypes.detect(url="https://www.youtube.com/watch?v=abc"), ("video", ""))
+        self.assertEqual(mediatypes.detect(url="https://youtu.be/abc"), ("video", ""))
+        self.assertEqual(mediatypes.detect(url="https://example.org/rex.jpg"), ("image", "image/jpeg"))
+
+    def test_migration_guesses_the_type_of_existing_media(self):
+        animal = Animal.objects.create(name="Rex")
+        AnimalMedia.objects.bulk_create([AnimalMedia(animal=animal, file="animals/rex.png", position=0),
+                                         AnimalMedia(animal=animal, file="animals/rex.mp4", position=1)])
+        migration = importlib.import_module("ouaf_app.migrations.0019_media_kind_mime")
+        migration.guess_types(apps, None)
+        self.assertEqual(list(AnimalMedia.objects.values_list("kind", "mime")),
+                         [("image", "image/png"), ("video", "video/mp4")])
@@ -1,26 +1,42 @@
+from django.conf import settings
 from django.urls import path, include
 from . import views
 
+# Under ASGI (see ouaf/asgi.py) the public pages and the contact form are served by async views.
+if settings.ASYNC_VIEWS:
+    from . import async_views as public_views
+    category_list_view = public_views.activity_category_list
+    activities_by_category_view = public_views.activities_by_category
+    contact_view = public_views.AsyncContactView.as_view()
+else:
+    public_views = views
+    category_list_view = views.ActivityCategoryListView.as_view()
+    activities_by_category_view = views.ActivitiesByCategoryView.as_view()
+    contact_view = views.ContactView.as_view()
+
 
 urlpatterns = [
-    path("", views.index, name='index'),
+    path("", public_views.index, name='index'),
     path('account/logout', views.my_logout, name="my_logout"),
     path("account/", include("django.contrib.auth.urls")),
     path("registration/signup",views.signup_user, name="signup"),
     path("account/edit", views.account_edit, name="account_edit"),
 
-    path("organisationChart", views.organisation_chart, name="organisation_chart"),
+    path("organisationChart", public_views.organisation_chart, name="organisation_chart"),
+
+    path("mediationAnimale", public_views.mediation_animale, name="mediation_animale"),
 
-    path("mediationAnimale", views.mediation_animale, name="mediation_animale"),
+    path("activities/", category_list_view, name="activities_list"),
+    path("activities/category/<int:pk>/", activities_by_category_view, name="activities_by_category"),
 
-    path("activities/", views.ActivityCategoryListView.as_view(), name="activities_list"),
-    path("activities/category/<int:pk>/", views.ActivitiesByCategoryView.as_view(), name="activities_by_category"),
+    path("animals/list", public_views.animal_list, name="animals_list"),
+    path("animals/<int:animal_id>/detail/", public_views.animal_detail, name="animal_detail"),
+    path("contact/", contact_view, name="contact"),
 
-    path("animals/list", views.animal_list, name="animals_list"),
-    path("animals/<int:animal_id>/detail/", views.animal_detail, name="animal_detail"),
-    path("contact/", views.ContactView.as_view(), name="contact"),
+    path("search/", views.search_results, name="search"),
+    path("search.json", views.search_api, name="search_json"),
 
-    path("confidentialite", views.confidentialite, name="confidentialite")
+    path("confidentialite", public_views.confidentialite, name="confidentialite")
     #account/login/ [name='login']
     #account/logout/ [name='logout']
     #account/password_change/ [name='password_change']
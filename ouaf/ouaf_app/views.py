@@ -1,23 +1,30 @@
-from django.db.models import Prefetch
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import logout, authenticate, login
 from django.contrib.auth.decorators import login_required, login_not_required
 from django.urls import reverse_lazy
 from django.views.generic import ListView, FormView
-from django.http import HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from .forms import PersonForm, RegistrationForm, ContactForm
-from .models import OrganisationChartEntry, Activity, ActivityCategory, Animal, AnimalMedia
+from .models import OrganisationChartEntry, Activity, ActivityCategory, Animal, AnimalMedia, ActivityMedia, \
+    ImageRendition, SearchDocument
+from .page_cache import cache_public_page
+from . import instrumentation, metrics, outbox, renditions, search
+from .ratelimit import RateLimit, RateLimitMixin
 from django.contrib import messages
 from django.utils.translation import gettext as _
 from django.conf import settings
 from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.utils.decorators import method_decorator
 from django.utils.html import strip_tags
 from django.template.loader import render_to_string
+import hmac
 import logging
 import uuid
 from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
 
 
+@cache_public_page()
 def index(request):
     return render(request, "index.html")
 
@@ -37,7 +44,7 @@ def signup_user(request: HttpRequest):
             login(request, new_user)
             return redirect("/")
         else:
-            print(form.errors)
+            logger.info("Signup form invalid", extra={"fields": sorted(form.errors)})
     else:
         form = RegistrationForm()
     template_name = "registration/signup.html"
@@ -52,7 +59,7 @@ def account_edit(request):
         if form.is_valid():
             form.save()
         else:
-            print(form.errors)
+            logger.info("Account form invalid", extra={"fields": sorted(form.errors)})
     else:
         form = PersonForm(instance=request.user)
     template_name = "account/account_edit.html"
@@ -60,11 +67,15 @@ def account_edit(request):
     return render(request, template_name, context)
 
 
+@cache_public_page(OrganisationChartEntry, ImageRendition)
 def organisation_chart(request):
-    context = {"organisation_members": OrganisationChartEntry.objects.all()}
+    members = list(OrganisationChartEntry.objects.all())
+    renditions.prime(member.photo.name for member in members)
+    context = {"organisation_members": members}
     return render(request, "organisationChart.html", context)
 
 
+@cache_public_page()
 def mediation_animale(request):
     return render(request, "mediationAnimale.html")
 
@@ -73,37 +84,55 @@ def confidentialite(request):
     return render(request, "confidentialite.html")
 
 
+@method_decorator(cache_public_page(ActivityCategory, ImageRendition), name="dispatch")
 class ActivityCategoryListView(ListView):
     model = ActivityCategory
     template_name = "activities/list.html"
     context_object_name = "categories"
     raise_exception = True
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        renditions.prime(category.image.name for category in context["categories"])
+        return context
+
 
+@method_decorator(cache_public_page(Activity, ActivityMedia, ActivityCategory), name="dispatch")
 class ActivitiesByCategoryView(ListView):
     model = Activity
     template_name = "activities/by_category.html"
     context_object_name = "activities"
+    paginate_by = 10
+
+    def get(self, request, *args, **kwargs):
+        self.category = get_object_or_404(ActivityCategory, pk=self.kwargs["pk"])
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Activity.objects.filter(category_id=self.kwargs["pk"]).order_by("title")
+        # Media come ordered by ActivityMedia.Meta.ordering (position, id).
+        return (
+            Activity.objects
+            .filter(category=self.category)
+            .order_by("title", "id")
+            .prefetch_related("media")
+        )
 
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx["category"] = ActivityCategory.objects.get(pk=self.kwargs["pk"])
+        ctx["category"] = self.category
         return ctx
 
 
 logger = logging.getLogger(__name__)
 
 
-class ContactView(FormView):
+class ContactView(RateLimitMixin, FormView):
     """
     Handle the contact form workflow with anti-abuse protections and three modes
     (standard contact, volunteer application, membership/adhesion).
 
     Overview:
-        This view validates user input, applies per-IP rate limiting,
+        This view validates user input, applies rate limiting,
         renders email content from templates, sends an email to the organization,
         and sends an acknowledgment (ACK) to the user. It also adapts UI copy,
         email subjects, and success messaging based on the requested mode.
@@ -127,12 +156,14 @@ class ContactView(FormView):
             * `contact_intro` (str)
 
     Workflow:
-        1. Apply per-IP rate limiting (default: 5 submissions / 15 minutes via cache).
+        1. Apply per-IP and per-email rate limiting (default: 5 submissions / 15 minutes).
         2. Validate the form (first/last name, email, phone, message, spam fields).
-        3. Generate a unique request ID (UUID) for logging and correlation.
+        3. Tag the emails with the request ID (see RequestIdMiddleware) for logging and correlation.
         4. Build context and render organization email (HTML + text fallback).
-        5. Send the organization email (hard-fail on error with user-friendly message).
-        6. Render and send the user ACK email (fail silently but log errors).
+        5. Render the user ACK email.
+        6. Queue both emails in the outbox, in one transaction (hard-fail on
+           database error with user-friendly message). They are sent by the
+           `send_outbox` worker, with retries; no SMTP call is made here.
         7. Display a mode-specific success message and redirect.
 
     Email & Security:
@@ -152,13 +183,14 @@ class ContactView(FormView):
 
     Rate limiting:
         - Window length: RATE_LIMIT_WINDOW (seconds).
-        - Max submissions: RATE_LIMIT_MAX per IP within the window.
-        - Uses `cache.add`/`cache.incr` guarded by fallback `cache.set`.
+        - Max submissions: RATE_LIMIT_MAX per IP, and per submitted email, within the window.
+        - Sliding window shared by all workers (`ouaf_app.ratelimit`); blocked
+          submissions get a 429 with a Retry-After header.
 
     Attributes:
         template_name (str): Path to the contact form template.
         form_class (ContactForm): Form used for validation and cleaned data.
-        RATE_LIMIT_MAX (int): Max submissions per IP per window.
+        RATE_LIMIT_MAX (int): Max submissions per IP (and per email) per window.
         RATE_LIMIT_WINDOW (int): Window size in seconds.
         MODE_CONFIG (dict): Per-mode UI copy and behavior.
 
@@ -171,12 +203,14 @@ class ContactView(FormView):
             Resolve the current mode from the `type` query parameter.
         get_form(form_class=None):
             Apply per-mode placeholder to the message field.
-        _client_ip() -> str:
-            Extract the client IP from X-Forwarded-For or REMOTE_ADDR.
-        dispatch(request, *args, **kwargs):
-            Enforce rate limiting before processing POST submissions.
+        rate_limited(request, decision):
+            Flash an error message and answer 429 when a POST submission is rate limited.
         form_valid(form):
-            Render and send organization + ACK emails, manage logging and messages.
+            Render and queue organization + ACK emails, manage logging and messages.
+        build_emails(data) -> (str, list):
+            Render both emails for the cleaned data, tagged with a new request ID.
+        queue_emails(req_id, emails):
+            Store the emails in the outbox in one transaction.
         _safe_subject(text: str, max_len: int = 140) -> str:
             Sanitize and truncate subject lines for safe SMTP headers.
     """
@@ -185,6 +219,10 @@ class ContactView(FormView):
 
     RATE_LIMIT_MAX = 5
     RATE_LIMIT_WINDOW = 15 * 60
+    rate_limits = [
+        RateLimit("contact", RATE_LIMIT_MAX, RATE_LIMIT_WINDOW, key="ip"),
+        RateLimit("contact", RATE_LIMIT_MAX, RATE_LIMIT_WINDOW, key="email"),
+    ]
 
     MODE_CONFIG = {
         "contact": {
@@ -249,35 +287,25 @@ class ContactView(FormView):
         form.fields["message"].widget.attrs["placeholder"] = cfg["placeholder"]
         return form
 
-    def _client_ip(self) -> str:
-        xff = self.request.META.get("HTTP_X_FORWARDED_FOR")
-        if xff:
-            return xff.split(",")[0].strip()
-        return self.request.META.get("REMOTE_ADDR", "0.0.0.0")
-
-    def dispatch(self, request, *args, **kwargs):
-        if request.method == "POST":
-            ip = self._client_ip()
-            key = f"contact_rl:{ip}"
-            current = cache.get(key, 0)
-
-            if current >= self.RATE_LIMIT_MAX:
-                messages.error(request, "Trop de tentatives. Réessayez dans quelques minutes.")
-                return HttpResponse("Rate limit exceeded", status=429)
-
-            if current > 0:
-                try:
-                    cache.incr(key)
-                except Exception:
-                    cache.set(key, current + 1, timeout=self.RATE_LIMIT_WINDOW)
-            else:
-                cache.add(key, 1, timeout=self.RATE_LIMIT_WINDOW)
-
-        return super().dispatch(request, *args, **kwargs)
+    def rate_limited(self, request, decision):
+        messages.error(request, "Trop de tentatives. Réessayez dans quelques minutes.")
+        return super().rate_limited(request, decision)
 
     def form_valid(self, form):
-        data = form.cleaned_data
-        req_id = str(uuid.uuid4())
+        with instrumentation.phase("mail"):
+            req_id, emails = self.build_emails(form.cleaned_data)
+            try:
+                self.queue_emails(req_id, emails)
+            except DatabaseError:
+                return self.queue_failed(form, req_id)
+
+        messages.success(self.request, self.MODE_CONFIG[self._mode()]["success"])
+        return super().form_valid(form)
+
+    def build_emails(self, data):
+        """Render the organization and ACK emails; return (request id, [(message, purpose), ...])."""
+        # The ID of the HTTP request (see RequestIdMiddleware): the emails and the request's logs correlate.
+        req_id = getattr(self.request, "request_id", None) or str(uuid.uuid4())
 
         cfg = self.MODE_CONFIG[self._mode()]
         subject_base = cfg["subject"](data)
@@ -308,13 +336,6 @@ class ContactView(FormView):
         org_msg.attach_alternative(html, "text/html")
         org_msg.extra_headers = {"X-Contact-Request-ID": req_id}
 
-        try:
-            org_msg.send(fail_silently=False)
-        except Exception:
-            logger.exception("Contact email failed", extra={"request_id": req_id})
-            messages.error(self.request, "Désolé, l’envoi a échoué. Merci de réessayer dans quelques minutes.")
-            return self.form_invalid(form)
-
         ack_subject = self._safe_subject(cfg["ack"])
         ack_html = render_to_string("emails/contact_ack.html", ctx)
         ack_text = strip_tags(ack_html)
@@ -327,13 +348,19 @@ class ContactView(FormView):
         )
         ack_msg.attach_alternative(ack_html, "text/html")
         ack_msg.extra_headers = {"X-Contact-Request-ID": req_id}
-        try:
-            ack_msg.send(fail_silently=True)
-        except Exception:
-            logger.exception("Contact ACK failed", extra={"request_id": req_id})
+        return req_id, [(org_msg, "contact_to_org"), (ack_msg, "contact_ack")]
 
-        messages.success(self.request, cfg["success"])
-        return super().form_valid(form)
+    @staticmethod
+    def queue_emails(req_id, emails):
+        # Both emails are sent by the `send_outbox` worker; the request only writes them.
+        with transaction.atomic():
+            for message, purpose in emails:
+                outbox.enqueue(message, req_id, purpose)
+
+    def queue_failed(self, form, req_id):
+        logger.exception("Contact email could not be queued", extra={"request_id": req_id})
+        messages.error(self.request, "Désolé, l’envoi a échoué. Merci de réessayer dans quelques minutes.")
+        return self.form_invalid(form)
 
     @staticmethod
     def _safe_subject(text: str, max_len: int = 140) -> str:
@@ -357,21 +384,84 @@ class ContactView(FormView):
         return s[:max_len]
 
 
+ANIMALS_PAGE_SIZE = 24
+
+
+@cache_public_page(Animal, AnimalMedia, ImageRendition)
 def animal_list(request):
-    animals = Animal.objects.prefetch_related(Prefetch("media", to_attr="medias")).all()
-    for animal in animals:
-        if animal.medias:
-            pres_image = next(media for media in animal.medias if media.is_image)
-            if pres_image:
-                animal.presentation_image = pres_image.file
-    return render(request, "animals/list.html", {"animals": animals})
+    """
+    Keyset-paginated list of animals: `?after=<id>` returns the next page, so the
+    cost of a page only depends on its size. Covers are joined, not computed.
+    """
+    animals = Animal.objects.select_related("cover").order_by("id")
+    after = request.GET.get("after", "")
+    if after.isdigit():
+        animals = animals.filter(id__gt=int(after))
+
+    page = list(animals[:ANIMALS_PAGE_SIZE + 1])
+    next_after = page[ANIMALS_PAGE_SIZE - 1].id if len(page) > ANIMALS_PAGE_SIZE else None
+    context = {"animals": page[:ANIMALS_PAGE_SIZE], "next_after": next_after}
+    renditions.prime(animal.cover.file.name for animal in context["animals"] if animal.cover)
+    return render(request, "animals/list.html", context)
 
 
+@cache_public_page(Animal, AnimalMedia, ImageRendition)
 def animal_detail(request, animal_id):
-    animal = Animal.objects.filter(id=animal_id).first()
-    medias = AnimalMedia.objects.filter(animal_id=animal_id)
-    if medias:
-        pres_image = next(media for media in medias if media.is_image)
-        if pres_image:
-            animal.presentation_image = pres_image.file
+    animal = get_object_or_404(Animal.objects.select_related("cover"), id=animal_id)
+    medias = animal.media.all()
     return render(request, "animals/detail.html", {"animal": animal, "medias": medias})
+
+
+def _search_params(request):
+    query = request.GET.get("q", "")[:200]
+    kinds = [kind for kind in request.GET.getlist("kind") if kind in SearchDocument.Kind.values]
+    return query, kinds
+
+
+def search_results(request):
+    """Search page: the best matches of `?q=`, optionally restricted to some `?kind=`s."""
+    query, kinds = _search_params(request)
+    results = search.search(query, kinds=kinds)
+    return render(request, "search/results.html", {
+        "query": query, "kinds": kinds, "kind_choices": SearchDocument.Kind.choices, "results": results,
+    })
+
+
+def search_api(request):
+    """The same results in JSON: `?q=`, `?kind=` (repeatable), `?limit=` (at most search.MAX_RESULTS)."""
+    query, kinds = _search_params(request)
+    limit = request.GET.get("limit", "")
+    results = search.search(query, kinds=kinds, limit=int(limit) if limit.isdigit() else 20)
+    return JsonResponse({"query": query, "results": [result.as_dict() for result in results]})
+
+
+def readiness(request):
+    """Readiness probe: 200 when the database and the shared cache answer, 503 otherwise."""
+    checks = {}
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        checks["database"] = "ok"
+    except DatabaseError as error:
+        checks["database"] = str(error)
+    try:
+        cache.set("ready:probe", 1, timeout=10)
+        checks["cache"] = "ok" if cache.get("ready:probe") == 1 else "unavailable"
+    except Exception as error:
+        checks["cache"] = str(error)
+    ready = all(status == "ok" for status in checks.values())
+    response = JsonResponse({"ready": ready, "checks": checks}, status=200 if ready else 503)
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+def prometheus_metrics(request):
+    """Request metrics of every worker, see `ouaf_app.metrics`. Without METRICS_TOKEN, only with DEBUG."""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    if not token and not settings.DEBUG:
+        raise Http404
+    if token and not hmac.compare_digest(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return HttpResponse(status=403)
+    response = HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+    response["Cache-Control"] = "no-store"
+    return response
@@ -0,0 +1,169 @@
+"""
+Warm-up of a server process before it accepts traffic.
+
+Each step pays, once, a cost the first requests would otherwise pay:
+
+    templates : compile the project's templates (kept by the cached loader);
+    urls      : populate the URL resolvers for every language and namespace
+                (ouaf_app.urls is included twice, with and without i18n_patterns);
+    catalogs  : load the translation catalog of every language in LANGUAGES;
+    imports   : import the modules loaded lazily on first use (phonenumbers' metadata);
+    pages     : request the public pages in every language through Django's
+                handler, which fills the shared page cache.
+
+`run_once()` runs them once per process and reports the time of each step.
+The `serve` command calls it before forking the workers (so they inherit the
+warm state); with another server, set WARMUP to run it from ouaf/wsgi.py or
+ouaf/asgi.py once the application is loaded.
+
+Settings:
+    WARMUP (bool)          : warm up when the WSGI/ASGI application is loaded (default False).
+    WARMUP_URL_NAMES (list): names of the pages to request (default: the public pages).
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template import TemplateSyntaxError, engines
+from django.test import Client
+from django.urls import get_resolver, reverse
+from django.utils import translation
+
+logger = logging.getLogger(__name__)
+
+URL_NAMES = ["index", "mediation_animale", "organisation_chart", "activities_list", "animals_list", "contact"]
+
+_report = None
+
+
+def _host():
+    """A host accepted by ALLOWED_HOSTS, for the warm-up requests."""
+    for host in settings.ALLOWED_HOSTS:
+        host = host.lstrip(".")
+        if host and host != "*":
+            return host
+    return "localhost"
+
+
+def compile_templates():
+    """Compile every template of the project (not those of third-party packages); return their number."""
+    count = 0
+    for engine in engines.all():
+        for directory in engine.template_dirs:
+            if not str(directory).startswith(str(settings.BASE_DIR)):
+                continue
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    if not name.endswith((".html", ".txt")):
+                        continue
+                    template_name = os.path.relpath(os.path.join(root, name), directory).replace(os.sep, "/")
+                    try:
+                        engine.get_template(template_name)
+                    except TemplateSyntaxError:
+                        logger.warning("Warm-up: template doesn't compile", extra={"template": template_name})
+                        continue
+                    count += 1
+    return count
+
+
+def _populate(resolver):
+    """Fill `resolver`'s reverse tables for the current language, and those of its namespaces."""
+    count = len(resolver.reverse_dict)
+    for _, nested in resolver.namespace_dict.values():
+        count += _populate(nested)
+    return count
+
+
+def resolve_urls():
+    """Populate the URL resolvers in every language; return the number of reversible entries."""
+    resolver = get_resolver()
+    count = 0
+    for language, _ in settings.LANGUAGES:
+        with translation.override(language):
+            count += _populate(resolver)
+    return count
+
+
+def load_catalogs():
+    """Load the translation catalog of every language; return their number."""
+    for language, _ in settings.LANGUAGES:
+        with translation.override(language):
+            translation.gettext("Nom")
+    return len(settings.LANGUAGES)
+
+
+def import_lazy_modules():
+    """Import what is otherwise loaded by the first request needing it."""
+    import phonenumbers
+
+    # The metadata of a region is only loaded when a number of that region is parsed.
+    phonenumbers.parse("+33 6 12 34 56 78", None)
+    return 1
+
+
+def prime_pages():
+    """Request every warm-up page in every language; return the number of failed requests."""
+    client = Client(HTTP_HOST=_host())
+    failed = 0
+    for language, _ in settings.LANGUAGES:
+        with translation.override(language):
+            paths = [reverse(name) for name in getattr(settings, "WARMUP_URL_NAMES", URL_NAMES)]
+        for path in paths:
+            response = client.get(path)
+            if response.status_code != 200:
+                failed += 1
+                logger.warning("Warm-up request failed", extra={"path": path, "status": response.status_code})
+    return failed
+
+
+STEPS = [
+    ("templates", compile_templates),
+    ("urls", resolve_urls),
+    ("catalogs", load_catalogs),
+    ("imports", import_lazy_modules),
+    ("pages", prime_pages),
+]
+
+
+def release_connections():
+    """Close the database and cache connections, which must not be shared with forked workers."""
+    connections.close_all()
+    for cache in caches.all(initialized_only=True):
+        cache.close()
+
+
+def warm_up():
+    """Run every step; return {step: seconds} (with a "total")."""
+    report = {}
+    start = time.perf_counter()
+    try:
+        for name, step in STEPS:
+            step_start = time.perf_counter()
+            try:
+                step()
+            except Exception:
+                # A failed step leaves the process cold, not broken.
+                logger.exception("Warm-up step failed", extra={"step": name})
+            report[name] = time.perf_counter() - step_start
+    finally:
+        release_connections()
+    report["total"] = time.perf_counter() - start
+    logger.info("Warm-up done in %.0f ms", report["total"] * 1000,
+                extra={f"warmup_{name}_ms": round(seconds * 1000) for name, seconds in report.items()})
+    return report
+
+
+def run_once():
+    """warm_up() the first time it's called in this process; return its report (None if it was already run)."""
+    global _report
+    if _report is not None:
+        return None
+    _report = warm_up()
+    return _report
+
+
+def format_report(report):
+    return ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in report.items())
@@ -1,8 +1,14 @@
 from django import forms
-from ouaf_app.models import Person, Animal
+from ouaf_app.models import Person, Animal, Event
 from ouaf_app.groups import *
 from django.utils.translation import gettext_lazy as _
-from phonenumber_field.formfields import PhoneNumberField as PhoneFormField
+from ouaf_app.fields import PhoneNumberFormField as PhoneFormField
+from .widgets import PersonAutocompleteSelect, PersonAutocompleteSelectMultiple
+
+
+def person_label(person):
+    name = person.get_full_name()
+    return f"{name} ({person.username})" if name else person.username
 
 
 class PersonEditForm(forms.ModelForm):
@@ -53,3 +59,19 @@ class PersonEditForm(forms.ModelForm):
 
 class MediaForm(forms.ModelForm):
     template_name = "backoffice/forms/media.html"
+
+
+class EventForm(forms.ModelForm):
+    class Meta:
+        model = Event
+        fields = ["summary", "description", "start", "until", "duration",
+                  "organizer", "attendees", "address", "latitude", "longitude", "is_published"]
+        widgets = {
+            "organizer": PersonAutocompleteSelect(),
+            "attendees": PersonAutocompleteSelectMultiple(),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in ("organizer", "attendees"):
+            self.fields[name].label_from_instance = person_label
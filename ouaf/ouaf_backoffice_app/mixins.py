@@ -1,5 +1,7 @@
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
+from ouaf_app import auth_cache
+
 
 class BackofficeAccessRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
     required_group = "Backoffice"
@@ -7,6 +9,6 @@ class BackofficeAccessRequiredMixin(LoginRequiredMixin, UserPassesTestMixin):
 
     def test_func(self):
         user = self.request.user
-        return user.is_authenticated and user.groups.filter(name=self.required_group).exists()
+        return user.is_authenticated and self.required_group in auth_cache.get_authorizations(user)["groups"]
 
 
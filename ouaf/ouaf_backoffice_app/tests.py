@@ -1,3 +1,166 @@
+from django.contrib.auth.models import Group
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import translation
 
-# Create your tests here.
+from ouaf_app import perf
+from ouaf_app.models import Activity, ActivityCategory, ActivityMedia, Event, Person
+from ouaf_app.perf import clear_caches
+
+
+class AuthorizationCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = Person.objects.create_user("benevole", password="pw")
+        self.user.set_group("Backoffice", True)
+        self.client.force_login(self.user)
+        with translation.override("fr"):
+            self.url = reverse("backoffice:activity_list")
+
+    def _auth_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        sql = [q["sql"] for q in queries]
+        return response, [s for s in sql if "auth_group" in s or "auth_permission" in s]
+
+    def test_warm_page_makes_no_authorization_query(self):
+        response, _ = self._auth_queries()
+        self.assertEqual(response.status_code, 200)
+        response, auth_queries = self._auth_queries()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(auth_queries, [])
+
+    def test_group_change_is_seen_on_next_request(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        self.user.groups.remove(Group.objects.get(name="Backoffice"))
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_permission_change_is_seen_on_next_request(self):
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+        Group.objects.get(name="Backoffice").permissions.clear()
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+
+class ActivityListViewTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = Person.objects.create_user("benevole", password="pw")
+        self.user.set_group("Backoffice", True)
+        self.client.force_login(self.user)
+        self.categories = [
+            ActivityCategory.objects.create(title=title, image=f"images/categories/{title.lower()}.jpg")
+            for title in ("Balades", "Ateliers", "Visites")
+        ]
+        with translation.override("fr"):
+            self.url = reverse("backoffice:activity_list")
+
+    def _add_activities(self, count):
+        start = Activity.objects.count()
+        for i in range(start, start + count):
+            activity = Activity.objects.create(title=f"Activité {i:02}", category=self.categories[i % 3],
+                                               description="...")
+            ActivityMedia.objects.create(activity=activity, url=f"https://example.org/{i}.jpg", position=0)
+            ActivityMedia.objects.create(activity=activity, url=f"https://example.org/{i}.mp4", position=1)
+
+    def _get(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def _titles(self, **params):
+        return [activity.title for activity in self._get(**params)[0].context["object_list"]]
+
+    def test_query_count_does_not_grow_with_activities(self):
+        self._add_activities(4)
+        self._get()
+        _, few = self._get()
+        self._add_activities(8)
+        response, many = self._get()
+        self.assertEqual(few, many)
+        activity = response.context["object_list"][0]
+        self.assertEqual((activity.media_count, activity.thumbnail_url), (2, "https://example.org/0.jpg"))
+
+    def test_filters(self):
+        self._add_activities(6)
+        self.assertEqual(self._titles(category=self.categories[1].pk), ["Activité 01", "Activité 04"])
+        self.assertEqual(self._titles(q="é 0"), [f"Activité 0{i}" for i in range(6)])
+        self.assertEqual(self._titles(q="03"), ["Activité 03"])
+        self.assertEqual(self._titles(category="abc"), self._titles())
+
+    def test_sorts(self):
+        self._add_activities(4)
+        self.assertEqual(self._titles(sort="-title"), ["Activité 03", "Activité 02", "Activité 01", "Activité 00"])
+        self.assertEqual(self._titles(sort="category"), ["Activité 01", "Activité 00", "Activité 03", "Activité 02"])
+        self.assertEqual(self._titles(sort="-category"), ["Activité 02", "Activité 03", "Activité 00", "Activité 01"])
+        self.assertEqual(self._titles(sort="unknown"), self._titles(sort="title"))
+
+
+class PersonAutocompleteTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = Person.objects.create_user("admin", email="admin@example.org", password="pw")
+        self.user.set_group("Backoffice", True)
+        self.client.force_login(self.user)
+        with translation.override("fr"):
+            self.create_url = reverse("backoffice:event_create")
+            self.autocomplete_url = reverse("backoffice:person_autocomplete")
+
+    def _add_people(self, count, start=0):
+        Person.objects.bulk_create(
+            Person(username=f"membre{i}", email=f"membre{i}@example.org", first_name="Camille", last_name=f"Martin{i}")
+            for i in range(start, start + count)
+        )
+
+    def test_form_page_size_does_not_depend_on_members(self):
+        self._add_people(5)
+        small = len(self.client.get(self.create_url).content)
+        self._add_people(300, start=5)
+        self.assertEqual(len(self.client.get(self.create_url).content), small)
+
+    def test_autocomplete_is_limited_and_ranks_prefixes_first(self):
+        self._add_people(30)
+        Person.objects.create(username="zed", email="zed@example.org", first_name="Ana", last_name="Demartin")
+        results = self.client.get(self.autocomplete_url, {"q": "martin", "limit": 5}).json()["results"]
+        self.assertEqual(len(results), 5)
+        self.assertTrue(all("Martin" in r["text"] for r in results))
+        self.assertEqual(self.client.get(self.autocomplete_url, {"q": "m"}).json(), {"results": []})
+
+    def test_submitted_people_are_saved(self):
+        self._add_people(3)
+        organizer, *attendees = Person.objects.filter(username__startswith="membre").order_by("id")
+        response = self.client.post(self.create_url, {
+            "summary": "Balade", "description": "...", "start": "2026-05-01 10:00", "until": "2026-05-01 12:00",
+            "duration": "02:00:00", "organizer": organizer.pk, "attendees": [a.pk for a in attendees],
+            "address": "Paris", "latitude": "48.85", "longitude": "2.35",
+        })
+        self.assertEqual(response.status_code, 302)
+        event = Event.objects.get()
+        self.assertEqual(event.organizer, organizer)
+        self.assertEqual(set(event.attendees.all()), set(attendees))
+        with translation.override("fr"):
+            response = self.client.get(reverse("backoffice:event_edit", args=[event.pk]))
+        self.assertContains(response, f'value="{organizer.pk}" selected')
+
+    def test_invalid_person_is_a_form_error(self):
+        self._add_people(1)
+        member = Person.objects.get(username="membre0")
+        response = self.client.post(self.create_url, {
+            "summary": "Balade", "description": "...", "start": "2026-05-01 10:00", "until": "2026-05-01 12:00",
+            "duration": "02:00:00", "organizer": "abc", "attendees": [member.pk, "x"],
+            "address": "Paris", "latitude": "48.85", "longitude": "2.35",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("organizer", response.context["form"].errors)
+        self.assertFalse(Event.objects.exists())
+
+
+class PerformanceBudgetTests(TestCase):
+    def test_backoffice_pages_stay_within_budget(self):
+        perf.seed()
+        names = {name for name, _ in perf.pages() if name.startswith("backoffice:")}
+        results = perf.run(runs=1, names=names)
+        self.assertEqual(results.keys(), names)
+        self.assertEqual(perf.check(results, perf.load_budgets()), [])
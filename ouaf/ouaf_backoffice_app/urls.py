@@ -8,6 +8,7 @@ urlpatterns = [
 
     path("users/", views.UserListView.as_view(), name="user_list"),
     path("users/<int:pk>/edit/", views.UserUpdateView.as_view(), name="user_edit"),
+    path("users/autocomplete/", views.PersonAutocompleteView.as_view(), name="person_autocomplete"),
 
     path("activities/", views.ActivityListView.as_view(), name="activity_list"),
     path("activities/new/", views.ActivityCreateView.as_view(), name="activity_create"),
@@ -1,3 +1,5 @@
+import logging
+
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django import forms
@@ -6,16 +8,19 @@ from django.forms import inlineformset_factory, BaseFormSet, modelformset_factor
 from django.http import JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
+from django.views import View
 from django.views.generic import TemplateView, ListView, DeleteView, UpdateView, CreateView, DetailView
 from .mixins import BackofficeAccessRequiredMixin
 from ouaf_app.models import Event, Animal, Activity, OrganisationChartEntry, ActivityMedia, ActivityCategory, \
     AnimalMedia
-from .forms import PersonEditForm, MediaForm
+from .forms import PersonEditForm, MediaForm, EventForm, person_label
 from ouaf_app.signals import *
 from django.db import transaction
+from django.db.models import Case, Count, Q, Value, When
 from django.utils.translation import gettext as _
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 
 #On top of the page for better compatibility
@@ -55,6 +60,42 @@ class UserUpdateView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, Upd
     raise_exception = True
 
 
+class PersonAutocompleteView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, View):
+    """JSON choices for the person pickers (see widgets.AutocompleteMixin): ?q=<text>&limit=<n>."""
+    permission_required = person_view.perm_name()
+    raise_exception = True
+    min_length = 2
+    default_limit = 10
+    max_limit = 20
+    search_fields = ("username", "email", "first_name", "last_name")
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get("q", "").strip()
+        try:
+            limit = max(1, min(int(request.GET.get("limit", self.default_limit)), self.max_limit))
+        except ValueError:
+            limit = self.default_limit
+        if len(query) < self.min_length:
+            return JsonResponse({"results": []})
+
+        # Every word must appear in one of the fields; UPPER(field) LIKE is served by the trigram indexes.
+        people = User.objects.filter(is_active=True)
+        for term in query.split()[:4]:
+            matches = Q()
+            for field in self.search_fields:
+                matches |= Q(**{f"{field}__icontains": term})
+            people = people.filter(matches)
+
+        first = query.split()[0]
+        prefix = Q()
+        for field in self.search_fields:
+            prefix |= Q(**{f"{field}__istartswith": first})
+        people = (people.annotate(rank=Case(When(prefix, then=Value(0)), default=Value(1)))
+                  .order_by("rank", "last_name", "first_name", "id")
+                  .only("id", "username", "first_name", "last_name")[:limit])
+        return JsonResponse({"results": [{"id": p.pk, "text": person_label(p)} for p in people]})
+
+
 class EventListView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, ListView):
     model = Event
     template_name = "backoffice/events/list.html"
@@ -64,8 +105,7 @@ class EventListView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, List
 
 class EventCreateView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, CreateView):
     model = Event
-    fields = ["summary", "description", "start", "until", "duration",
-              "organizer", "attendees", "address", "latitude", "longitude", "is_published"]
+    form_class = EventForm
     template_name = "backoffice/events/form.html"
     permission_required = event_add.perm_name()
     success_url = reverse_lazy("backoffice:event_list")
@@ -74,8 +114,7 @@ class EventCreateView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, Cr
 
 class EventUpdateView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, UpdateView):
     model = Event
-    fields = ["summary", "description", "start", "until", "duration",
-              "organizer", "attendees", "address", "latitude", "longitude", "is_published"]
+    form_class = EventForm
     template_name = "backoffice/events/form.html"
     permission_required = event_change.perm_name()
     success_url = reverse_lazy("backoffice:event_list")
@@ -130,11 +169,7 @@ class AnimalCreateView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, C
         FormSet = self._create_formset_class()
         media_formset = FormSet(request.POST, request.FILES)
 
-        print("post")
-        print(form.is_valid())
-        print(media_formset.is_valid())
         if form.is_valid() and media_formset.is_valid():
-            print("valid")
             with transaction.atomic():
                 self.object = form.save()
                 media_formset.instance = self.object
@@ -142,14 +177,20 @@ class AnimalCreateView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, C
 
             messages.success(request, "Animal créé.")
             return redirect(self.get_success_url())
-        else:
-            print(media_formset.error_messages)
-            print("invalid")
+        _log_invalid_animal(form, media_formset)
 
         context = self.get_context_data(form=form)
         return self.render_to_response(context)
 
 
+def _log_invalid_animal(form, media_formset):
+    logger.info("Animal form invalid", extra={
+        "fields": sorted(form.errors),
+        "media_fields": sorted({field for errors in media_formset.errors for field in errors}),
+        "media_errors": media_formset.non_form_errors(),
+    })
+
+
 class AnimalEditView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, UpdateView):
     model = Animal
     fields = ["name", "description", "birth", "death", "pet_amount"]
@@ -183,18 +224,13 @@ class AnimalEditView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, Upd
         UpdateFormSet = self._update_formset_class()
         media_formset = UpdateFormSet(request.POST, request.FILES, instance=self.object)
 
-        print("update")
-        print(form.is_valid())
-        print(media_formset.is_valid())
         if form.is_valid() and media_formset.is_valid():
             with transaction.atomic():
                 self.object = form.save()
                 media_formset.save()
             messages.success(request, "Animal mis à jour.")
             return redirect(self.get_success_url())
-        else:
-            print(media_formset.error_messages)
-            print("invalid")
+        _log_invalid_animal(form, media_formset)
 
         return self.render_to_response({
             "form": form,
@@ -216,13 +252,46 @@ class ActivityListView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, L
     template_name = "backoffice/activities/list.html"
     permission_required = activity_view.perm_name()
     raise_exception = True
+    paginate_by = 20
+
+    SORTS = {
+        "title": ("title", "id"),
+        "-title": ("-title", "-id"),
+        "category": ("category__title", "title", "id"),
+        "-category": ("-category__title", "-title", "-id"),
+    }
 
     def get_queryset(self):
-        return (
+        # Counts and thumbnails are computed by the database: the page runs a fixed number of queries.
+        queryset = (
             Activity.objects
-            .all()
-            .prefetch_related("media")
+            .select_related("category")
+            .annotate(
+                media_count=Count("media"),
+                thumbnail=ActivityMedia.first_image("activity", "file"),
+                thumbnail_url=ActivityMedia.first_image("activity", "url"),
+            )
         )
+        category = self.request.GET.get("category", "")
+        if category.isdigit():
+            queryset = queryset.filter(category_id=int(category))
+        title = self.request.GET.get("q", "").strip()
+        if title:
+            queryset = queryset.filter(title__icontains=title)
+        return queryset.order_by(*self.SORTS.get(self.request.GET.get("sort"), self.SORTS["title"]))
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        params = self.request.GET.copy()
+        params.pop("page", None)
+        ctx.update({
+            "categories": ActivityCategory.objects.order_by("title"),
+            "current_category": self.request.GET.get("category", ""),
+            "current_q": self.request.GET.get("q", ""),
+            "current_sort": self.request.GET.get("sort", "title"),
+            "querystring": params.urlencode(),
+        })
+        return ctx
 
 
 class ActivityCreateView(BackofficeAccessRequiredMixin, PermissionRequiredMixin, CreateView):
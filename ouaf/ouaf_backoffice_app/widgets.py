@@ -0,0 +1,61 @@
+from django import forms
+from django.core.exceptions import ValidationError
+from django.urls import reverse_lazy
+
+
+class AutocompleteMixin:
+    """
+    Select widget whose choices are fetched on demand from a JSON endpoint
+    (see static/js/autocomplete.js). Only the selected objects are rendered as
+    <option>s, so the page size doesn't depend on the size of the queryset.
+    """
+    url = None
+
+    class Media:
+        js = ["js/autocomplete.js"]
+
+    def __init__(self, attrs=None, url=None):
+        super().__init__(attrs)
+        if url is not None:
+            self.url = url
+
+    def build_attrs(self, base_attrs, extra_attrs=None):
+        attrs = super().build_attrs(base_attrs, extra_attrs)
+        attrs["data-autocomplete-url"] = str(self.url)
+        return attrs
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        selected = {pk for pk in map(self._to_pk, value) if pk is not None}
+        if not selected:
+            return []
+        options = [
+            self.create_option(name, obj.pk, field.label_from_instance(obj), True, index, attrs=attrs)
+            for index, obj in enumerate(field.queryset.filter(pk__in=selected))
+        ]
+        return [(None, options, 0)]
+
+    def _to_pk(self, value):
+        """`value` as a primary key of the field's queryset, or None (a tampered form is re-rendered, not a 500)."""
+        if value in (None, ""):
+            return None
+        try:
+            return self.choices.field.queryset.model._meta.pk.to_python(value)
+        except ValidationError:
+            return None
+
+
+class AutocompleteSelect(AutocompleteMixin, forms.Select):
+    pass
+
+
+class AutocompleteSelectMultiple(AutocompleteMixin, forms.SelectMultiple):
+    pass
+
+
+class PersonAutocompleteSelect(AutocompleteSelect):
+    url = reverse_lazy("backoffice:person_autocomplete")
+
+
+class PersonAutocompleteSelectMultiple(AutocompleteSelectMultiple):
+    url = reverse_lazy("backoffice:person_autocomplete")
@@ -1,6 +1,4 @@
 #!/bin/bash
 
-gunicorn ouaf.wsgi:application \
-  --bind 0.0.0.0:8000 \
-  --workers 3 \
-  --timeout 60
+# Workers and threads are derived from the CPU count (SERVE_WORKERS / SERVE_THREADS to override).
+exec python manage.py serve --bind 0.0.0.0:8000 "$@"